@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "rest_framework.authtoken",
     "core",
@@ -46,6 +47,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "core.middleware.ReadReplicaMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -78,16 +80,136 @@ WSGI_APPLICATION = "app.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.0/ref/settings/#databases
 
+# Connections shared by the threads of a process, 0 disables the pool
+# (core.db.postgresql). Pooled connections go back to the pool at the end
+# of every request, so they are not also kept by CONN_MAX_AGE.
+DB_POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE", 0))
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": "core.db.postgresql",
         "HOST": os.environ.get("DB_HOST"),
         "NAME": os.environ.get("DB_NAME"),
         "USER": os.environ.get("DB_USER"),
         "PASSWORD": os.environ.get("DB_PASS"),
+        # Seconds a connection is reused across requests, checked before
+        # its first query in each request
+        "CONN_MAX_AGE": (
+            0 if DB_POOL_MAX_SIZE else int(os.environ.get("DB_CONN_MAX_AGE", 60))
+        ),
+        "CONN_HEALTH_CHECKS": os.environ.get("DB_CONN_HEALTH_CHECKS", "1") == "1",
+        "POOL": {
+            "MAX_SIZE": DB_POOL_MAX_SIZE,
+            # Seconds a request waits for a connection when all are in use
+            "TIMEOUT": float(os.environ.get("DB_POOL_TIMEOUT", 10)),
+        }
+        if DB_POOL_MAX_SIZE
+        else None,
+    }
+}
+
+# Hosts of read replicas of the default database, comma separated. Reads of
+# safe requests are spread over them (core.db.routers), tests use the
+# default database in their place.
+DATABASE_REPLICAS = []
+for number, host in enumerate(
+    filter(None, os.environ.get("DB_REPLICA_HOSTS", "").split(",")), 1
+):
+    DATABASE_REPLICAS.append(f"replica{number}")
+    DATABASES[f"replica{number}"] = {
+        **DATABASES["default"],
+        "HOST": host.strip(),
+        "TEST": {"MIRROR": "default"},
     }
+
+DATABASE_ROUTERS = ["core.db.routers.PrimaryReplicaRouter"]
+
+# Seconds the reads of a client stay on the primary after it wrote
+DATABASE_REPLICA_STICKY_SECONDS = int(os.environ.get("DB_REPLICA_STICKY_SECONDS", 10))
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", ""),
+    }
+}
+
+# Whether every process of the deployment sees the same cache. Cached
+# recipe details, stats and tokens are invalidated by the process handling
+# a write, so they are not used when this is off. Off by default for the
+# process-local LocMemCache.
+CACHE_SHARED = (
+    os.environ.get(
+        "CACHE_SHARED",
+        "0" if CACHES["default"]["BACKEND"].endswith(".LocMemCache") else "1",
+    )
+    == "1"
+)
+
+# orjson backed JSON renderer and parser (core.renderers, core.parsers),
+# falling back to the stdlib json module when orjson is not installed
+REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": [
+        "core.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "core.parsers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
 }
 
+# Seconds a serialized recipe detail stays cached (recipe.cache)
+RECIPE_DETAIL_CACHE_TIMEOUT = int(os.environ.get("RECIPE_DETAIL_CACHE_TIMEOUT", 300))
+
+# Seconds the recipe stats of a user stay cached, changes invalidate them
+RECIPE_STATS_CACHE_TIMEOUT = int(os.environ.get("RECIPE_STATS_CACHE_TIMEOUT", 3600))
+
+# Largest list accepted by the recipe, tag and ingredient bulk endpoints
+RECIPE_BULK_CREATE_MAX_ITEMS = int(os.environ.get("RECIPE_BULK_CREATE_MAX_ITEMS", 1000))
+
+# Text search configuration of the recipe search vectors, run
+# manage.py update_search_vectors after changing it
+RECIPE_SEARCH_CONFIG = os.environ.get("RECIPE_SEARCH_CONFIG", "english")
+
+# Typo tolerant tag and ingredient autocomplete, needs the pg_trgm extension
+# to be available when the migrations run
+RECIPE_AUTOCOMPLETE_TRIGRAM = os.environ.get("RECIPE_AUTOCOMPLETE_TRIGRAM") == "1"
+
+# Most suggestions returned by the tag and ingredient autocomplete
+RECIPE_AUTOCOMPLETE_MAX_LIMIT = int(os.environ.get("RECIPE_AUTOCOMPLETE_MAX_LIMIT", 50))
+
+# Resized copies generated for every recipe image, name -> (width, height)
+RECIPE_IMAGE_VARIANTS = {"thumbnail": (150, 150), "medium": (600, 600)}
+
+# Threads generating image variants and jobs allowed to wait for them, jobs
+# beyond that are left pending for manage.py generate_pending_variants
+RECIPE_IMAGE_WORKERS = int(os.environ.get("RECIPE_IMAGE_WORKERS", 2))
+RECIPE_IMAGE_QUEUE_SIZE = int(os.environ.get("RECIPE_IMAGE_QUEUE_SIZE", 100))
+
+# "uuid" stores every upload under a new name, "content" names images by
+# their SHA-256 and stores identical uploads once (recipe.images)
+RECIPE_IMAGE_STORAGE = os.environ.get("RECIPE_IMAGE_STORAGE", "uuid")
+
+# Limits of the streaming recipe image upload, format -> file extension
+RECIPE_IMAGE_UPLOAD_FORMATS = {
+    "JPEG": "jpg",
+    # JPEGs with several frames (MPF), as saved by many phone cameras
+    "MPO": "jpg",
+    "PNG": "png",
+    "GIF": "gif",
+    "WEBP": "webp",
+}
+RECIPE_IMAGE_MAX_BYTES = int(os.environ.get("RECIPE_IMAGE_MAX_BYTES", 10 * 1024 * 1024))
+RECIPE_IMAGE_MAX_PIXELS = int(os.environ.get("RECIPE_IMAGE_MAX_PIXELS", 40_000_000))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
@@ -128,6 +250,13 @@ STATIC_URL = "static/"
 MEDIA_URL = "media/"
 
 MEDIA_ROOT = "/vol/web/media"
+
+# How core.media serves uploads: "python" streams them from the app,
+# "x-accel" (nginx) and "x-sendfile" (Apache) delegate to the front server
+MEDIA_SERVE_MODE = os.environ.get("MEDIA_SERVE_MODE", "python")
+# nginx internal location aliased to MEDIA_ROOT, used by "x-accel"
+MEDIA_ACCEL_PREFIX = os.environ.get("MEDIA_ACCEL_PREFIX", "/protected-media/")
+MEDIA_CACHE_MAX_AGE = int(os.environ.get("MEDIA_CACHE_MAX_AGE", 31536000))
 STATIC_ROOT = "/vol/web/static"
 
 # Default primary key field type
@@ -136,3 +265,8 @@ STATIC_ROOT = "/vol/web/static"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 AUTH_USER_MODEL = "core.User"
+
+# In-process cache of API token lookups (user.authentication), only used
+# with CACHE_SHARED, where token versions invalidate it in every process
+AUTH_TOKEN_CACHE_SIZE = int(os.environ.get("AUTH_TOKEN_CACHE_SIZE", 10000))
+AUTH_TOKEN_CACHE_TTL = int(os.environ.get("AUTH_TOKEN_CACHE_TTL", 60))
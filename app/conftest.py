@@ -1,11 +1,28 @@
 import pytest
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from core.models import Recipe
+from recipe import images
 from helpers.test_helpers import (
     create_and_authenticate_user,
     create_sample_recipe,
 )
 
 
+@pytest.fixture(autouse=True)
+def shared_cache(settings):
+    # The tests run in one process, for which the local memory cache is shared
+    settings.CACHE_SHARED = True
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
 @pytest.fixture(scope="function")
 def setup_admin(client):
     admin_user = get_user_model().objects.create_superuser(
@@ -23,4 +40,8 @@ def create_user_and_recipe():
     user, client = create_and_authenticate_user()
     recipe = create_sample_recipe(user=user)
     yield user, client, recipe
+    # Transactional tests run the variant jobs queued by uploads right away
+    images.wait_for_pending()
+    recipe = Recipe.objects.filter(pk=recipe.pk).first() or recipe
+    images.delete_variants(recipe.image.name)
     recipe.image.delete()
@@ -27,7 +27,12 @@ class UserAdmin(BaseAdmin):
     )
 
 
+class RecipeAdmin(admin.ModelAdmin):
+    # Images are stored and released by the recipe image endpoints only
+    readonly_fields = ["image", "image_status", "image_variants"]
+
+
 admin.site.register(models.User, UserAdmin)
 admin.site.register(models.Tag)
 admin.site.register(models.Ingredient)
-admin.site.register(models.Recipe)
+admin.site.register(models.Recipe, RecipeAdmin)
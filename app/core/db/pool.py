@@ -0,0 +1,139 @@
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """Bounded, thread safe pool of DB-API connections
+
+    At most ``max_size`` connections are open at once. A checkout waits up
+    to ``timeout`` seconds for one to be returned when all of them are in
+    use, then raises PoolTimeout. ``reset`` prepares a returned connection
+    for the next user and ``check`` validates an idle one before it is
+    handed out, both return False for connections that must be discarded.
+    """
+
+    def __init__(self, connect, max_size, timeout, reset=None, check=None):
+        self.connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.reset = reset
+        self.check = check
+        self._idle = []
+        self._size = 0
+        self._waiting = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._condition = threading.Condition()
+
+    def checkout(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        with self._condition:
+            self._waiting += 1
+            try:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(
+                            f"No database connection available after "
+                            f"{self.timeout}s, all {self.max_size} are in use"
+                        )
+                    self._condition.wait(remaining)
+                if self._idle:
+                    connection = self._idle.pop()
+                else:
+                    # Reserve the slot, the connection is opened unlocked
+                    self._size += 1
+                    connection = None
+            finally:
+                self._waiting -= 1
+
+        try:
+            if connection is not None and not self._usable(connection):
+                connection = None
+            if connection is None:
+                connection = self.connect()
+        except BaseException:
+            self._release_slot()
+            raise
+
+        waited = time.monotonic() - started
+        with self._condition:
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return connection
+
+    def checkin(self, connection):
+        try:
+            usable = self.reset is None or self.reset(connection)
+        except Exception:
+            usable = False
+        if not usable:
+            self.discard(connection)
+            return
+        with self._condition:
+            self._idle.append(connection)
+            self._condition.notify()
+
+    def discard(self, connection):
+        """Close a checked out connection and free its slot"""
+        try:
+            connection.close()
+        except Exception:
+            pass
+        self._release_slot()
+
+    def close(self):
+        """Close the idle connections, checked out ones are left alone"""
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._condition.notify_all()
+        for connection in idle:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def stats(self):
+        with self._condition:
+            idle = len(self._idle)
+            checkouts = self._checkouts
+            return {
+                "max_size": self.max_size,
+                "size": self._size,
+                "idle": idle,
+                "in_use": self._size - idle,
+                "waiting": self._waiting,
+                "checkouts": checkouts,
+                "timeouts": self._timeouts,
+                "checkout_avg_ms": round(
+                    self._wait_total / checkouts * 1000 if checkouts else 0, 3
+                ),
+                "checkout_max_ms": round(self._wait_max * 1000, 3),
+            }
+
+    def _usable(self, connection):
+        try:
+            if self.check is None or self.check(connection):
+                return True
+        except Exception:
+            pass
+        try:
+            connection.close()
+        except Exception:
+            pass
+        return False
+
+    def _release_slot(self):
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
@@ -0,0 +1,102 @@
+import functools
+import threading
+
+import psycopg2.extras
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+from core.db.pool import ConnectionPool, PoolTimeout
+
+Database = base.Database
+
+# Connection pools of the process by database alias, shared by all threads
+pools = {}
+pools_lock = threading.Lock()
+
+
+def connect(conn_params, isolation_level):
+    """Open a connection set up as DatabaseWrapper.get_new_connection does"""
+    connection = Database.connect(**conn_params)
+    if isolation_level is not None and connection.isolation_level != isolation_level:
+        connection.set_session(isolation_level=isolation_level)
+    psycopg2.extras.register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+    return connection
+
+
+def reset_connection(connection):
+    """End the transaction a returned connection was left in
+
+    Idle connections are kept in autocommit mode, so checking them does not
+    open a transaction.
+    """
+    if connection.closed:
+        return False
+    status = connection.info.transaction_status
+    if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+        return False
+    if status != extensions.TRANSACTION_STATUS_IDLE:
+        connection.rollback()
+    connection.autocommit = True
+    return True
+
+
+def check_connection(connection):
+    if connection.closed:
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL backend with connection pooling
+
+    POOL = {"MAX_SIZE": ..., "TIMEOUT": ...} makes the threads of the
+    process share a bounded pool of connections, which are checked out when
+    a thread connects and returned when it closes. With CONN_HEALTH_CHECKS
+    idle pooled connections are also pinged before they are handed out.
+    """
+
+    @property
+    def pool(self):
+        options = self.settings_dict.get("POOL")
+        if not options:
+            return None
+        with pools_lock:
+            pool = pools.get(self.alias)
+            if pool is None:
+                check = None
+                if self.settings_dict.get("CONN_HEALTH_CHECKS"):
+                    check = check_connection
+                pool = pools[self.alias] = ConnectionPool(
+                    functools.partial(
+                        connect,
+                        self.get_connection_params(),
+                        self.settings_dict["OPTIONS"].get("isolation_level"),
+                    ),
+                    max_size=options["MAX_SIZE"],
+                    timeout=options.get("TIMEOUT", 10),
+                    reset=reset_connection,
+                    check=check or (lambda connection: not connection.closed),
+                )
+            return pool
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        try:
+            connection = pool.checkout()
+        except PoolTimeout as exc:
+            raise Database.OperationalError(str(exc)) from exc
+        self.isolation_level = self.settings_dict["OPTIONS"].get(
+            "isolation_level", connection.isolation_level
+        )
+        return connection
+
+    def _close(self):
+        pool = self.pool
+        if pool is None or self.connection is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            pool.checkin(self.connection)
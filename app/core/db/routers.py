@@ -0,0 +1,59 @@
+import contextvars
+import random
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+
+class RoutingState:
+    """Where the reads of a request go and whether it wrote"""
+
+    def __init__(self, use_primary):
+        self.use_primary = use_primary
+        self.wrote = False
+
+
+# Set by core.middleware.ReadReplicaMiddleware for the current request.
+# The state is shared with copies of the context, e.g. the thread that runs
+# a synchronous view under ASGI.
+routing_state = contextvars.ContextVar("routing_state", default=None)
+
+
+def auth_models():
+    return {"authtoken.token", settings.AUTH_USER_MODEL.lower()}
+
+
+class PrimaryReplicaRouter:
+    """Send reads to DATABASE_REPLICAS and writes to the primary
+
+    Only reads of requests marked by ReadReplicaMiddleware go to a replica.
+    Once a request writes, its later reads stay on the primary as well.
+    Management commands and background jobs always use the primary, and so
+    do the token and user lookups that authenticate a request: a client
+    that just obtained a token has no credentials to be made sticky by.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = routing_state.get()
+        replicas = settings.DATABASE_REPLICAS
+        if state is None or state.use_primary or not replicas:
+            return DEFAULT_DB_ALIAS
+        if model._meta.label_lower in auth_models():
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = routing_state.get()
+        if state is not None:
+            state.wrote = True
+            state.use_primary = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,157 @@
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection, connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from core.models import Recipe
+
+
+class Command(BaseCommand):
+    """
+    Compare the concurrent throughput of the recipe list and detail served
+    in process by the DRF views through WSGI, from a pool of threads, and
+    through ASGI, and by the async views through ASGI, from tasks on one
+    event loop. Every ASGI request runs its synchronous code in a thread of
+    its own, as under an ASGI server. Every query is delayed by
+    --db-latency-ms to model the round trip to a remote database, so the
+    load is I/O bound. The benchmark user and its recipes are deleted
+    afterwards.
+    Example:
+        manage.py benchmark_asgi --concurrency 64 --db-latency-ms 10
+    """
+
+    help = "Benchmark the recipe endpoints and async views through ASGI and WSGI"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=200)
+        parser.add_argument("--requests", type=int, default=400)
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument("--page-size", type=int, default=20)
+        parser.add_argument(
+            "--db-latency-ms",
+            type=float,
+            default=5,
+            help="Delay added to every query",
+        )
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.create_user(
+            email="benchmark-asgi@londonappdev.com", password=None
+        )
+        try:
+            token = Token.objects.create(user=user)
+            recipes = Recipe.objects.bulk_create(
+                Recipe(user=user, title=f"Recipe {i}", minutes_to_cook=10, price=5)
+                for i in range(options["recipes"])
+            )
+            latency = options["db_latency_ms"] / 1000
+
+            def delay(execute, sql, params, many, context):
+                time.sleep(latency)
+                return execute(sql, params, many, context)
+
+            def add_delay(sender, connection, **kwargs):
+                # Wrappers reconnecting to the pool keep theirs
+                if delay not in connection.execute_wrappers:
+                    connection.execute_wrappers.append(delay)
+
+            connection_created.connect(add_delay)
+            # Reconnect so this thread gets the delay as well
+            connection.close()
+            try:
+                self.run_benchmarks(token.key, recipes, options)
+            finally:
+                connection_created.disconnect(add_delay)
+                connection.close()
+        finally:
+            user.delete()
+
+    def run_benchmarks(self, key, recipes, options):
+        self.stdout.write(
+            f"{'endpoint':<8} {'server':<10} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9}"
+        )
+        servers = [
+            ("wsgi", "recipe", self.run_wsgi),
+            ("asgi", "recipe", self.run_asgi),
+            ("asgi-async", "recipe-async", self.run_asgi),
+        ]
+        for endpoint in ("list", "detail"):
+            for server, prefix, run in servers:
+                paths = self.paths(f"{prefix}-{endpoint}", recipes, options)
+                elapsed, latencies = run(paths, key, options["concurrency"])
+                latencies.sort()
+                self.stdout.write(
+                    f"{endpoint:<8} {server:<10} "
+                    f"{len(paths) / elapsed:>9.1f} "
+                    f"{statistics.median(latencies) * 1000:>9.1f} "
+                    f"{latencies[int(len(latencies) * 0.95) - 1] * 1000:>9.1f}"
+                )
+
+    @staticmethod
+    def paths(url_name, recipes, options):
+        if url_name.endswith("-list"):
+            path = reverse(f"recipe:{url_name}") + f"?page_size={options['page_size']}"
+            return [path] * options["requests"]
+        return [
+            reverse(f"recipe:{url_name}", args=[recipes[i % len(recipes)].id])
+            for i in range(options["requests"])
+        ]
+
+    def run_wsgi(self, paths, key, concurrency):
+        """Send the requests from a pool of threads, one client each"""
+        local = threading.local()
+
+        def get(path):
+            if not hasattr(local, "client"):
+                local.client = Client(HTTP_AUTHORIZATION=f"Token {key}")
+            started = time.perf_counter()
+            response = local.client.get(path)
+            # Done by the request_finished handler the test client disconnects
+            close_old_connections()
+            self.check_response(path, response)
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = list(executor.map(get, paths))
+        return time.perf_counter() - started, latencies
+
+    def run_asgi(self, paths, key, concurrency):
+        """Send the requests from concurrent tasks on one event loop"""
+        client = AsyncClient()
+        queue = list(reversed(paths))
+        latencies = []
+
+        async def worker():
+            while queue:
+                path = queue.pop()
+                started = time.perf_counter()
+                # ASGIHandler gives every request its own thread for sync code,
+                # so its connections are not reused by the next request
+                async with ThreadSensitiveContext():
+                    response = await client.get(path, authorization=f"Token {key}")
+                    await sync_to_async(connections.close_all)()
+                self.check_response(path, response)
+                latencies.append(time.perf_counter() - started)
+
+        async def main():
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+        started = time.perf_counter()
+        asyncio.run(main())
+        return time.perf_counter() - started, latencies
+
+    @staticmethod
+    def check_response(path, response):
+        if response.status_code != 200:
+            raise CommandError(f"GET {path} returned {response.status_code}")
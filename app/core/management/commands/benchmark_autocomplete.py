@@ -0,0 +1,97 @@
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.models import Ingredient
+from recipe import autocomplete
+from recipe.serializers import IngredientSerializer
+
+WORDS = (
+    "apple baked basil black bread brown butter cheddar cherry chicken chili "
+    "cocoa coconut corn cream dark dried fennel fresh garlic ginger goat green "
+    "honey lemon lime maple mint olive onion orange paprika peanut pepper pork "
+    "red rice roasted salt sesame smoked sour spicy sugar sweet tomato vanilla "
+    "white wild yellow"
+).split()
+
+
+class Command(BaseCommand):
+    """
+    Measure the latency of the tag and ingredient autocomplete on a user
+    with --names ingredients, for prefixes of 1 to 4 letters, words inside
+    names and, with RECIPE_AUTOCOMPLETE_TRIGRAM, misspelled words. Fetching
+    the whole list, which the autocomplete replaces, is measured once.
+    The benchmark user and its ingredients are deleted afterwards.
+    Example:
+        manage.py benchmark_autocomplete --names 100000 --queries 200
+    """
+
+    help = "Benchmark the tag and ingredient autocomplete"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--names", type=int, default=100000)
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--limit", type=int, default=10)
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.create_user(
+            email="benchmark-autocomplete@londonappdev.com", password=None
+        )
+        try:
+            names = self.seed(user, options["names"])
+            queryset = Ingredient.objects.filter(user=user)
+            rng = random.Random(0)
+            cases = {
+                f"prefix {length}": lambda length=length: rng.choice(names)[:length]
+                for length in range(1, 5)
+            }
+            cases["word"] = lambda: rng.choice(names).split()[1][:4]
+            if settings.RECIPE_AUTOCOMPLETE_TRIGRAM:
+                cases["typo"] = lambda: self.misspell(rng, rng.choice(WORDS))
+
+            self.stdout.write(f"{'query':<9} {'p50 ms':>8} {'p95 ms':>8}")
+            for case, make_text in cases.items():
+                latencies = []
+                for _ in range(options["queries"]):
+                    text = make_text()
+                    started = time.perf_counter()
+                    autocomplete.suggest(queryset, text, options["limit"])
+                    latencies.append(time.perf_counter() - started)
+                latencies.sort()
+                self.stdout.write(
+                    f"{case:<9} {statistics.median(latencies) * 1000:>8.2f} "
+                    f"{latencies[int(len(latencies) * 0.95) - 1] * 1000:>8.2f}"
+                )
+
+            started = time.perf_counter()
+            IngredientSerializer(queryset.order_by("-name", "-id"), many=True).data
+            elapsed = (time.perf_counter() - started) * 1000
+            self.stdout.write(f"{'full list':<9} {elapsed:>8.2f}")
+        finally:
+            user.delete()
+
+    @staticmethod
+    def seed(user, count):
+        rng = random.Random(0)
+        names = [
+            f"{rng.choice(WORDS)} {rng.choice(WORDS)} {rng.choice(WORDS)} {i}"
+            for i in range(count)
+        ]
+        Ingredient.objects.bulk_create(
+            (Ingredient(user=user, name=name) for name in names), batch_size=5000
+        )
+        # Give the planner the statistics of the new rows
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {Ingredient._meta.db_table}")
+        return names
+
+    @staticmethod
+    def misspell(rng, word):
+        """Swap two neighbouring letters of a word"""
+        i = rng.randrange(len(word) - 1)
+        return word[:i] + word[i + 1] + word[i] + word[i + 2 :]
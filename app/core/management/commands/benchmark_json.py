@@ -0,0 +1,83 @@
+import io
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer, orjson
+
+
+def recipe_payload(count):
+    """Return a recipe list payload as built for the list endpoint"""
+    return [
+        {
+            "id": i,
+            "title": f"Crème brûlée {i} with a long descriptive title",
+            "minutes_to_cook": i % 120,
+            "price": f"{i % 100}.{i % 100:02d}",
+            "link": f"https://example.com/recipes/{i}",
+            "ingredients": list(range(i, i + 5)),
+            "tags": [i % 10, i % 10 + 1],
+            "image": f"http://testserver/media/uploads/recipe/ab/cd/{i:032x}.jpg",
+            "image_status": "ready",
+            "image_variants": {
+                "thumbnail": f"http://testserver/media/uploads/recipe-variants/"
+                f"ab/cd/{i:032x}_thumbnail.jpg",
+                "medium": f"http://testserver/media/uploads/recipe-variants/"
+                f"ab/cd/{i:032x}_medium.jpg",
+            },
+        }
+        for i in range(count)
+    ]
+
+
+class Command(BaseCommand):
+    """
+    Compare the time FastJSONRenderer and FastJSONParser take on recipe
+    list payloads with the stdlib based DRF JSONRenderer and JSONParser.
+    Example:
+        manage.py benchmark_json --rows 100 1000 10000
+    """
+
+    help = "Benchmark the orjson renderer and parser against the DRF ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 10000])
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write("orjson is not installed, both use the stdlib")
+        self.stdout.write(
+            f"{'rows':>7} {'KiB':>7} {'render ms':>10} {'fast ms':>8} "
+            f"{'parse ms':>9} {'fast ms':>8}"
+        )
+        for count in options["rows"]:
+            data = recipe_payload(count)
+            body = JSONRenderer().render(data)
+            if FastJSONRenderer().render(data) != body:
+                self.stderr.write("The renderers disagree on the payload")
+            render = self.measure(lambda: JSONRenderer().render(data), options)
+            fast_render = self.measure(lambda: FastJSONRenderer().render(data), options)
+            parse = self.measure(lambda: JSONParser().parse(io.BytesIO(body)), options)
+            fast_parse = self.measure(
+                lambda: FastJSONParser().parse(io.BytesIO(body)), options
+            )
+            self.stdout.write(
+                f"{count:>7} {len(body) / 1024:>7.0f} {render * 1000:>10.2f} "
+                f"{fast_render * 1000:>8.2f} {parse * 1000:>9.2f} "
+                f"{fast_parse * 1000:>8.2f}"
+            )
+
+    @staticmethod
+    def measure(func, options):
+        """Return the best time of a call"""
+        best = None
+        for _ in range(options["repeat"]):
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
@@ -0,0 +1,110 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Ingredient, Recipe, Tag
+from recipe import rows
+from recipe.serializers import RecipeSerializer
+
+
+class Command(BaseCommand):
+    """
+    Compare the cost per row of recipe list payloads built by
+    RecipeSerializer from prefetched instances with the ones built by
+    recipe.rows from aggregated values() rows, including the queries and
+    the JSON rendering. The benchmark user and its recipes are deleted
+    afterwards.
+    Example:
+        manage.py benchmark_recipe_rows --rows 1000 10000 100000
+    """
+
+    help = "Benchmark the recipe list fast path against RecipeSerializer"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows", type=int, nargs="+", default=[1000, 10000, 100000]
+        )
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.create_user(
+            email="benchmark-rows@londonappdev.com", password=None
+        )
+        try:
+            self.seed(user, max(options["rows"]))
+            self.stdout.write(
+                f"{'rows':>7} {'serializer us/row':>18} {'rows us/row':>12} "
+                f"{'speedup':>8}"
+            )
+            recipes = Recipe.objects.filter(user=user).order_by("-id")
+            for count in options["rows"]:
+                queryset = recipes[:count]
+                slow = self.measure(
+                    lambda: RecipeSerializer(
+                        queryset.prefetch_related(*rows.RELATIONS_BY_ID), many=True
+                    ).data,
+                    options["repeat"],
+                )
+                fast = self.measure(
+                    lambda: rows.serialize_rows(rows.recipe_rows(queryset)),
+                    options["repeat"],
+                )
+                self.stdout.write(
+                    f"{count:>7} {slow / count * 1e6:>18.1f} "
+                    f"{fast / count * 1e6:>12.1f} {slow / fast:>7.1f}x"
+                )
+        finally:
+            user.delete()
+
+    @staticmethod
+    def seed(user, count):
+        tags = Tag.objects.bulk_create(
+            Tag(user=user, name=f"Tag {i}") for i in range(10)
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(user=user, name=f"Ingredient {i}") for i in range(20)
+        )
+        recipes = Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    user=user,
+                    title=f"Recipe {i}",
+                    minutes_to_cook=i % 120,
+                    price=f"{i % 100}.{i % 100:02d}",
+                    link=f"https://example.com/recipes/{i}",
+                )
+                for i in range(count)
+            ),
+            batch_size=5000,
+        )
+        Recipe.tags.through.objects.bulk_create(
+            (
+                Recipe.tags.through(recipe_id=recipe.id, tag_id=tags[(i + j) % 10].id)
+                for i, recipe in enumerate(recipes)
+                for j in range(2)
+            ),
+            batch_size=5000,
+        )
+        Recipe.ingredients.through.objects.bulk_create(
+            (
+                Recipe.ingredients.through(
+                    recipe_id=recipe.id, ingredient_id=ingredients[(i + j) % 20].id
+                )
+                for i, recipe in enumerate(recipes)
+                for j in range(5)
+            ),
+            batch_size=5000,
+        )
+
+    @staticmethod
+    def measure(build, repeat):
+        """Return the best time of building and rendering the payload"""
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            JSONRenderer().render(build())
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
@@ -0,0 +1,236 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient, Recipe
+
+FORBIDDEN_NODES = ("Seq Scan", "Sort", "Incremental Sort")
+
+
+class Rollback(Exception):
+    """Raised to discard the seeded dataset"""
+
+
+class Command(BaseCommand):
+    """
+    Seed a large dataset, EXPLAIN the SQL of the hot list endpoints for a
+    user with many recipes and fail if any plan contains a sequential scan
+    or a sort over more than --max-sort-rows rows.
+    The dataset is created in a transaction that is rolled back afterwards.
+    Example:
+        manage.py explain_list_queries --power-recipes 50000
+    """
+
+    help = "Check the query plans of the recipe API list endpoints"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users", type=int, default=5000, help="Background users to create"
+        )
+        parser.add_argument(
+            "--recipes", type=int, default=20, help="Recipes per background user"
+        )
+        parser.add_argument(
+            "--attributes",
+            type=int,
+            default=20,
+            help="Tags and ingredients per background user",
+        )
+        parser.add_argument(
+            "--power-recipes",
+            type=int,
+            default=20000,
+            help="Recipes of the user whose lists are checked",
+        )
+        parser.add_argument(
+            "--power-attributes",
+            type=int,
+            default=5000,
+            help="Tags and ingredients of the user whose lists are checked",
+        )
+        parser.add_argument(
+            "--links", type=int, default=3, help="Tags and ingredients per recipe"
+        )
+        parser.add_argument("--page-size", type=int, default=50)
+        parser.add_argument(
+            "--max-sort-rows",
+            type=int,
+            default=1000,
+            help="Tolerate sorts the planner expects to run on at most this many "
+            "rows, e.g. the few recipes left after a selective tag filter",
+        )
+        parser.add_argument(
+            "--show-plans", action="store_true", help="Print every plan"
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        failures = []
+        try:
+            with transaction.atomic():
+                user = self.seed()
+                failures = self.check_endpoints(user)
+                raise Rollback
+        except Rollback:
+            pass
+
+        if failures:
+            raise CommandError(
+                "Query plans with sequential scans or sorts:\n" + "\n".join(failures)
+            )
+        self.stdout.write(self.style.SUCCESS("All list query plans use indexes"))
+
+    def seed(self):
+        """Create the dataset and return the user whose lists are checked"""
+        User = get_user_model()
+        users = User.objects.bulk_create(
+            User(email=f"explain-{i}@example.com", name=f"User {i}", password="!")
+            for i in range(self.options["users"] + 1)
+        )
+        power_user = users[-1]
+
+        def count_for(user, option):
+            if user == power_user:
+                return self.options[f"power_{option}"]
+            return self.options[option]
+
+        for model in (Tag, Ingredient):
+            model.objects.bulk_create(
+                model(user=user, name=f"{model.__name__} {i}")
+                for user in users
+                for i in range(count_for(user, "attributes"))
+            )
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                user=user,
+                title=f"Recipe {i}",
+                minutes_to_cook=i % 120 + 1,
+                price=i % 50 + 1,
+            )
+            for user in users
+            for i in range(count_for(user, "recipes"))
+        )
+        for relation, model in (("tags", Tag), ("ingredients", Ingredient)):
+            ids_by_user = {}
+            for pk, user_id in model.objects.values_list("id", "user_id"):
+                ids_by_user.setdefault(user_id, []).append(pk)
+            field = Recipe._meta.get_field(relation)
+            through = field.remote_field.through
+            target_column = f"{field.m2m_reverse_field_name()}_id"
+            through.objects.bulk_create(
+                through(
+                    recipe_id=recipe.id,
+                    **{target_column: ids[(recipe.id + n) % len(ids)]},
+                )
+                for recipe in recipes
+                for ids in [ids_by_user.get(recipe.user_id)]
+                if ids
+                for n in range(min(self.options["links"], len(ids)))
+            )
+
+        with connection.cursor() as cursor:
+            for model in (User, Tag, Ingredient, Recipe):
+                cursor.execute(f"ANALYZE {model._meta.db_table}")
+            for relation in ("tags", "ingredients"):
+                through = Recipe._meta.get_field(relation).remote_field.through
+                cursor.execute(f"ANALYZE {through._meta.db_table}")
+        return power_user
+
+    def get_endpoints(self, user):
+        """Return (name, url, params) of every checked request"""
+        page = {"page_size": self.options["page_size"]}
+        tag_ids = ",".join(
+            str(pk)
+            for pk in Tag.objects.filter(user=user).values_list("id", flat=True)[:2]
+        )
+        ingredient_ids = ",".join(
+            str(pk)
+            for pk in Ingredient.objects.filter(user=user).values_list("id", flat=True)[
+                :2
+            ]
+        )
+        return [
+            ("recipes", reverse("recipe:recipe-list"), page),
+            (
+                "recipes filtered by tags",
+                reverse("recipe:recipe-list"),
+                {**page, "tags": tag_ids},
+            ),
+            (
+                "recipes filtered by all ingredients",
+                reverse("recipe:recipe-list"),
+                {**page, "ingredients": ingredient_ids, "ingredients_match": "all"},
+            ),
+            (
+                "recipes ordered by price",
+                reverse("recipe:recipe-list"),
+                {**page, "ordering": "-price"},
+            ),
+            (
+                "recipes in a price range ordered by price",
+                reverse("recipe:recipe-list"),
+                {**page, "price_min": 10, "price_max": 20, "ordering": "price"},
+            ),
+            (
+                "recipes in a cooking time range",
+                reverse("recipe:recipe-list"),
+                {**page, "minutes_min": 30, "minutes_max": 45},
+            ),
+            (
+                "recipes with a short cooking time ordered by it",
+                reverse("recipe:recipe-list"),
+                {**page, "minutes_max": 30, "ordering": "-minutes_to_cook"},
+            ),
+            ("tags", reverse("recipe:tag-list"), page),
+            ("ingredients", reverse("recipe:ingredient-list"), page),
+        ]
+
+    def check_endpoints(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        failures = []
+        for name, url, params in self.get_endpoints(user):
+            with CaptureQueriesContext(connection) as queries:
+                res = client.get(url, params)
+            if res.status_code != 200:
+                raise CommandError(f"{name}: {url} returned {res.status_code}")
+            for query in queries:
+                sql = query["sql"]
+                if not sql.startswith("SELECT"):
+                    continue
+                plan = self.explain(sql)
+                nodes = sorted(set(self.find_nodes(plan)))
+                if self.options["show_plans"]:
+                    self.stdout.write(f"{name}: {sql}\n{json.dumps(plan, indent=2)}")
+                if nodes:
+                    failures.append(f"{name}: {', '.join(nodes)} in {sql}")
+                else:
+                    self.stdout.write(f"{name}: OK")
+        return failures
+
+    @staticmethod
+    def explain(sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]["Plan"]
+
+    def find_nodes(self, plan):
+        """Yield the forbidden node types of a plan tree"""
+        small_sort = (
+            "Sort" in plan["Node Type"]
+            and plan["Plan Rows"] <= self.options["max_sort_rows"]
+        )
+        if plan["Node Type"] in FORBIDDEN_NODES and not small_sort:
+            yield f"{plan['Node Type']} ({plan.get('Relation Name', '')})".replace(
+                " ()", ""
+            )
+        for child in plan.get("Plans", []):
+            yield from self.find_nodes(child)
@@ -0,0 +1,63 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Recipe
+from recipe import images
+
+
+class Command(BaseCommand):
+    """
+    Generate the image variants of recipes still pending after --older-than
+    seconds, whose jobs were dropped by a full queue or lost with a
+    restarted worker. Run it periodically or when the workers start; a job
+    still running meanwhile is harmless, variants already stored are kept.
+    Example:
+        manage.py generate_pending_variants --older-than 600 --workers 4
+    """
+
+    help = "Generate the image variants of recipes left pending"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            default=300,
+            help="Seconds since the image was set",
+        )
+        parser.add_argument(
+            "--workers", type=int, default=2, help="Threads generating variants"
+        )
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(seconds=options["older_than"])
+        generated = 0
+        last_id = 0
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            while True:
+                batch = list(
+                    Recipe.objects.filter(
+                        id__gt=last_id,
+                        image_status=Recipe.ImageStatus.PENDING,
+                        modified_at__lt=before,
+                    )
+                    .order_by("id")
+                    .values_list("id", "image")[: options["batch_size"]]
+                )
+                if not batch:
+                    break
+                last_id = batch[-1][0]
+
+                ids, names = zip(*batch)
+                list(executor.map(images.generate_variants, ids, names))
+                generated += len(batch)
+                self.stdout.write(
+                    f"Processed {generated} recipes, up to recipe {last_id}"
+                )
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Done, generated variants of {generated} recipes")
+        )
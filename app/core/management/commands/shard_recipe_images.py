@@ -0,0 +1,110 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import ImageBlob, Recipe, sharded_path
+from recipe import cache, images
+
+FLAT_IMAGE = r"^uploads/recipe/[^/]+$"
+
+
+def move_file(name, new_name):
+    """Move a stored file, return False if it is in neither place"""
+    source = default_storage.path(name)
+    target = default_storage.path(new_name)
+    if os.path.exists(source):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(source, target)
+        return True
+    return os.path.exists(target)
+
+
+def move_image(name):
+    """Move an image and its variants to the sharded layout"""
+    filename = os.path.basename(name)
+    new_name = sharded_path(images.UPLOAD_DIR, filename)
+    stem = os.path.splitext(filename)[0]
+    for variant in settings.RECIPE_IMAGE_VARIANTS:
+        move_file(
+            os.path.join(images.VARIANTS_DIR, f"{stem}_{variant}.jpg"),
+            images.variant_name(new_name, variant),
+        )
+    return new_name, move_file(name, new_name)
+
+
+class Command(BaseCommand):
+    """
+    Move recipe images from the flat uploads/recipe/ directory to the
+    sharded layout and rewrite Recipe.image and ImageBlob.name in batches.
+    Files are moved before their rows are updated and a file already at its
+    new place counts as moved, so an interrupted run can be started again.
+    Example:
+        manage.py shard_recipe_images --workers 8
+    """
+
+    help = "Move recipe images to the sharded directory layout"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--workers", type=int, default=4, help="Threads moving files"
+        )
+
+    def handle(self, *args, **options):
+        moved = missing = 0
+        last_id = 0
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            while True:
+                batch = list(
+                    Recipe.objects.filter(id__gt=last_id, image__regex=FLAT_IMAGE)
+                    .order_by("id")
+                    .values_list("id", "image")[: options["batch_size"]]
+                )
+                if not batch:
+                    break
+                last_id = batch[-1][0]
+
+                names = list({name for _, name in batch})
+                results = dict(zip(names, executor.map(move_image, names)))
+                self.update_rows(batch, results)
+
+                moved += sum(found for _, found in results.values())
+                missing += sum(not found for _, found in results.values())
+                self.stdout.write(f"Moved {moved} images, up to recipe {last_id}")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Done, moved {moved} images, {missing} missing")
+        )
+
+    def update_rows(self, batch, results):
+        with transaction.atomic():
+            recipes = list(
+                Recipe.objects.select_for_update()
+                .filter(id__in=[recipe_id for recipe_id, _ in batch])
+                .only("id", "image", "image_variants")
+            )
+            # Recipes whose image was replaced meanwhile are left alone
+            recipes = [recipe for recipe in recipes if recipe.image.name in results]
+            now = timezone.now()
+            for recipe in recipes:
+                recipe.image = results[recipe.image.name][0]
+                recipe.image_variants = {
+                    variant: images.variant_name(recipe.image.name, variant)
+                    for variant in recipe.image_variants
+                }
+                recipe.modified_at = now
+            Recipe.objects.bulk_update(
+                recipes, ["image", "image_variants", "modified_at"]
+            )
+
+            blobs = list(ImageBlob.objects.filter(name__in=list(results)))
+            for blob in blobs:
+                blob.name = results[blob.name][0]
+            ImageBlob.objects.bulk_update(blobs, ["name"])
+
+        cache.bump_versions([recipe.id for recipe in recipes])
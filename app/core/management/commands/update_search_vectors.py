@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+from recipe import search
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the stored search vectors of all recipes in batches of ids,
+    e.g. after RECIPE_SEARCH_CONFIG or the search weights changed.
+    Every batch is its own UPDATE, so rows are not locked for the whole run.
+    Example:
+        manage.py update_search_vectors --batch-size 2000
+    """
+
+    help = "Rebuild the full-text search vectors of recipes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        updated = 0
+        last_id = 0
+        while True:
+            batch = list(
+                Recipe.objects.filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", flat=True)[: options["batch_size"]]
+            )
+            if not batch:
+                break
+            last_id = batch[-1]
+            search.update_search_vectors(batch)
+            updated += len(batch)
+            self.stdout.write(f"Updated {updated} recipes, up to recipe {last_id}")
+
+        self.stdout.write(self.style.SUCCESS(f"Done, updated {updated} recipes"))
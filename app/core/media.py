@@ -0,0 +1,132 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+class FileRange:
+    """Read at most ``length`` bytes of a file from its current position
+
+    Keeps fileno() so servers that use sendfile, e.g. gunicorn, still send
+    the range without copying it through Python.
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """Return the (first, last) byte of a single range request
+
+    Returns None when the whole file should be sent, multiple or malformed
+    ranges are ignored as RFC 7233 allows.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if match is None or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first == "":
+        if int(last) == 0 or size == 0:
+            raise RangeNotSatisfiable()
+        return max(size - int(last), 0), size - 1
+    first = int(first)
+    if last and int(last) < first:
+        return None
+    if first >= size:
+        raise RangeNotSatisfiable()
+    return first, min(int(last), size - 1) if last else size - 1
+
+
+def cache_headers(response, stat):
+    # Upload names are never reused for other content
+    max_age = settings.MEDIA_CACHE_MAX_AGE
+    response["Cache-Control"] = f"public, max-age={max_age}, immutable"
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    return response
+
+
+@require_safe
+def serve(request, path):
+    """Serve an uploaded file from MEDIA_ROOT
+
+    MEDIA_SERVE_MODE "x-accel" and "x-sendfile" hand the transfer to nginx
+    or Apache, "python" streams the file from this process with support for
+    single byte ranges.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404("File not found")
+    if not os.path.isfile(full_path):
+        raise Http404("File not found")
+
+    if not was_modified_since(
+        request.META.get("HTTP_IF_MODIFIED_SINCE"), stat.st_mtime
+    ):
+        return cache_headers(HttpResponseNotModified(), stat)
+
+    content_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+    mode = settings.MEDIA_SERVE_MODE
+    if mode == "x-accel":
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = quote(settings.MEDIA_ACCEL_PREFIX + path)
+        return cache_headers(response, stat)
+    if mode == "x-sendfile":
+        response = HttpResponse(content_type=content_type)
+        response["X-Sendfile"] = full_path
+        return cache_headers(response, stat)
+
+    size = stat.st_size
+    byte_range = None
+    # A range of an older copy of the file must not be mixed with this one
+    last_modified = http_date(stat.st_mtime)
+    if request.META.get("HTTP_IF_RANGE", last_modified) == last_modified:
+        try:
+            byte_range = parse_range(request.META.get("HTTP_RANGE"), size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+    file = open(full_path, "rb")
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        first, last = byte_range
+        file.seek(first)
+        response = FileResponse(
+            FileRange(file, last - first + 1), content_type=content_type, status=206
+        )
+        response["Content-Length"] = last - first + 1
+        response["Content-Range"] = f"bytes {first}-{last}/{size}"
+    response["Accept-Ranges"] = "bytes"
+    return cache_headers(response, stat)
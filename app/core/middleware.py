@@ -0,0 +1,76 @@
+import asyncio
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+from core.db.routers import RoutingState, routing_state
+
+
+def sticky_key(request):
+    """Cache key of the client sending the request, None if anonymous"""
+    credentials = request.META.get("HTTP_AUTHORIZATION") or request.COOKIES.get(
+        settings.SESSION_COOKIE_NAME
+    )
+    if not credentials:
+        return None
+    return "db-primary:" + hashlib.sha256(credentials.encode()).hexdigest()
+
+
+class ReadReplicaMiddleware:
+    """Let core.db.routers send the reads of safe requests to a replica
+
+    A client that wrote reads from the primary for the next
+    DATABASE_REPLICA_STICKY_SECONDS, so it sees its own writes while the
+    replicas catch up. Clients are told apart by their token or session.
+    Runs without a thread switch in front of async views.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Marks the instance as a coroutine function, as Django's
+            # MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+
+        key = sticky_key(request)
+        state = routing_state_for(request, key is not None and cache.get(key))
+        token = routing_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            routing_state.reset(token)
+        if state.wrote and key is not None:
+            cache.set(key, True, settings.DATABASE_REPLICA_STICKY_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return await self.get_response(request)
+
+        key = sticky_key(request)
+        state = routing_state_for(request, key is not None and await cache.aget(key))
+        token = routing_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            routing_state.reset(token)
+        if state.wrote and key is not None:
+            await cache.aset(key, True, settings.DATABASE_REPLICA_STICKY_SECONDS)
+        return response
+
+
+def routing_state_for(request, sticky):
+    """Return the routing state of a request, ``sticky`` if its client wrote"""
+    return RoutingState(use_primary=request.method not in SAFE_METHODS or bool(sticky))
@@ -0,0 +1,39 @@
+# Generated by Django 4.0.4 on 2026-10-18 05:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_recipe_image"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="ingredient",
+            index=models.Index(
+                fields=["user", "-name", "-id"], name="core_ingredient_user_name_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(fields=["user", "-id"], name="core_recipe_user_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="tag",
+            index=models.Index(
+                fields=["user", "-name", "-id"], name="core_tag_user_name_idx"
+            ),
+        ),
+        migrations.RunSQL(
+            sql="CREATE INDEX core_recipe_tags_tag_recipe_idx "
+            "ON core_recipe_tags (tag_id, recipe_id)",
+            reverse_sql="DROP INDEX core_recipe_tags_tag_recipe_idx",
+        ),
+        migrations.RunSQL(
+            sql="CREATE INDEX core_recipe_ingredients_ingredient_recipe_idx "
+            "ON core_recipe_ingredients (ingredient_id, recipe_id)",
+            reverse_sql="DROP INDEX core_recipe_ingredients_ingredient_recipe_idx",
+        ),
+    ]
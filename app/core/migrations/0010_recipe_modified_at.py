@@ -0,0 +1,18 @@
+# Generated by Django 4.0.4 on 2026-10-18 05:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_list_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="modified_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
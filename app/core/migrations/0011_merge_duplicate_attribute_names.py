@@ -0,0 +1,52 @@
+# Generated by Django 4.0.4 on 2026-10-18 05:59
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """Link recipes to the oldest of same named tags and ingredients"""
+    Recipe = apps.get_model("core", "Recipe")
+    for relation, model_name in (("tags", "Tag"), ("ingredients", "Ingredient")):
+        Model = apps.get_model("core", model_name)
+        field = Recipe._meta.get_field(relation)
+        through = field.remote_field.through
+        target_column = f"{field.m2m_reverse_field_name()}_id"
+        duplicates = (
+            Model.objects.values("user", "name")
+            .annotate(keep=Min("id"), count=Count("id"))
+            .filter(count__gt=1)
+        )
+        for duplicate in duplicates:
+            keep = duplicate["keep"]
+            merged = list(
+                Model.objects.filter(user=duplicate["user"], name=duplicate["name"])
+                .exclude(id=keep)
+                .values_list("id", flat=True)
+            )
+            linked = set(
+                through.objects.filter(**{target_column: keep}).values_list(
+                    "recipe_id", flat=True
+                )
+            )
+            recipe_ids = set(
+                through.objects.filter(**{f"{target_column}__in": merged}).values_list(
+                    "recipe_id", flat=True
+                )
+            )
+            through.objects.bulk_create(
+                through(recipe_id=recipe_id, **{target_column: keep})
+                for recipe_id in recipe_ids - linked
+            )
+            Model.objects.filter(id__in=merged).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0010_recipe_modified_at"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_names, migrations.RunPython.noop),
+    ]
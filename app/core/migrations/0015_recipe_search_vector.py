@@ -0,0 +1,77 @@
+# Generated by Django 4.0.4 on 2026-10-18 07:00
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+BATCH_SIZE = 1000
+
+
+def fill_search_vectors(apps, schema_editor):
+    """Build the documents like recipe.search.search_document at this point
+
+    Every batch of ids is its own UPDATE, so rows are not locked for the
+    whole backfill.
+    """
+    Recipe = apps.get_model("core", "Recipe")
+    config = settings.RECIPE_SEARCH_CONFIG
+    document = SearchVector("title", weight="A", config=config)
+    for relation, target, weight in [
+        ("tags", "tag", "B"),
+        ("ingredients", "ingredient", "C"),
+    ]:
+        through = Recipe._meta.get_field(relation).remote_field.through
+        names = (
+            through.objects.filter(recipe=OuterRef("pk"))
+            .values("recipe")
+            .annotate(names=StringAgg(f"{target}__name", " "))
+            .values("names")
+        )
+        document += SearchVector(Subquery(names), weight=weight, config=config)
+    last_id = 0
+    while True:
+        batch = list(
+            Recipe.objects.filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", flat=True)[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        Recipe.objects.filter(id__gt=last_id, id__lte=batch[-1]).update(
+            search_vector=document
+        )
+        last_id = batch[-1]
+
+
+class Migration(migrations.Migration):
+    # The backfill commits per batch and the index is built without
+    # blocking writes, neither can run in a transaction
+    atomic = False
+
+    dependencies = [
+        ("core", "0014_imageblob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        # Filled before the index is built, which is faster than updating it
+        migrations.RunPython(fill_search_vectors, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name="recipe",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="core_recipe_search_idx"
+            ),
+        ),
+    ]
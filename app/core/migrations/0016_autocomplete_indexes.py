@@ -0,0 +1,75 @@
+# Generated by Django 4.0.4 on 2026-10-18 07:10
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.expressions
+import django.db.models.functions.text
+from django.db import migrations, models
+
+TRIGRAM_TABLES = ("core_tag", "core_ingredient")
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # Only built where pg_trgm can be installed, see RECIPE_AUTOCOMPLETE_TRIGRAM
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for table in TRIGRAM_TABLES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{table}_trgm_idx" '
+            f'ON "{table}" USING gin ("name" gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    for table in TRIGRAM_TABLES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{table}_trgm_idx"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0015_recipe_search_vector"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="ingredient",
+            index=models.Index(
+                django.db.models.expressions.F("user"),
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("name"),
+                    name="text_pattern_ops",
+                ),
+                name="core_ingredient_prefix_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="ingredient",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.search.SearchVector("name", config="simple"),
+                name="core_ingredient_words_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tag",
+            index=models.Index(
+                django.db.models.expressions.F("user"),
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("name"),
+                    name="text_pattern_ops",
+                ),
+                name="core_tag_prefix_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tag",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.search.SearchVector("name", config="simple"),
+                name="core_tag_words_idx",
+            ),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.0.4 on 2026-10-18 07:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0016_autocomplete_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["user", "price", "id"], name="core_recipe_user_price_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["user", "minutes_to_cook", "id"],
+                name="core_recipe_user_minutes_idx",
+            ),
+        ),
+    ]
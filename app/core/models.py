@@ -1,6 +1,10 @@
 import uuid
 import os
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Upper
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
@@ -8,15 +12,21 @@ from django.contrib.auth.models import (
     User,
 )
 from django.core.validators import validate_email
+from django.utils import timezone
 from typing import Optional, Any
 from django.conf import settings
 
 
+def sharded_path(directory, filename):
+    """Return the path of a file under two levels of prefix subdirectories"""
+    return os.path.join(directory, filename[:2], filename[2:4], filename)
+
+
 def recipe_image_file_path(instance, filename):
     """Generate filepath for the new recipe image"""
     ext = filename.split(".")[-1]
     filename = f"{uuid.uuid4()}.{ext}"
-    return os.path.join("uploads/recipe/", filename)
+    return sharded_path("uploads/recipe/", filename)
 
 
 class UserManager(BaseUserManager):
@@ -46,6 +56,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # Last write to the recipes of the user, validates their cached lists
+    recipes_changed_at = models.DateTimeField(default=timezone.now, editable=False)
 
     objects = UserManager()
     USERNAME_FIELD = "email"
@@ -57,6 +69,24 @@ class Tag(models.Model):
     name = models.CharField(max_length=255)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "-name", "-id"], name="core_tag_user_name_idx"
+            ),
+            models.Index(
+                F("user"),
+                OpClass(Upper("name"), name="text_pattern_ops"),
+                name="core_tag_prefix_idx",
+            ),
+            GinIndex(SearchVector("name", config="simple"), name="core_tag_words_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "name"], name="core_tag_unique_user_name"
+            )
+        ]
+
     def __str__(self):
         return self.name
 
@@ -67,6 +97,37 @@ class Ingredient(models.Model):
     name = models.CharField(max_length=255)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "-name", "-id"], name="core_ingredient_user_name_idx"
+            ),
+            models.Index(
+                F("user"),
+                OpClass(Upper("name"), name="text_pattern_ops"),
+                name="core_ingredient_prefix_idx",
+            ),
+            GinIndex(
+                SearchVector("name", config="simple"), name="core_ingredient_words_idx"
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "name"], name="core_ingredient_unique_user_name"
+            )
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class ImageBlob(models.Model):
+    """Image file shared by every recipe that uploaded the same content"""
+
+    digest = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255, unique=True)
+    refs = models.PositiveIntegerField(default=1)
+
     def __str__(self):
         return self.name
 
@@ -74,6 +135,12 @@ class Ingredient(models.Model):
 class Recipe(models.Model):
     """Recipe object"""
 
+    class ImageStatus(models.TextChoices):
+        NONE = "none"
+        PENDING = "pending"
+        READY = "ready"
+        FAILED = "failed"
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     title = models.CharField(max_length=255)
     minutes_to_cook = models.IntegerField()
@@ -82,6 +149,26 @@ class Recipe(models.Model):
     ingredients = models.ManyToManyField("Ingredient")
     tags = models.ManyToManyField("Tag")
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image_status = models.CharField(
+        max_length=10, choices=ImageStatus.choices, default=ImageStatus.NONE
+    )
+    image_variants = models.JSONField(default=dict, blank=True)
+    modified_at = models.DateTimeField(auto_now=True)
+    # Title, tag and ingredient names, maintained by recipe.search
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-id"], name="core_recipe_user_id_idx"),
+            models.Index(
+                fields=["user", "price", "id"], name="core_recipe_user_price_idx"
+            ),
+            models.Index(
+                fields=["user", "minutes_to_cook", "id"],
+                name="core_recipe_user_minutes_idx",
+            ),
+            GinIndex(fields=["search_vector"], name="core_recipe_search_idx"),
+        ]
 
     def __str__(self):
         return self.title
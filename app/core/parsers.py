@@ -0,0 +1,32 @@
+import codecs
+import io
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from core.renderers import FastJSONRenderer, orjson
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser decoding with orjson when it is installed
+
+    Bodies in other encodings than UTF-8 and numbers out of the range of a
+    double are left to the stdlib decoder. Integers over 64 bits are parsed
+    as floats.
+    """
+
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        if orjson is None or codecs.lookup(encoding).name != "utf-8":
+            return super().parse(stream, media_type, parser_context)
+        body = stream.read()
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError as exc:
+            if not str(exc).startswith("number"):
+                raise ParseError(f"JSON parse error - {exc}")
+        return super().parse(io.BytesIO(body), media_type, parser_context)
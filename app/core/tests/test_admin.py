@@ -1,6 +1,8 @@
 import pytest
 from django.urls import reverse
 
+from helpers.test_helpers import create_sample_recipe
+
 
 @pytest.mark.django_db
 def test_users_listed(setup_admin, client):
@@ -30,3 +32,14 @@ def test_create_user_page(setup_admin, client):
     url = reverse("admin:core_user_add")
     r = client.get(url)
     assert r.status_code == 200
+
+
+@pytest.mark.django_db
+def test_recipe_image_read_only(setup_admin, client):
+    """Test that the recipe edit page cannot replace the image"""
+    recipe = create_sample_recipe(user=setup_admin["user"])
+    url = reverse("admin:core_recipe_change", args=[recipe.id])
+    r = client.get(url)
+
+    assert r.status_code == 200
+    assert 'name="image"' not in r.content.decode()
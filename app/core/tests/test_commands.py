@@ -0,0 +1,142 @@
+import io
+import os
+import uuid
+from datetime import timedelta
+
+import pytest
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.utils import timezone
+from PIL import Image
+
+from core.models import ImageBlob, Recipe
+from helpers.test_helpers import create_sample_recipe, create_user
+from recipe import images
+
+
+def flat_image(recipe, variants=("thumbnail",)):
+    """Store an image of a recipe in the flat pre-sharding layout"""
+    stem = str(uuid.uuid4())
+    name = default_storage.save(f"uploads/recipe/{stem}.jpg", ContentFile(b"image"))
+    recipe.image = name
+    recipe.image_variants = {}
+    for variant in variants:
+        recipe.image_variants[variant] = default_storage.save(
+            f"{images.VARIANTS_DIR}{stem}_{variant}.jpg", ContentFile(b"variant")
+        )
+    recipe.save()
+    return name
+
+
+@pytest.fixture()
+def recipes():
+    user = create_user(email="test@londonappdev.com", password="testpass", name="name")
+    recipes = [create_sample_recipe(user=user) for _ in range(3)]
+    yield recipes
+    for recipe in Recipe.objects.all():
+        images.delete_variants(recipe.image.name)
+        recipe.image.delete()
+
+
+@pytest.mark.django_db
+class TestShardRecipeImages:
+    """Test moving recipe images to the sharded layout"""
+
+    def test_images_moved(self, recipes):
+        """Test that files move and the rows point to the new place"""
+        names = [flat_image(recipe) for recipe in recipes]
+
+        call_command("shard_recipe_images", batch_size=2, stdout=io.StringIO())
+
+        for recipe, name in zip(recipes, names):
+            recipe.refresh_from_db()
+            filename = os.path.basename(name)
+            assert recipe.image.name == (
+                f"uploads/recipe/{filename[:2]}/{filename[2:4]}/{filename}"
+            )
+            assert default_storage.exists(recipe.image.name)
+            assert not default_storage.exists(name)
+            assert recipe.image_variants == {
+                "thumbnail": images.variant_name(recipe.image.name, "thumbnail")
+            }
+            assert default_storage.exists(recipe.image_variants["thumbnail"])
+
+    def test_interrupted_run_resumed(self, recipes):
+        """Test that a file moved before its row was updated is picked up"""
+        recipe = recipes[0]
+        name = flat_image(recipe, variants=())
+        filename = os.path.basename(name)
+        new_name = f"uploads/recipe/{filename[:2]}/{filename[2:4]}/{filename}"
+        os.makedirs(os.path.dirname(default_storage.path(new_name)))
+        os.replace(default_storage.path(name), default_storage.path(new_name))
+
+        call_command("shard_recipe_images", stdout=io.StringIO())
+
+        recipe.refresh_from_db()
+        assert recipe.image.name == new_name
+
+    def test_shared_image_moved_once(self, recipes):
+        """Test that every recipe and the blob of a shared image are updated"""
+        name = flat_image(recipes[0], variants=())
+        for recipe in recipes[1:]:
+            recipe.image = name
+            recipe.save()
+        ImageBlob.objects.create(digest="digest", name=name, refs=len(recipes))
+
+        call_command("shard_recipe_images", batch_size=1, stdout=io.StringIO())
+
+        new_names = {recipe.image.name for recipe in Recipe.objects.all()}
+        assert len(new_names) == 1
+        assert ImageBlob.objects.get().name in new_names
+        assert default_storage.exists(new_names.pop())
+
+
+@pytest.mark.django_db
+class TestUpdateSearchVectors:
+    """Test rebuilding the recipe search vectors"""
+
+    def test_vectors_rebuilt(self, recipes):
+        """Test that every recipe gets its vector back"""
+        Recipe.objects.update(search_vector=None)
+
+        call_command("update_search_vectors", batch_size=2, stdout=io.StringIO())
+
+        assert not Recipe.objects.filter(search_vector=None).exists()
+        assert Recipe.objects.filter(search_vector="sample").count() == 3
+
+
+@pytest.mark.django_db(transaction=True)
+class TestGeneratePendingVariants:
+    """Test generating the variants of recipes left pending"""
+
+    def test_stale_pending_generated(self, recipes):
+        """Test that only recipes pending for long enough are processed"""
+        content = io.BytesIO()
+        Image.new("RGB", (500, 500)).save(content, format="JPEG")
+        for recipe in recipes:
+            recipe.image.save("image.jpg", ContentFile(content.getvalue()))
+        Recipe.objects.update(image_status=Recipe.ImageStatus.PENDING)
+        stale = recipes[:2]
+        Recipe.objects.filter(id__in=[recipe.id for recipe in stale]).update(
+            modified_at=timezone.now() - timedelta(hours=1)
+        )
+
+        call_command(
+            "generate_pending_variants",
+            older_than=60,
+            batch_size=1,
+            stdout=io.StringIO(),
+        )
+
+        for recipe in recipes:
+            recipe.refresh_from_db()
+        assert [recipe.image_status for recipe in recipes] == [
+            Recipe.ImageStatus.READY,
+            Recipe.ImageStatus.READY,
+            Recipe.ImageStatus.PENDING,
+        ]
+        for recipe in stale:
+            assert set(recipe.image_variants) == set(settings.RECIPE_IMAGE_VARIANTS)
+            assert all(map(default_storage.exists, recipe.image_variants.values()))
@@ -0,0 +1,220 @@
+import threading
+
+import pytest
+from django.db import InterfaceError, OperationalError, connections
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.db.pool import ConnectionPool, PoolTimeout
+from core.db.postgresql import base
+from helpers.test_helpers import create_user
+
+POOLS_URL = reverse("db-pools")
+
+
+class Connection:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def open_connections():
+    opened = []
+
+    def connect():
+        opened.append(Connection())
+        return opened[-1]
+
+    return opened, connect
+
+
+class TestConnectionPool:
+    """Test the bounded connection pool"""
+
+    def test_connection_reused(self):
+        """Test that a returned connection is handed out again"""
+        opened, connect = open_connections()
+        pool = ConnectionPool(connect, max_size=2, timeout=1)
+
+        connection = pool.checkout()
+        pool.checkin(connection)
+
+        assert pool.checkout() is connection
+        assert len(opened) == 1
+        assert pool.stats()["in_use"] == 1
+        assert pool.stats()["checkouts"] == 2
+
+    def test_checkout_times_out_when_exhausted(self):
+        """Test that no more than max_size connections are opened"""
+        opened, connect = open_connections()
+        pool = ConnectionPool(connect, max_size=2, timeout=0.05)
+        pool.checkout()
+        pool.checkout()
+
+        with pytest.raises(PoolTimeout):
+            pool.checkout()
+
+        assert len(opened) == 2
+        assert pool.stats()["timeouts"] == 1
+        assert pool.stats()["waiting"] == 0
+
+    def test_waiting_checkout_gets_returned_connection(self):
+        """Test that a waiting thread gets the next returned connection"""
+        opened, connect = open_connections()
+        pool = ConnectionPool(connect, max_size=1, timeout=5)
+        connection = pool.checkout()
+        result = []
+        waiter = threading.Thread(target=lambda: result.append(pool.checkout()))
+        waiter.start()
+        while pool.stats()["waiting"] == 0:
+            waiter.join(0.01)
+
+        pool.checkin(connection)
+        waiter.join()
+
+        assert result == [connection]
+        assert pool.stats()["checkout_max_ms"] > 0
+
+    def test_unusable_connections_replaced(self):
+        """Test that connections failing reset or check are discarded"""
+        opened, connect = open_connections()
+        pool = ConnectionPool(
+            connect,
+            max_size=1,
+            timeout=1,
+            reset=lambda connection: connection is not opened[0],
+            check=lambda connection: not connection.closed,
+        )
+        pool.checkin(pool.checkout())
+        second = pool.checkout()
+        pool.checkin(second)
+        second.closed = True
+
+        third = pool.checkout()
+
+        assert opened[0].closed
+        assert len(opened) == 3 and third is opened[2]
+        assert pool.stats()["size"] == 1
+
+    def test_failed_connect_frees_slot(self):
+        """Test that a connection error does not leak a slot"""
+
+        def connect():
+            raise OSError("refused")
+
+        pool = ConnectionPool(connect, max_size=1, timeout=0.05)
+
+        for _ in range(2):
+            with pytest.raises(OSError):
+                pool.checkout()
+
+        assert pool.stats()["size"] == 0
+
+
+@pytest.fixture()
+def database_wrapper():
+    """Build wrappers of the test database with other settings"""
+    wrappers = []
+    # Connection signal handlers look the alias up
+    connections.settings["test-pool"] = connections["default"].settings_dict
+
+    def build(**settings):
+        settings_dict = {**connections["default"].settings_dict, **settings}
+        wrappers.append(base.DatabaseWrapper(settings_dict, alias="test-pool"))
+        return wrappers[-1]
+
+    yield build
+    for wrapper in wrappers:
+        wrapper.close()
+    # Including the connection those handlers opened for the alias
+    connections["test-pool"].close()
+    del connections["test-pool"]
+    del connections.settings["test-pool"]
+    pool = base.pools.pop("test-pool", None)
+    if pool is not None:
+        pool.close()
+
+
+@pytest.mark.django_db(transaction=True)
+class TestDatabaseWrapper:
+    """Test the PostgreSQL backend"""
+
+    def test_pooled_connection_reused(self, database_wrapper):
+        """Test that closing returns the connection to the pool"""
+        wrapper = database_wrapper(POOL={"MAX_SIZE": 1, "TIMEOUT": 0.05})
+        wrapper.ensure_connection()
+        connection = wrapper.connection
+        wrapper.set_autocommit(False)
+        wrapper.cursor().execute("SELECT 1")
+        wrapper.close()
+        other = database_wrapper(POOL={"MAX_SIZE": 1, "TIMEOUT": 0.05})
+
+        other.ensure_connection()
+
+        assert other.connection is connection
+        assert other.get_autocommit()
+        assert base.pools["test-pool"].stats()["in_use"] == 1
+        # The pool is exhausted while the connection is checked out
+        with pytest.raises(OperationalError):
+            database_wrapper(POOL={"MAX_SIZE": 1, "TIMEOUT": 0.05}).ensure_connection()
+
+    def test_health_check_replaces_dropped_connection(self, database_wrapper):
+        """Test that a persistent connection is checked in a new request"""
+        wrapper = database_wrapper(CONN_MAX_AGE=60, CONN_HEALTH_CHECKS=True)
+        wrapper.ensure_connection()
+        dropped = wrapper.connection
+        dropped.close()
+
+        wrapper.close_if_unusable_or_obsolete()
+        with wrapper.cursor() as cursor:
+            cursor.execute("SELECT 1")
+
+        assert wrapper.connection is not dropped
+
+    def test_health_check_once_per_request(self, database_wrapper):
+        """Test that a healthy connection is only pinged once"""
+        wrapper = database_wrapper(CONN_MAX_AGE=60, CONN_HEALTH_CHECKS=True)
+        wrapper.ensure_connection()
+        wrapper.close_if_unusable_or_obsolete()
+        wrapper.cursor().execute("SELECT 1")
+        connection = wrapper.connection
+        connection.close()
+
+        with pytest.raises(InterfaceError):
+            wrapper.cursor()
+
+
+@pytest.mark.django_db
+class TestDatabasePoolStats:
+    """Test the pool metrics endpoint"""
+
+    def test_staff_only(self):
+        """Test that regular users cannot see the metrics"""
+        user = create_user(email="test@londonappdev.com", password="testpass")
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=user)}"
+        )
+
+        res = client.get(POOLS_URL)
+
+        assert res.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_stats_by_alias(self):
+        """Test that databases without a pool are reported as null"""
+        user = create_user(
+            email="admin@londonappdev.com", password="testpass", is_staff=True
+        )
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=user)}"
+        )
+
+        res = client.get(POOLS_URL)
+
+        assert res.status_code == status.HTTP_200_OK
+        assert res.json() == {"default": None}
@@ -0,0 +1,122 @@
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from django.utils.http import http_date
+
+CONTENT = b"0123456789"
+
+
+@pytest.fixture()
+def media_file():
+    name = default_storage.save("uploads/test/image.jpg", ContentFile(CONTENT))
+    yield name
+    default_storage.delete(name)
+
+
+def media_url(name):
+    return reverse("media", args=[name])
+
+
+class TestServeMedia:
+    """Test serving uploaded files"""
+
+    def test_whole_file(self, client, media_file):
+        """Test that a file is sent with immutable caching headers"""
+        res = client.get(media_url(media_file))
+
+        assert res.status_code == 200
+        assert b"".join(res.streaming_content) == CONTENT
+        assert res["Content-Type"] == "image/jpeg"
+        assert res["Content-Length"] == str(len(CONTENT))
+        assert res["Accept-Ranges"] == "bytes"
+        assert res["Cache-Control"] == "public, max-age=31536000, immutable"
+
+    @pytest.mark.parametrize(
+        "header,content,content_range",
+        [
+            ("bytes=2-5", b"2345", "bytes 2-5/10"),
+            ("bytes=7-", b"789", "bytes 7-9/10"),
+            ("bytes=-3", b"789", "bytes 7-9/10"),
+            ("bytes=8-100", b"89", "bytes 8-9/10"),
+        ],
+    )
+    def test_range(self, client, media_file, header, content, content_range):
+        """Test that a single byte range is sent as partial content"""
+        res = client.get(media_url(media_file), HTTP_RANGE=header)
+
+        assert res.status_code == 206
+        assert b"".join(res.streaming_content) == content
+        assert res["Content-Length"] == str(len(content))
+        assert res["Content-Range"] == content_range
+
+    @pytest.mark.parametrize("header", ["bytes=10-", "bytes=-0"])
+    def test_range_not_satisfiable(self, client, media_file, header):
+        """Test that a range outside of the file is rejected"""
+        res = client.get(media_url(media_file), HTTP_RANGE=header)
+
+        assert res.status_code == 416
+        assert res["Content-Range"] == "bytes */10"
+
+    @pytest.mark.parametrize("header", ["bytes=5-2", "bytes=0-1,4-5", "items=0-1"])
+    def test_unsupported_range_ignored(self, client, media_file, header):
+        """Test that malformed and multiple ranges get the whole file"""
+        res = client.get(media_url(media_file), HTTP_RANGE=header)
+
+        assert res.status_code == 200
+        assert b"".join(res.streaming_content) == CONTENT
+
+    def test_range_of_changed_file_ignored(self, client, media_file):
+        """Test that If-Range with an old date gets the whole file"""
+        res = client.get(
+            media_url(media_file),
+            HTTP_RANGE="bytes=2-5",
+            HTTP_IF_RANGE=http_date(0),
+        )
+
+        assert res.status_code == 200
+        assert b"".join(res.streaming_content) == CONTENT
+
+    def test_not_modified(self, client, media_file):
+        """Test that a cached copy is revalidated without a body"""
+        res = client.get(media_url(media_file))
+
+        res = client.get(
+            media_url(media_file), HTTP_IF_MODIFIED_SINCE=res["Last-Modified"]
+        )
+
+        assert res.status_code == 304
+
+    def test_accel_redirect(self, client, media_file, settings):
+        """Test that nginx is asked to send the file"""
+        settings.MEDIA_SERVE_MODE = "x-accel"
+
+        res = client.get(media_url(media_file))
+
+        assert res.status_code == 200
+        assert res.content == b""
+        assert res["X-Accel-Redirect"] == f"/protected-media/{media_file}"
+        assert res["Content-Type"] == "image/jpeg"
+        assert res["Cache-Control"] == "public, max-age=31536000, immutable"
+
+    def test_sendfile(self, client, media_file, settings):
+        """Test that Apache is asked to send the file"""
+        settings.MEDIA_SERVE_MODE = "x-sendfile"
+
+        res = client.get(media_url(media_file))
+
+        assert res.status_code == 200
+        assert res["X-Sendfile"] == default_storage.path(media_file)
+
+    @pytest.mark.parametrize("name", ["uploads/test/missing.jpg", "../etc/passwd"])
+    def test_missing_file(self, client, name):
+        """Test that missing files and paths outside MEDIA_ROOT are not found"""
+        res = client.get(media_url(name))
+
+        assert res.status_code == 404
+
+    def test_post_not_allowed(self, client, media_file):
+        """Test that only GET and HEAD are allowed"""
+        res = client.post(media_url(media_file))
+
+        assert res.status_code == 405
@@ -73,5 +73,5 @@ class TestModels:
         mock_uuid.return_value = uuid
         file_path = models.recipe_image_file_path(None, "myimage.jpg")
 
-        exp_path = f"uploads/recipe/{uuid}.jpg"
+        exp_path = f"uploads/recipe/te/st/{uuid}.jpg"
         assert file_path == exp_path
@@ -0,0 +1,107 @@
+import datetime
+import io
+import uuid
+from collections import OrderedDict
+from decimal import Decimal
+
+import pytest
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core import parsers, renderers
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer
+
+PAYLOADS = [
+    [],
+    {},
+    OrderedDict([("id", 1), ("price", "5.00"), ("link", ""), ("image", None)]),
+    {"title": 'Crème brûlée ☃ "quoted" </script> \\ \n\t\x01', "tags": [1, 2]},
+    {"separators": "  and  "},
+    {"price": Decimal("5.10"), "ratio": 0.1, "big": 2**63 - 1, "flag": True},
+    {1: "int key", "nested": {"list": (1, 2), "set": [None]}},
+    {
+        "aware": datetime.datetime(2022, 5, 1, 12, 30, tzinfo=datetime.timezone.utc),
+        "naive": datetime.datetime(2022, 5, 1, 12, 30, 15, 123456),
+        "date": datetime.date(2022, 5, 1),
+        "time": datetime.time(12, 30),
+        "duration": datetime.timedelta(minutes=90),
+        "uuid": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+        "lazy": gettext_lazy("This field is required."),
+    },
+    {"huge": 2**80},
+]
+
+
+class TestFastJSONRenderer:
+    """Test the orjson renderer against the DRF one"""
+
+    @pytest.mark.parametrize("data", PAYLOADS)
+    def test_same_bytes(self, data):
+        """Test that the output is the one of JSONRenderer"""
+        assert FastJSONRenderer().render(data) == JSONRenderer().render(data)
+
+    def test_none_rendered_empty(self):
+        """Test that no data renders an empty body"""
+        assert FastJSONRenderer().render(None) == b""
+
+    def test_indent_falls_back(self):
+        """Test that indented output is left to the stdlib encoder"""
+        media_type = "application/json; indent=4"
+
+        assert FastJSONRenderer().render(
+            {"a": [1]}, media_type
+        ) == JSONRenderer().render({"a": [1]}, media_type)
+
+    def test_stdlib_fallback(self, monkeypatch):
+        """Test that the stdlib encoder is used without orjson"""
+        monkeypatch.setattr(renderers, "orjson", None)
+
+        assert FastJSONRenderer().render(PAYLOADS[3]) == JSONRenderer().render(
+            PAYLOADS[3]
+        )
+
+
+class TestFastJSONParser:
+    """Test the orjson parser against the DRF one"""
+
+    @pytest.mark.parametrize(
+        "body",
+        [
+            b"{}",
+            b'{"title": "Cr\\u00e8me \xe2\x98\x83", "tags": [1, 2], "price": "5.00"}',
+            b'[1.5, -2, true, false, null, "\\n"]',
+            b'{"big": 1e400}',
+        ],
+    )
+    def test_same_data(self, body):
+        """Test that bodies are parsed as by JSONParser"""
+        parsed = FastJSONParser().parse(io.BytesIO(body))
+
+        assert parsed == JSONParser().parse(io.BytesIO(body))
+
+    @pytest.mark.parametrize("body", [b"", b'{"a":', b"[NaN]", b"{'a': 1}"])
+    def test_invalid_json(self, body):
+        """Test that invalid bodies are rejected as parse errors"""
+        with pytest.raises(ParseError) as error:
+            FastJSONParser().parse(io.BytesIO(body))
+
+        assert str(error.value.detail).startswith("JSON parse error - ")
+
+    def test_other_encodings(self):
+        """Test that bodies in other encodings are decoded"""
+        body = '{"title": "Crème"}'.encode("latin-1")
+
+        parsed = FastJSONParser().parse(
+            io.BytesIO(body), parser_context={"encoding": "latin-1"}
+        )
+
+        assert parsed == {"title": "Crème"}
+
+    def test_stdlib_fallback(self, monkeypatch):
+        """Test that the stdlib decoder is used without orjson"""
+        monkeypatch.setattr(parsers, "orjson", None)
+
+        assert FastJSONParser().parse(io.BytesIO(b'{"a": [1]}')) == {"a": [1]}
@@ -0,0 +1,185 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.db.routers import PrimaryReplicaRouter, RoutingState, routing_state
+from core.models import Recipe
+from helpers.test_helpers import create_user, create_sample_recipe
+from user.authentication import token_cache
+
+RECIPES_URL = reverse("recipe:recipe-list")
+TOKEN_URL = reverse("user:token")
+
+
+@pytest.fixture()
+def replica(settings):
+    """A second connection to the test database standing in for a replica"""
+    connections.settings["replica"] = {**connections["default"].settings_dict}
+    settings.DATABASE_REPLICAS = ["replica"]
+    cache.clear()
+    token_cache.clear()
+    yield connections["replica"]
+    connections["replica"].close()
+    del connections["replica"]
+    del connections.settings["replica"]
+    cache.clear()
+    token_cache.clear()
+
+
+def read_with(state, model=Recipe):
+    token = routing_state.set(state)
+    try:
+        return PrimaryReplicaRouter().db_for_read(model)
+    finally:
+        routing_state.reset(token)
+
+
+class TestPrimaryReplicaRouter:
+    """Test the database router"""
+
+    def test_reads_of_safe_requests_use_replicas(self, settings):
+        """Test that reads are spread over the replicas"""
+        settings.DATABASE_REPLICAS = ["replica1", "replica2"]
+
+        aliases = {read_with(RoutingState(use_primary=False)) for _ in range(50)}
+
+        assert aliases == {"replica1", "replica2"}
+
+    def test_reads_outside_requests_use_primary(self, settings):
+        """Test that commands and background jobs read from the primary"""
+        settings.DATABASE_REPLICAS = ["replica1"]
+
+        assert PrimaryReplicaRouter().db_for_read(Recipe) == "default"
+        assert read_with(RoutingState(use_primary=True)) == "default"
+
+    def test_reads_after_write_use_primary(self, settings):
+        """Test that a request reads its own writes"""
+        settings.DATABASE_REPLICAS = ["replica1"]
+        state = RoutingState(use_primary=False)
+        token = routing_state.set(state)
+        try:
+            assert PrimaryReplicaRouter().db_for_write(Recipe) == "default"
+        finally:
+            routing_state.reset(token)
+
+        assert state.wrote
+        assert read_with(state) == "default"
+
+    def test_auth_reads_use_primary(self, settings):
+        """Test that tokens and users are read from the primary"""
+        settings.DATABASE_REPLICAS = ["replica1"]
+        state = RoutingState(use_primary=False)
+
+        assert read_with(state, Token) == "default"
+        assert read_with(state, get_user_model()) == "default"
+
+    def test_no_migrations_on_replicas(self, settings):
+        """Test that replicas are left to replication"""
+        settings.DATABASE_REPLICAS = ["replica1"]
+        router = PrimaryReplicaRouter()
+
+        assert router.allow_migrate("replica1", "core") is False
+        assert router.allow_migrate("default", "core") is None
+
+
+@pytest.mark.django_db(transaction=True)
+class TestReadReplicaMiddleware:
+    """Test the routing of API requests"""
+
+    def client_for(self, email):
+        user = create_user(email=email, password="testpass")
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=user)}"
+        )
+        return user, client
+
+    def test_safe_requests_read_from_replica(self, replica):
+        """Test that a GET reads its data from the replica"""
+        user, client = self.client_for("test@londonappdev.com")
+        create_sample_recipe(user=user)
+
+        with CaptureQueriesContext(connections["default"]) as primary:
+            with CaptureQueriesContext(replica) as replica_queries:
+                res = client.get(RECIPES_URL)
+
+        assert res.status_code == status.HTTP_200_OK
+        assert len(res.json()) == 1
+        # Only the token lookup authenticating the request
+        assert ["authtoken_token" in query["sql"] for query in primary] == [True]
+        assert len(replica_queries) > 0
+
+    def test_writer_sticks_to_primary(self, replica, settings):
+        """Test that reads after a write stay on the primary for a while"""
+        user, client = self.client_for("test@londonappdev.com")
+        other_user, other = self.client_for("other@londonappdev.com")
+        payload = {"title": "Cake", "minutes_to_cook": 5, "price": "5.00"}
+
+        with CaptureQueriesContext(replica) as replica_queries:
+            res = client.post(RECIPES_URL, payload)
+            client.get(RECIPES_URL)
+
+        assert res.status_code == status.HTTP_201_CREATED
+        assert len(replica_queries) == 0
+
+        with CaptureQueriesContext(replica) as replica_queries:
+            other.get(RECIPES_URL)
+
+        assert len(replica_queries) > 0
+
+    def test_new_token_accepted_right_away(self, replica):
+        """Test that a token just issued is not looked up on a replica"""
+        create_user(email="test@londonappdev.com", password="testpass")
+        client = APIClient()
+        res = client.post(
+            TOKEN_URL, {"email": "test@londonappdev.com", "password": "testpass"}
+        )
+        client.credentials(HTTP_AUTHORIZATION=f"Token {res.data['token']}")
+
+        with CaptureQueriesContext(replica) as replica_queries:
+            res = client.get(RECIPES_URL)
+
+        assert res.status_code == status.HTTP_200_OK
+        assert not any("authtoken_token" in query["sql"] for query in replica_queries)
+
+    def test_stickiness_expires(self, replica, settings):
+        """Test that reads go back to the replica after the window"""
+        settings.DATABASE_REPLICA_STICKY_SECONDS = 0
+        user, client = self.client_for("test@londonappdev.com")
+        client.post(RECIPES_URL, {"title": "Cake", "minutes_to_cook": 5, "price": 5})
+
+        with CaptureQueriesContext(replica) as replica_queries:
+            client.get(RECIPES_URL)
+
+        assert len(replica_queries) > 0
+
+    def test_async_requests(self, replica):
+        """Test that the async path routes reads and sticks after writes"""
+        user, client = self.client_for("test@londonappdev.com")
+        create_sample_recipe(user=user)
+        key = Token.objects.get(user=user).key
+        url = reverse("recipe:recipe-async-list")
+
+        async def get():
+            return await AsyncClient().get(url, authorization=f"Token {key}")
+
+        with CaptureQueriesContext(replica) as replica_queries:
+            res = async_to_sync(get)()
+
+        assert res.status_code == status.HTTP_200_OK
+        assert len(replica_queries) > 0
+
+        client.post(RECIPES_URL, {"title": "Cake", "minutes_to_cook": 5, "price": 5})
+        with CaptureQueriesContext(replica) as replica_queries:
+            res = async_to_sync(get)()
+
+        assert len(res.json()) == 2
+        assert len(replica_queries) == 0
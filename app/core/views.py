@@ -0,0 +1,23 @@
+from django.db import connections
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from user.authentication import CachedTokenAuthentication
+
+
+class DatabasePoolStatsView(APIView):
+    """Connection pool metrics of this process, by database alias
+
+    Databases without a pool are reported as null.
+    """
+
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request):
+        stats = {}
+        for alias in connections:
+            pool = getattr(connections[alias], "pool", None)
+            stats[alias] = None if pool is None else pool.stats()
+        return Response(stats)
@@ -0,0 +1,166 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.views import exception_handler
+
+from core.models import Recipe
+from core.renderers import FastJSONRenderer
+from recipe import cache, conditional, rows, serializers, sparse
+from recipe.pagination import KeysetPagination
+from recipe.views import recipe_queryset
+from user.authentication import CachedTokenAuthentication
+
+
+class AsyncAPIView(View):
+    """Token authenticated JSON view with async handlers
+
+    DRF views are synchronous, so under ASGI every request runs them in a
+    thread. These views authenticate, query and render on the event loop,
+    with the async cache and ORM APIs. The request is wrapped in a DRF
+    Request for the helpers shared with the DRF views, and errors are
+    rendered by the DRF exception handler.
+    """
+
+    authentication = CachedTokenAuthentication()
+    renderer = FastJSONRenderer()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Token authenticated API, like the DRF views
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        request = Request(
+            request,
+            parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES],
+        )
+        request.accepted_renderer = self.renderer
+        request.accepted_media_type = self.renderer.media_type
+        self.request = request
+        try:
+            credentials = await self.authentication.aauthenticate(request)
+            if credentials is None:
+                raise exceptions.NotAuthenticated()
+            request.user, request.auth = credentials
+            return await super().dispatch(request, *args, **kwargs)
+        except Exception as exc:
+            return self.handle_exception(exc)
+
+    def http_method_not_allowed(self, request, *args, **kwargs):
+        raise exceptions.MethodNotAllowed(request.method)
+
+    def handle_exception(self, exc):
+        if isinstance(
+            exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)
+        ):
+            exc.auth_header = self.authentication.authenticate_header(self.request)
+        response = exception_handler(exc, {"view": self, "request": self.request})
+        if response is None:
+            raise exc
+        headers = {
+            name: value for name, value in response.items() if name != "Content-Type"
+        }
+        return self.json_response(response.data, response.status_code, headers)
+
+    def json_response(self, data, status=status.HTTP_200_OK, headers=None):
+        return HttpResponse(
+            self.renderer.render(data),
+            status=status,
+            content_type=self.renderer.media_type,
+            headers=headers,
+        )
+
+
+class RecipeListView(AsyncAPIView):
+    """List and create recipes like RecipeViewSet, from async code"""
+
+    async def get(self, request):
+        params = request.query_params
+        fields = sparse.requested_fields(
+            params, serializers.RecipeSerializer.Meta.fields
+        )
+        queryset = recipe_queryset(request.user, params)
+        etag, last_modified = await conditional.alist_validators(request)
+        not_modified = conditional.not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        recipe_rows = rows.recipe_rows(queryset, fields)
+        paginator = KeysetPagination()
+        page = await paginator.apaginate_queryset(recipe_rows, request)
+        if page is not None:
+            data = rows.serialize_rows(page, request, fields)
+            data = paginator.get_paginated_response(data).data
+        else:
+            page = [row async for row in recipe_rows]
+            data = rows.serialize_rows(page, request, fields)
+        response = self.json_response(data)
+        return conditional.set_validators(response, etag, last_modified)
+
+    async def post(self, request):
+        request_serializer = serializers.RecipeSerializer(
+            data=request.data, context={"request": request}
+        )
+        # DRF validation looks the tag and ingredient ids up synchronously
+        if not await sync_to_async(request_serializer.is_valid)():
+            return self.json_response(
+                request_serializer.errors, status.HTTP_400_BAD_REQUEST
+            )
+
+        # Saved like ModelSerializer.create, the relations have no async API
+        data = dict(request_serializer.validated_data)
+        relations = {name: data.pop(name) for name in ("tags", "ingredients")}
+        recipe = await Recipe.objects.acreate(user=request.user, **data)
+        for name, value in relations.items():
+            await sync_to_async(getattr(recipe, name).set)(value)
+
+        recipe = await Recipe.objects.prefetch_related(*rows.RELATIONS_BY_ID).aget(
+            pk=recipe.pk
+        )
+        response_serializer = serializers.RecipeDetailSerializer(recipe)
+        return self.json_response(response_serializer.data, status.HTTP_201_CREATED)
+
+
+class RecipeDetailView(AsyncAPIView):
+    """Retrieve a recipe like RecipeViewSet, from async code"""
+
+    async def get(self, request, pk):
+        fields = sparse.requested_fields(
+            request.query_params, serializers.RecipeDetailSerializer.Meta.fields
+        )
+        # Same cache protocol as RecipeViewSet.retrieve
+        version = await cache.aget_version(pk)
+        entry = await cache.aget_detail(pk, version)
+        if entry is None or entry["user"] != request.user.pk:
+            queryset = recipe_queryset(request.user, request.query_params)
+            try:
+                instance = await queryset.aget(pk=pk)
+            except Recipe.DoesNotExist:
+                raise exceptions.NotFound()
+            if version is None:
+                await cache.aadd_version(instance.pk)
+            entry = {"user": instance.user_id, "modified_at": instance.modified_at}
+        else:
+            instance = None
+
+        etag, last_modified = conditional.detail_validators(
+            pk, entry["modified_at"], fields
+        )
+        not_modified = conditional.not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        if instance is not None:
+            response_serializer = serializers.RecipeDetailSerializer(instance)
+            entry["data"] = dict(response_serializer.data)
+            await cache.aset_detail(instance.pk, version, entry)
+        data = entry["data"]
+        if fields is not None:
+            data = {name: data[name] for name in fields}
+        response = self.json_response(data)
+        return conditional.set_validators(response, etag, last_modified)
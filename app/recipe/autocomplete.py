@@ -0,0 +1,64 @@
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchVector,
+    TrigramWordSimilarity,
+)
+from django.db.models.functions import Length
+
+SHORTEST_FIRST = (Length("name"), "name")
+
+
+def prefix_matches(queryset, text):
+    """Names starting with the text, served by the name prefix indexes"""
+    return queryset.filter(name__istartswith=text).order_by(*SHORTEST_FIRST)
+
+
+def word_matches(queryset, text):
+    """Names with words starting with the words of the text
+
+    Served by the ``simple`` text search indexes on the names.
+    """
+    words = re.findall(r"\w+", text)
+    if not words:
+        return queryset.none()
+    query = SearchQuery(
+        " & ".join(f"{word}:*" for word in words),
+        search_type="raw",
+        config="simple",
+    )
+    return (
+        queryset.annotate(words=SearchVector("name", config="simple"))
+        .filter(words=query)
+        .order_by(*SHORTEST_FIRST)
+    )
+
+
+def similar_matches(queryset, text):
+    """Names with a word similar to the text, served by the trigram indexes"""
+    return (
+        queryset.filter(name__trigram_word_similar=text)
+        .annotate(similarity=TrigramWordSimilarity(text, "name"))
+        .order_by("-similarity", *SHORTEST_FIRST)
+    )
+
+
+def suggest(queryset, text, limit):
+    """Return up to ``limit`` objects whose name matches the typed text
+
+    Prefix matches come first, then word matches and, with
+    RECIPE_AUTOCOMPLETE_TRIGRAM, similar names so typos still find
+    something. A step only runs when the previous ones left places.
+    """
+    steps = [prefix_matches, word_matches]
+    if settings.RECIPE_AUTOCOMPLETE_TRIGRAM:
+        steps.append(similar_matches)
+    matches = []
+    for step in steps:
+        rest = queryset.exclude(pk__in=[obj.pk for obj in matches])
+        matches.extend(step(rest, text)[: limit - len(matches)])
+        if len(matches) >= limit:
+            break
+    return matches
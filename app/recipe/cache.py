@@ -0,0 +1,129 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def version_key(recipe_id):
+    return f"recipe:{recipe_id}:version"
+
+
+def detail_key(recipe_id, version):
+    return f"recipe:{recipe_id}:detail:{version}"
+
+
+def new_version():
+    """Return a version that never matches a payload cached earlier"""
+    return uuid.uuid4().hex
+
+
+def get_version(recipe_id):
+    """Return the current cache version of a recipe, None if it has none
+
+    Always None without CACHE_SHARED, versions bumped by other processes
+    are not seen.
+    """
+    if not settings.CACHE_SHARED:
+        return None
+    return cache.get(version_key(recipe_id))
+
+
+def add_version(recipe_id):
+    """Give a recipe that was just read a version, unless it got one since
+
+    Only called for recipes that exist, so probing ids creates no keys.
+    Payloads are cached from the next read on, which reads the version
+    before the database.
+    """
+    if settings.CACHE_SHARED:
+        cache.add(version_key(recipe_id), new_version(), timeout=None)
+
+
+async def aget_version(recipe_id):
+    """Async version of get_version, for the async views"""
+    if not settings.CACHE_SHARED:
+        return None
+    return await cache.aget(version_key(recipe_id))
+
+
+async def aadd_version(recipe_id):
+    if settings.CACHE_SHARED:
+        await cache.aadd(version_key(recipe_id), new_version(), timeout=None)
+
+
+def bump_versions(recipe_ids):
+    """Invalidate every payload cached for the given recipes"""
+    keys = [version_key(recipe_id) for recipe_id in recipe_ids]
+    if keys:
+        cache.delete_many(keys)
+
+
+def get_detail(recipe_id, version):
+    """Return the cached detail entry of a recipe or None
+
+    An entry is a dict with the owner ``user`` id, the recipe
+    ``modified_at`` timestamp and the serialized ``data``.
+    """
+    if version is None:
+        return None
+    return cache.get(detail_key(recipe_id, version))
+
+
+def set_detail(recipe_id, version, entry):
+    if version is None:
+        return
+    cache.set(
+        detail_key(recipe_id, version),
+        entry,
+        timeout=settings.RECIPE_DETAIL_CACHE_TIMEOUT,
+    )
+
+
+async def aget_detail(recipe_id, version):
+    if version is None:
+        return None
+    return await cache.aget(detail_key(recipe_id, version))
+
+
+async def aset_detail(recipe_id, version, entry):
+    if version is None:
+        return
+    await cache.aset(
+        detail_key(recipe_id, version),
+        entry,
+        timeout=settings.RECIPE_DETAIL_CACHE_TIMEOUT,
+    )
+
+
+def stats_version_key(user_id):
+    return f"recipe-stats:{user_id}:version"
+
+
+def stats_key(user_id, version):
+    return f"recipe-stats:{user_id}:{version}"
+
+
+def get_stats_version(user_id):
+    """Return the current cache version of the recipe stats of a user"""
+    return cache.get_or_set(stats_version_key(user_id), new_version, timeout=None)
+
+
+def bump_stats_versions(user_ids):
+    """Invalidate the recipe stats cached for the given users"""
+    versions = {stats_version_key(user_id): new_version() for user_id in user_ids}
+    if versions:
+        cache.set_many(versions, timeout=None)
+
+
+def get_stats(user_id, version):
+    if not settings.CACHE_SHARED:
+        return None
+    return cache.get(stats_key(user_id, version))
+
+
+def set_stats(user_id, version, data):
+    if not settings.CACHE_SHARED:
+        return
+    cache.set(
+        stats_key(user_id, version), data, timeout=settings.RECIPE_STATS_CACHE_TIMEOUT
+    )
@@ -0,0 +1,94 @@
+import hashlib
+
+from django.contrib.auth import get_user_model
+from django.db import router
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from core.models import Recipe
+
+
+def mark_list_changed(user_ids):
+    """Record a write to the recipes of users, changing their list validators"""
+    user_ids = list(user_ids)
+    if user_ids:
+        get_user_model().objects.filter(pk__in=user_ids).update(
+            recipes_changed_at=timezone.now()
+        )
+
+
+def list_changed_at_query(user_id):
+    """Return a query of when the recipes of a user last changed
+
+    Read before the recipes and from a database they are read from, so
+    behind a lagging replica the validators lag as well instead of labelling
+    an older list as current.
+    """
+    return (
+        get_user_model()
+        .objects.using(router.db_for_read(Recipe))
+        .filter(pk=user_id)
+        .values_list("recipes_changed_at", flat=True)
+    )
+
+
+def detail_validators(recipe_id, modified_at, fields=None):
+    """Return the (ETag, Last-Modified) of a recipe detail
+
+    A representation trimmed to ``fields`` gets an ETag of its own.
+    """
+    key = f"{recipe_id}:{modified_at.isoformat()}"
+    if fields is not None:
+        key += ":" + ",".join(fields)
+    etag = hashlib.md5(key.encode()).hexdigest()
+    return quote_etag(etag), modified_at
+
+
+def list_validators(request):
+    """Return the (ETag, Last-Modified) of a recipe list
+
+    Every write to the recipes of a user, their links or the tags and
+    ingredients they show bumps the user's recipes_changed_at, so a list
+    is validated by one primary key lookup whatever its size or page.
+    """
+    last_modified = list_changed_at_query(request.user.pk).first()
+    return list_validators_for(request, last_modified)
+
+
+async def alist_validators(request):
+    """Async version of list_validators, for the async views"""
+    last_modified = await list_changed_at_query(request.user.pk).afirst()
+    return list_validators_for(request, last_modified)
+
+
+def list_validators_for(request, last_modified):
+    key = ":".join(
+        [
+            str(request.user.pk),
+            request.get_full_path(),
+            request.accepted_media_type or "",
+            last_modified.isoformat(),
+        ]
+    )
+    return quote_etag(hashlib.md5(key.encode()).hexdigest()), last_modified
+
+
+def not_modified_response(request, etag, last_modified):
+    """Return a 304 response if the client copy is current, otherwise None"""
+    response = get_conditional_response(
+        request._request, etag=etag, last_modified=timestamp(last_modified)
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified):
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(timestamp(last_modified))
+    return response
+
+
+def timestamp(value):
+    return int(value.timestamp())
@@ -0,0 +1,179 @@
+import operator
+from functools import reduce
+
+from django.db.models import Count, Exists, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from rest_framework import serializers
+
+from core.models import Recipe
+
+MATCH_ANY = "any"
+MATCH_ALL = "all"
+MATCH_CHOICES = (MATCH_ANY, MATCH_ALL)
+MAX_FILTER_IDS = 100
+
+
+def parse_id_list(params, name):
+    """Return the unique ids of a comma separated query parameter"""
+    value = params.get(name)
+    if not value:
+        return []
+    ids = set()
+    for item in value.split(","):
+        item = item.strip()
+        if not item.isdigit():
+            raise serializers.ValidationError({name: [f"'{item}' is not a valid id."]})
+        ids.add(int(item))
+    if len(ids) > MAX_FILTER_IDS:
+        raise serializers.ValidationError(
+            {name: [f"Ensure this list has no more than {MAX_FILTER_IDS} ids."]}
+        )
+    return sorted(ids)
+
+
+def parse_flag(params, name):
+    """Return the boolean of a 0/1 query parameter"""
+    value = params.get(name, "0")
+    if not value.isdigit():
+        raise serializers.ValidationError({name: ["Must be 0 or 1."]})
+    return bool(int(value))
+
+
+def parse_match(params, name):
+    """Return the any/all match mode of a query parameter"""
+    match = params.get(name, MATCH_ANY)
+    if match not in MATCH_CHOICES:
+        raise serializers.ValidationError(
+            {name: [f"Select one of: {', '.join(MATCH_CHOICES)}."]}
+        )
+    return match
+
+
+def related_condition(relation, ids, match):
+    """Return a semi-join condition on a recipe many to many relation
+
+    ``any`` keeps recipes linked to at least one of the ids through a
+    correlated EXISTS, ``all`` keeps recipes linked to every id through a
+    grouped IN subquery. Neither joins the relation into the outer query,
+    so a recipe is returned once however many of its links match.
+    """
+    field = Recipe._meta.get_field(relation)
+    recipe_column = field.m2m_field_name()
+    target_column = field.m2m_reverse_field_name()
+    links = field.remote_field.through.objects.filter(**{f"{target_column}__in": ids})
+    if match == MATCH_ALL:
+        matched = (
+            links.values(recipe_column)
+            .annotate(matched=Count(target_column))
+            .filter(matched=len(ids))
+            .values(recipe_column)
+        )
+        return Q(pk__in=matched)
+    return Q(Exists(links.filter(**{recipe_column: OuterRef("pk")})))
+
+
+def filter_by_relations(queryset, params):
+    """Filter recipes by the ``tags`` and ``ingredients`` query parameters
+
+    Each relation is matched with its own ``tags_match``/``ingredients_match``
+    mode and a recipe is kept if it satisfies either relation filter.
+    """
+    conditions = []
+    for relation in ("tags", "ingredients"):
+        ids = parse_id_list(params, relation)
+        match = parse_match(params, f"{relation}_match")
+        if ids:
+            conditions.append(related_condition(relation, ids, match))
+    if not conditions:
+        return queryset
+    return queryset.filter(reduce(operator.or_, conditions))
+
+
+# (parameter prefix, field, validation) of the range filters
+RANGE_FILTERS = (
+    (
+        "price",
+        "price",
+        serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0),
+    ),
+    ("minutes", "minutes_to_cook", serializers.IntegerField(min_value=0)),
+)
+ORDERING_FIELDS = ("id", "price", "minutes_to_cook")
+ORDERING_CHOICES = [prefix + field for field in ORDERING_FIELDS for prefix in ("", "-")]
+
+
+def parse_value(params, name, field):
+    """Return a query parameter validated by a serializer field, or None"""
+    value = params.get(name)
+    if value is None or value == "":
+        return None
+    try:
+        return field.run_validation(value)
+    except serializers.ValidationError as exc:
+        raise serializers.ValidationError({name: exc.detail})
+
+
+def filter_by_ranges(queryset, params):
+    """Filter recipes by the ``price_min/max`` and ``minutes_min/max`` bounds
+
+    Bounds are inclusive. Each range is served by a (user, field, id) index.
+    """
+    for prefix, field_name, field in RANGE_FILTERS:
+        for bound, lookup in (("min", "gte"), ("max", "lte")):
+            value = parse_value(params, f"{prefix}_{bound}", field)
+            if value is not None:
+                queryset = queryset.filter(**{f"{field_name}__{lookup}": value})
+    return queryset
+
+
+def order_recipes(queryset, params):
+    """Order recipes by the ``ordering`` query parameter
+
+    The id follows in the same direction, which keeps the order stable for
+    page cursors and lets one (user, field, id) index serve both directions.
+    Without the parameter the queryset ordering is kept.
+    """
+    ordering = params.get("ordering")
+    if not ordering:
+        return queryset
+    if ordering not in ORDERING_CHOICES:
+        raise serializers.ValidationError(
+            {"ordering": [f"Select one of: {', '.join(ORDERING_CHOICES)}."]}
+        )
+    if ordering.lstrip("-") == "id":
+        return queryset.order_by(ordering)
+    return queryset.order_by(ordering, "-id" if ordering.startswith("-") else "id")
+
+
+def attribute_links(relation):
+    """Return the recipe links of the tag or ingredient of the outer query"""
+    field = Recipe._meta.get_field(relation)
+    return field.remote_field.through.objects.filter(
+        **{field.m2m_reverse_field_name(): OuterRef("pk")}
+    )
+
+
+def filter_assigned(queryset, relation):
+    """Keep the tags or ingredients used by at least one recipe
+
+    A correlated EXISTS stops at the first link, where joining the links
+    and deduplicating reads every one of them.
+    """
+    return queryset.filter(Exists(attribute_links(relation)))
+
+
+def annotate_recipe_counts(queryset, relation):
+    """Annotate tags or ingredients with the number of recipes using them
+
+    The links are counted by a grouped subquery on the link table index,
+    run only for the rows of the returned page.
+    """
+    field = Recipe._meta.get_field(relation)
+    target_column = field.m2m_reverse_field_name()
+    counts = (
+        attribute_links(relation)
+        .values(target_column)
+        .annotate(count=Count("*"))
+        .values("count")
+    )
+    return queryset.annotate(recipe_count=Coalesce(Subquery(counts), 0))
@@ -0,0 +1,345 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image
+from rest_framework import status
+from rest_framework.exceptions import APIException, ParseError, ValidationError
+
+from core.models import ImageBlob, Recipe, recipe_image_file_path, sharded_path
+from recipe import cache, conditional
+
+UPLOAD_DIR = "uploads/recipe/"
+VARIANTS_DIR = "uploads/recipe-variants/"
+
+CHUNK_SIZE = 64 * 1024
+# Enough for the markers and metadata that precede the image dimensions
+HEADER_SIZE = 256 * 1024
+
+INVALID_IMAGE = (
+    "Upload a valid image. The file you uploaded was either not an image "
+    "or a corrupted image."
+)
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(
+    settings.RECIPE_IMAGE_WORKERS + settings.RECIPE_IMAGE_QUEUE_SIZE
+)
+_pending = set()
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "The uploaded image is too large."
+    default_code = "too_large"
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.RECIPE_IMAGE_WORKERS,
+                thread_name_prefix="recipe-image",
+            )
+        return _executor
+
+
+def variant_name(image_name, variant):
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    return sharded_path(VARIANTS_DIR, f"{stem}_{variant}.jpg")
+
+
+def queue_variants(recipe_id, image_name):
+    """Generate the variants of a recipe image on the worker pool
+
+    When the pool and its queue are full the job is dropped and the recipe
+    stays pending, like one whose job was lost with a restarted worker, until
+    manage.py generate_pending_variants picks it up. A burst of uploads so
+    neither piles up work in memory nor blocks the requests.
+    """
+    if not _slots.acquire(blocking=False):
+        return None
+
+    future = get_executor().submit(generate_variants, recipe_id, image_name)
+    _pending.add(future)
+
+    def done(future):
+        _pending.discard(future)
+        _slots.release()
+
+    future.add_done_callback(done)
+    return future
+
+
+def wait_for_pending(timeout=None):
+    """Block until the queued variant jobs are finished"""
+    wait(list(_pending), timeout=timeout)
+
+
+def render_variant(image, size):
+    variant = image.copy()
+    variant.thumbnail(size)
+    if variant.mode != "RGB":
+        variant = variant.convert("RGB")
+    content = io.BytesIO()
+    variant.save(content, format="JPEG", quality=85, optimize=True)
+    return content.getvalue()
+
+
+def generate_variants(recipe_id, image_name, close_connection=True):
+    """Store the resized variants of an image and mark the recipe ready"""
+    variants = {}
+    written = []
+    try:
+        with default_storage.open(image_name) as image_file:
+            with Image.open(image_file) as image:
+                image.load()
+                for variant, size in settings.RECIPE_IMAGE_VARIANTS.items():
+                    name = variant_name(image_name, variant)
+                    # Shared images keep the variants made for another recipe
+                    if not default_storage.exists(name):
+                        write_file(name, render_variant(image, size))
+                        written.append(name)
+                    variants[variant] = name
+        status = Recipe.ImageStatus.READY
+    except Exception:
+        # Variants found in place may already be served to other recipes
+        for name in written:
+            default_storage.delete(name)
+        variants = {}
+        status = Recipe.ImageStatus.FAILED
+
+    try:
+        # The image may have been replaced or removed while this job ran
+        updated = Recipe.objects.filter(pk=recipe_id, image=image_name).update(
+            image_status=status, image_variants=variants, modified_at=timezone.now()
+        )
+        if updated:
+            cache.bump_versions([recipe_id])
+            conditional.mark_list_changed(
+                Recipe.objects.filter(pk=recipe_id).values_list("user_id", flat=True)
+            )
+        elif not Recipe.objects.filter(image=image_name).exists():
+            delete_variants(image_name)
+    finally:
+        if close_connection:
+            connection.close()
+
+
+def delete_variants(image_name):
+    """Delete the variants of an image, also ones a running job just saved"""
+    if not image_name:
+        return
+    for variant in settings.RECIPE_IMAGE_VARIANTS:
+        default_storage.delete(variant_name(image_name, variant))
+
+
+def read_header(head, final):
+    """Return the (format, size) of an image from its first bytes
+
+    Returns None while more bytes may still identify the image, unless
+    ``final`` is set.
+    """
+    try:
+        with Image.open(io.BytesIO(head)) as image:
+            return image.format, image.size
+    except Image.DecompressionBombError:
+        raise UploadTooLarge()
+    except Exception:
+        if final:
+            raise ValidationError({"image": [INVALID_IMAGE]})
+        return None
+
+
+def check_header(image_format, size):
+    if image_format not in settings.RECIPE_IMAGE_UPLOAD_FORMATS:
+        raise ValidationError({"image": [f"Unsupported image format {image_format}."]})
+    max_pixels = settings.RECIPE_IMAGE_MAX_PIXELS
+    if size[0] * size[1] > max_pixels:
+        raise ValidationError(
+            {"image": [f"Ensure the image has at most {max_pixels} pixels."]}
+        )
+
+
+def store_upload(stream, recipe, content_length=None):
+    """Stream an uploaded image to storage and return its name
+
+    The body is copied in chunks to a temporary file next to the final
+    location, only the header is decoded to check the format and the
+    dimensions, and reading stops at RECIPE_IMAGE_MAX_BYTES, so the memory
+    used per upload does not depend on the image size.
+    """
+    max_bytes = settings.RECIPE_IMAGE_MAX_BYTES
+    if content_length:
+        try:
+            content_length = int(content_length)
+        except ValueError:
+            raise ParseError("Invalid Content-Length header.")
+        if content_length > max_bytes:
+            raise UploadTooLarge()
+
+    temp = upload_temp_file()
+    try:
+        with temp:
+            digest = hashlib.sha256()
+            head = b""
+            header = None
+            received = 0
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                received += len(chunk)
+                if received > max_bytes:
+                    raise UploadTooLarge()
+                temp.write(chunk)
+                digest.update(chunk)
+                if header is None:
+                    head += chunk
+                    header = read_header(head, final=len(head) >= HEADER_SIZE)
+                    if header is not None:
+                        check_header(*header)
+                        head = b""
+            if header is None:
+                header = read_header(head, final=True)
+                check_header(*header)
+
+        extension = settings.RECIPE_IMAGE_UPLOAD_FORMATS[header[0]]
+        return place_upload(temp.name, recipe, extension, digest.hexdigest())
+    except BaseException:
+        remove_file(temp.name)
+        raise
+
+
+def store_file(upload, recipe):
+    """Store an uploaded file that was already validated and return its name"""
+    temp = upload_temp_file()
+    try:
+        with temp:
+            digest = hashlib.sha256()
+            for chunk in upload.chunks(CHUNK_SIZE):
+                temp.write(chunk)
+                digest.update(chunk)
+        extension = upload.name.split(".")[-1]
+        return place_upload(temp.name, recipe, extension, digest.hexdigest())
+    except BaseException:
+        remove_file(temp.name)
+        raise
+
+
+def upload_temp_file():
+    upload_dir = default_storage.path(UPLOAD_DIR)
+    os.makedirs(upload_dir, exist_ok=True)
+    return tempfile.NamedTemporaryFile(dir=upload_dir, prefix=".upload-", delete=False)
+
+
+def place_upload(temp_path, recipe, extension, digest):
+    """Move a complete upload to its final name
+
+    In the "content" storage mode the name is derived from the digest and
+    an image that is already stored is referenced instead of written again.
+    Must run in the transaction that assigns the name to the recipe.
+    """
+    if settings.RECIPE_IMAGE_STORAGE == "content":
+        name, created = link_blob(
+            digest, sharded_path(UPLOAD_DIR, f"{digest}.{extension}")
+        )
+        if not created:
+            remove_file(temp_path)
+            return name
+        # A file left under this name by a released blob may be deleted at
+        # any moment, so it is always replaced by the fresh upload
+        lock_image_name(name)
+    else:
+        name = recipe_image_file_path(recipe, f"image.{extension}")
+
+    path = default_storage.path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(temp_path, path)
+    return name
+
+
+def write_file(name, content):
+    """Write a file under exactly this name, replacing it atomically"""
+    path = default_storage.path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+        dir=os.path.dirname(path), prefix=".upload-", delete=False
+    ) as temp:
+        temp.write(content)
+    os.replace(temp.name, path)
+
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def link_blob(digest, name):
+    """Take a reference to the stored image with this digest
+
+    Return its name and whether the blob row was created by this call.
+    """
+    for _ in range(2):
+        blob = ImageBlob.objects.select_for_update().filter(digest=digest).first()
+        if blob is not None:
+            ImageBlob.objects.filter(pk=blob.pk).update(refs=F("refs") + 1)
+            return blob.name, False
+        try:
+            with transaction.atomic():
+                ImageBlob.objects.create(digest=digest, name=name, refs=1)
+            return name, True
+        except IntegrityError:
+            # Created by a concurrent upload of the same image, link to it
+            continue
+    raise IntegrityError(f"Could not reference the image {digest}")
+
+
+def release_image(name):
+    """Drop a reference to a stored image, deleting it with the last one
+
+    Images without a blob row are not shared and are deleted right away.
+    Files are only removed once the transaction commits.
+    """
+    if not name:
+        return
+    blob = ImageBlob.objects.select_for_update().filter(name=name).first()
+    if blob is not None:
+        if blob.refs > 1:
+            ImageBlob.objects.filter(pk=blob.pk).update(refs=F("refs") - 1)
+            return
+        blob.delete()
+    transaction.on_commit(lambda: delete_image_files(name))
+
+
+def delete_image_files(name):
+    with transaction.atomic():
+        lock_image_name(name)
+        # Skip images linked again by an upload since the last reference went
+        if ImageBlob.objects.filter(name=name).exists():
+            return
+        default_storage.delete(name)
+    delete_variants(name)
+
+
+def lock_image_name(name):
+    """Serialize writing and deleting the file of an image until commit
+
+    An upload creating a blob row holds the lock until its row is visible,
+    so a pending deletion of the same name either runs before the file is
+    replaced or sees the new row and keeps the file.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [name])
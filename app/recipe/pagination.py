@@ -0,0 +1,212 @@
+import base64
+import binascii
+import datetime
+import json
+import operator
+from collections import OrderedDict
+from decimal import Decimal
+from functools import reduce
+
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Opt-in cursor pagination that seeks on the queryset ordering
+
+    The cursor holds the ordering values of the last row of a page and the
+    next page is fetched with a keyset condition (``name < x OR (name = x
+    AND id < y)``) instead of an OFFSET, so every page costs the same. The
+    queryset ordering must end with a unique field, e.g. ("-name", "-id").
+    Plain list requests without ``cursor`` or ``page_size`` are not paginated.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    page_size = 100
+    max_page_size = 1000
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request):
+        """Async version of paginate_queryset, for the async views"""
+        queryset = self.page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self.set_page([row async for row in queryset])
+
+    def page_queryset(self, queryset, request):
+        """Return the queryset of the requested page, None if not paginated
+
+        It selects one extra row to tell whether another page follows.
+        """
+        if not self.is_requested(request):
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        ordering = self.get_ordering(queryset)
+        self.ordering_fields = [field for field, _ in ordering]
+        cursor = self.decode_cursor(request)
+        if cursor and len(cursor["position"]) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+        self.reverse = bool(cursor and cursor["reverse"])
+        if self.reverse:
+            ordering = [(field, not descending) for field, descending in ordering]
+            queryset = queryset.order_by(
+                *[
+                    self.order_by_term(field, descending)
+                    for field, descending in ordering
+                ]
+            )
+        if cursor:
+            try:
+                queryset = queryset.filter(
+                    self.seek_condition(ordering, cursor["position"])
+                )
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+        self.cursor = cursor
+        return queryset[: self.page_size + 1]
+
+    def set_page(self, results):
+        """Keep the rows of the page fetched from page_queryset and return them"""
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+        if self.reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True},
+                "previous": {"type": "string", "nullable": True},
+                "results": schema,
+            },
+        }
+
+    def is_requested(self, request):
+        """Return True if the client asked for a paginated response"""
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, queryset):
+        """Return the queryset ordering as (field, descending) pairs"""
+        ordering = []
+        for term in queryset.query.order_by:
+            if not isinstance(term, str):
+                raise ImproperlyConfigured(
+                    "KeysetPagination only supports ordering by field names."
+                )
+            ordering.append((term.lstrip("-"), term.startswith("-")))
+        if not ordering or ordering[-1][0] not in ("id", "pk"):
+            raise ImproperlyConfigured(
+                "KeysetPagination requires an ordering ending with the primary key."
+            )
+        return ordering
+
+    @staticmethod
+    def order_by_term(field, descending):
+        return f"-{field}" if descending else field
+
+    @staticmethod
+    def seek_condition(ordering, position):
+        """Return a filter selecting the rows after ``position``"""
+        conditions = []
+        for index, (field, descending) in enumerate(ordering):
+            lookup = "lt" if descending else "gt"
+            condition = Q(**{f"{field}__{lookup}": position[index]})
+            for prev_index, (prev_field, _) in enumerate(ordering[:index]):
+                condition &= Q(**{prev_field: position[prev_index]})
+            conditions.append(condition)
+        condition = reduce(operator.or_, conditions)
+
+        # A redundant bound on the leading column lets the planner turn the
+        # OR chain into a single index range scan.
+        if len(ordering) > 1:
+            field, descending = ordering[0]
+            lookup = "lte" if descending else "gte"
+            condition &= Q(**{f"{field}__{lookup}": position[0]})
+        return condition
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.build_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.build_link(self.page[0], reverse=True)
+
+    def build_link(self, instance, reverse):
+        # Pages hold model instances or values() rows
+        if isinstance(instance, dict):
+            values = [instance[field] for field in self.ordering_fields]
+        else:
+            values = [getattr(instance, field) for field in self.ordering_fields]
+        position = [self.encode_value(value) for value in values]
+        cursor = self.encode_cursor({"position": position, "reverse": reverse})
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    @staticmethod
+    def encode_value(value):
+        if isinstance(value, Decimal):
+            return str(value)
+        if isinstance(value, (datetime.date, datetime.datetime)):
+            return value.isoformat()
+        return value
+
+    @staticmethod
+    def encode_cursor(cursor):
+        data = json.dumps([cursor["position"], int(cursor["reverse"])])
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position, reverse = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+        except (TypeError, ValueError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list):
+            raise NotFound(self.invalid_cursor_message)
+        return {"position": position, "reverse": bool(reverse)}
@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db.models import F, FloatField, OuterRef, Subquery
+from django.db.models.functions import Cast
+
+# Weight of the matches in each part of a recipe
+WEIGHTS = (("title", "A"), ("tags", "B"), ("ingredients", "C"))
+
+
+def linked_names(recipe_model, relation):
+    """Return the names linked to the outer recipe, space separated"""
+    field = recipe_model._meta.get_field(relation)
+    recipe_column = field.m2m_field_name()
+    target_column = field.m2m_reverse_field_name()
+    names = (
+        field.remote_field.through.objects.filter(**{recipe_column: OuterRef("pk")})
+        .values(recipe_column)
+        .annotate(names=StringAgg(f"{target_column}__name", " "))
+        .values("names")
+    )
+    return Subquery(names)
+
+
+def search_document(recipe_model):
+    """Return the search vector of a recipe, for an UPDATE of its row"""
+    config = settings.RECIPE_SEARCH_CONFIG
+    document = None
+    for relation, weight in WEIGHTS:
+        source = (
+            relation if relation == "title" else linked_names(recipe_model, relation)
+        )
+        vector = SearchVector(source, weight=weight, config=config)
+        document = vector if document is None else document + vector
+    return document
+
+
+def update_search_vectors(recipe_ids):
+    """Rebuild the stored search vectors of recipes"""
+    from core.models import Recipe
+
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        Recipe.objects.filter(pk__in=recipe_ids).update(
+            search_vector=search_document(Recipe)
+        )
+
+
+def filter_by_search(queryset, params):
+    """Filter recipes by the ``search`` query parameter, best matches first
+
+    Uses web search syntax: quoted phrases, ``or`` and ``-excluded`` words.
+    The rank is a double so page cursors can compare it exactly.
+    """
+    text = params.get("search", "").strip()
+    if not text:
+        return queryset
+    query = SearchQuery(
+        text, search_type="websearch", config=settings.RECIPE_SEARCH_CONFIG
+    )
+    return (
+        queryset.filter(search_vector=query)
+        .annotate(rank=Cast(SearchRank(F("search_vector"), query), FloatField()))
+        .order_by("-rank", "-id")
+    )
@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
 from rest_framework import serializers
 
 from core.models import Tag, Ingredient, Recipe
@@ -12,6 +14,15 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ("id",)
 
 
+class TagCountSerializer(TagSerializer):
+    """Serializer for tag object with the number of recipes using it"""
+
+    recipe_count = serializers.IntegerField(read_only=True)
+
+    class Meta(TagSerializer.Meta):
+        fields = TagSerializer.Meta.fields + ("recipe_count",)
+
+
 class IngredientSerializer(serializers.ModelSerializer):
     """Serializer for ingredient object"""
 
@@ -21,6 +32,34 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ("id",)
 
 
+class IngredientCountSerializer(IngredientSerializer):
+    """Serializer for ingredient object with the number of recipes using it"""
+
+    recipe_count = serializers.IntegerField(read_only=True)
+
+    class Meta(IngredientSerializer.Meta):
+        fields = IngredientSerializer.Meta.fields + ("recipe_count",)
+
+
+class AttributeNamesSerializer(serializers.Serializer):
+    """Serializer for a bulk get-or-create of tags or ingredients"""
+
+    names = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        allow_empty=False,
+        max_length=settings.RECIPE_BULK_CREATE_MAX_ITEMS,
+    )
+
+
+class AutocompleteSerializer(serializers.Serializer):
+    """Serializer for the query of a tag or ingredient autocomplete"""
+
+    q = serializers.CharField(max_length=255)
+    limit = serializers.IntegerField(
+        min_value=1, max_value=settings.RECIPE_AUTOCOMPLETE_MAX_LIMIT, default=10
+    )
+
+
 class RecipeImageSerializer(serializers.ModelSerializer):
     """Serializer for the recipe image"""
 
@@ -38,7 +77,9 @@ class RecipeSerializer(serializers.ModelSerializer):
         many=True, queryset=Ingredient.objects.all()
     )
     tags = serializers.PrimaryKeyRelatedField(many=True, queryset=Tag.objects.all())
-    image = serializers.ImageField(required=False)
+    # Written by the image actions only, which also queue the variants
+    image = serializers.ImageField(read_only=True)
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -51,8 +92,21 @@ class RecipeSerializer(serializers.ModelSerializer):
             "ingredients",
             "tags",
             "image",
+            "image_status",
+            "image_variants",
         )
-        read_only_fields = ("id",)
+        read_only_fields = ("id", "image_status")
+
+    def get_image_variants(self, obj):
+        """Return the URLs of the resized images once they are generated"""
+        if obj.image_status != Recipe.ImageStatus.READY:
+            return {}
+        request = self.context.get("request")
+        urls = {}
+        for variant, name in obj.image_variants.items():
+            url = default_storage.url(name)
+            urls[variant] = request.build_absolute_uri(url) if request else url
+        return urls
 
 
 class RecipeDetailSerializer(RecipeSerializer):
@@ -60,3 +114,25 @@ class RecipeDetailSerializer(RecipeSerializer):
 
     ingredients = IngredientSerializer(many=True, read_only=True)
     tags = TagSerializer(many=True, read_only=True)
+
+
+class RecipeBulkItemSerializer(serializers.ModelSerializer):
+    """Serializer for one item of a bulk recipe create
+
+    Tag and ingredient ids are only checked to be integers here, the view
+    looks all of them up for the whole batch at once.
+    """
+
+    ingredients = serializers.ListField(child=serializers.IntegerField())
+    tags = serializers.ListField(child=serializers.IntegerField())
+
+    class Meta:
+        model = Recipe
+        fields = (
+            "title",
+            "minutes_to_cook",
+            "price",
+            "link",
+            "ingredients",
+            "tags",
+        )
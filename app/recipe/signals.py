@@ -0,0 +1,95 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import Tag, Ingredient, Recipe
+from recipe import cache, conditional, images, search
+
+
+def linked_recipe_ids(instance):
+    """Return the ids of the recipes linked to a tag or an ingredient"""
+    relation = "tags" if isinstance(instance, Tag) else "ingredients"
+    field = Recipe._meta.get_field(relation)
+    return list(
+        field.remote_field.through.objects.filter(
+            **{field.m2m_reverse_field_name(): instance.pk}
+        ).values_list(f"{field.m2m_field_name()}_id", flat=True)
+    )
+
+
+def touch_recipes(recipe_ids):
+    """Mark recipes as modified after a change to their relations"""
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        Recipe.objects.filter(pk__in=recipe_ids).update(
+            modified_at=timezone.now(), search_vector=search.search_document(Recipe)
+        )
+        cache.bump_versions(recipe_ids)
+
+
+def recipes_changed(user_id):
+    """Invalidate the stats and list validators of a user"""
+    cache.bump_stats_versions([user_id])
+    conditional.mark_list_changed([user_id])
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, update_fields, **kwargs):
+    """Invalidate the cached payloads and reindex the title of a recipe"""
+    cache.bump_versions([instance.pk])
+    recipes_changed(instance.user_id)
+    if update_fields is None or "title" in update_fields:
+        search.update_search_vectors([instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    """Invalidate the cached payloads and release the image of a recipe"""
+    cache.bump_versions([instance.pk])
+    recipes_changed(instance.user_id)
+    # Deletes always run in a transaction, so the blob row can be locked
+    images.release_image(instance.image.name)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_links_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Invalidate the recipes whose tags or ingredients changed"""
+    # Recipes are only linked to the tags and ingredients of their owner
+    if action in ("post_add", "post_remove", "post_clear"):
+        recipes_changed(instance.user_id)
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            touch_recipes([instance.pk])
+        return
+
+    # Called from the tag or ingredient side, so pk_set holds recipe ids.
+    if action == "pre_clear":
+        instance._cleared_recipe_ids = linked_recipe_ids(instance)
+    elif action == "post_clear":
+        touch_recipes(getattr(instance, "_cleared_recipe_ids", []))
+    elif action in ("post_add", "post_remove"):
+        touch_recipes(pk_set)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def attribute_changed(sender, instance, created, **kwargs):
+    """Invalidate the recipes showing a renamed tag or ingredient"""
+    if not created:
+        touch_recipes(linked_recipe_ids(instance))
+        recipes_changed(instance.user_id)
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def attribute_deleting(sender, instance, **kwargs):
+    instance._deleted_recipe_ids = linked_recipe_ids(instance)
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def attribute_deleted(sender, instance, **kwargs):
+    """Invalidate the recipes that listed a deleted tag or ingredient"""
+    touch_recipes(getattr(instance, "_deleted_recipe_ids", []))
+    recipes_changed(instance.user_id)
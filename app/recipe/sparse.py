@@ -0,0 +1,42 @@
+from rest_framework import serializers
+
+
+def parse_field_list(params, name, available):
+    """Return the field names of a comma separated query parameter"""
+    value = params.get(name)
+    if value is None:
+        return None
+    names = [item.strip() for item in value.split(",") if item.strip()]
+    for item in names:
+        if item not in available:
+            raise serializers.ValidationError({name: [f"'{item}' is not a field."]})
+    return names
+
+
+def requested_fields(params, available):
+    """Return the fields selected by the ``fields`` and ``omit`` parameters
+
+    Both take comma separated names out of ``available``, which also gives
+    the order of the result. None means every field.
+    """
+    fields = parse_field_list(params, "fields", available)
+    omit = parse_field_list(params, "omit", available)
+    if fields is None and omit is None:
+        return None
+    selected = [
+        name
+        for name in available
+        if (fields is None or name in fields) and (omit is None or name not in omit)
+    ]
+    if not selected:
+        raise serializers.ValidationError({"fields": ["Select at least one field."]})
+    return selected
+
+
+def trim_serializer(serializer, fields):
+    """Drop the fields of a (list) serializer that were not requested"""
+    serializer_fields = getattr(serializer, "child", serializer).fields
+    for name in list(serializer_fields):
+        if name not in fields:
+            del serializer_fields[name]
+    return serializer
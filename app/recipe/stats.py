@@ -0,0 +1,116 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.contrib.postgres.fields import ArrayField
+from django.db.models import Aggregate, Avg, Count, FloatField, Max, Min, Q, Sum
+
+from core.models import Recipe
+
+PRICE_PERCENTILES = (50, 90, 95)
+# Lower bounds of the minutes_to_cook histogram buckets
+MINUTES_BUCKETS = (0, 15, 30, 60, 120)
+TOP_COUNT = 10
+CENTS = Decimal("0.01")
+
+
+class PercentileCont(Aggregate):
+    """Interpolated percentiles of an expression, as an array"""
+
+    function = "PERCENTILE_CONT"
+    template = (
+        "%(function)s(ARRAY[%(fractions)s]) WITHIN GROUP (ORDER BY %(expressions)s)"
+    )
+    output_field = ArrayField(FloatField())
+
+    def __init__(self, expression, percentiles, **extra):
+        fractions = ", ".join(str(percentile / 100) for percentile in percentiles)
+        super().__init__(expression, fractions=fractions, **extra)
+
+
+def money(value):
+    """Render an amount like the price fields of the API
+
+    Floats go through their shortest repr, so a percentile of 2.675 is not
+    rounded from its binary approximation 2.67499...
+    """
+    if value is None:
+        return None
+    return str(Decimal(str(value)).quantize(CENTS, rounding=ROUND_HALF_UP))
+
+
+def minutes_buckets():
+    """Return the (lower, upper) bounds of the histogram, upper exclusive"""
+    return list(zip(MINUTES_BUCKETS, [*MINUTES_BUCKETS[1:], None]))
+
+
+def bucket_condition(lower, upper):
+    condition = Q(minutes_to_cook__gte=lower)
+    if upper is not None:
+        condition &= Q(minutes_to_cook__lt=upper)
+    return condition
+
+
+def top_attributes(user, relation):
+    """Return the tags or ingredients most used by the recipes of a user"""
+    field = Recipe._meta.get_field(relation)
+    recipe_column = field.m2m_field_name()
+    target_column = field.m2m_reverse_field_name()
+    rows = (
+        field.remote_field.through.objects.filter(**{f"{recipe_column}__user": user})
+        .values(target_column, f"{target_column}__name")
+        .annotate(recipe_count=Count("*"))
+        .order_by("-recipe_count", f"{target_column}__name", target_column)[:TOP_COUNT]
+    )
+    return [
+        {
+            "id": row[target_column],
+            "name": row[f"{target_column}__name"],
+            "recipe_count": row["recipe_count"],
+        }
+        for row in rows
+    ]
+
+
+def recipe_stats(user):
+    """Return the statistics of the recipes of a user
+
+    Totals, percentiles and the histogram come from one aggregate over the
+    recipes, the top tags and ingredients from one grouped query each.
+    """
+    buckets = minutes_buckets()
+    totals = Recipe.objects.filter(user=user).aggregate(
+        count=Count("id"),
+        price_total=Sum("price"),
+        price_average=Avg("price"),
+        price_min=Min("price"),
+        price_max=Max("price"),
+        price_percentiles=PercentileCont("price", PRICE_PERCENTILES),
+        minutes_average=Avg("minutes_to_cook"),
+        **{
+            f"minutes_{index}": Count("id", filter=bucket_condition(lower, upper))
+            for index, (lower, upper) in enumerate(buckets)
+        },
+    )
+    percentiles = totals["price_percentiles"] or [None] * len(PRICE_PERCENTILES)
+    minutes_average = totals["minutes_average"]
+    return {
+        "count": totals["count"],
+        "price": {
+            "total": money(totals["price_total"] or 0),
+            "average": money(totals["price_average"]),
+            "min": money(totals["price_min"]),
+            "max": money(totals["price_max"]),
+            "percentiles": {
+                f"p{percentile}": money(value)
+                for percentile, value in zip(PRICE_PERCENTILES, percentiles)
+            },
+        },
+        "minutes_to_cook": {
+            "average": None if minutes_average is None else round(minutes_average, 1),
+            "histogram": [
+                {"from": lower, "to": upper, "count": totals[f"minutes_{index}"]}
+                for index, (lower, upper) in enumerate(buckets)
+            ],
+        },
+        "top_tags": top_attributes(user, "tags"),
+        "top_ingredients": top_attributes(user, "ingredients"),
+    }
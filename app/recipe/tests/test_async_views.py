@@ -0,0 +1,228 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from helpers.test_helpers import (
+    create_user,
+    create_sample_recipe,
+    create_sample_tag,
+    create_sample_ingredient,
+)
+from user.authentication import token_cache
+
+ASYNC_RECIPES_URL = reverse("recipe:recipe-async-list")
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+def async_detail_url(recipe_id):
+    return reverse("recipe:recipe-async-detail", args=[recipe_id])
+
+
+@pytest.fixture()
+def token_client():
+    token_cache.clear()
+    user = create_user(email="test@londonappdev.com", password="testpass", name="name")
+    token = Token.objects.create(user=user)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+    yield user, client
+    token_cache.clear()
+
+
+@pytest.mark.django_db
+class TestsAsyncRecipeApi:
+    """Test the async recipe endpoints against the DRF ones"""
+
+    def test_auth_required(self):
+        """Test that a token is required"""
+        res = APIClient().get(ASYNC_RECIPES_URL)
+
+        assert res.status_code == status.HTTP_401_UNAUTHORIZED
+        assert res["WWW-Authenticate"] == "Token"
+
+    def test_invalid_token_rejected(self):
+        """Test that unknown tokens are rejected"""
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION="Token invalid")
+
+        res = client.get(ASYNC_RECIPES_URL)
+
+        assert res.status_code == status.HTTP_401_UNAUTHORIZED
+        assert res.json() == {"detail": "Invalid token."}
+
+    def test_cached_token(self, token_client):
+        """Test that the token lookup is cached from the second request on"""
+        user, client = token_client
+        client.get(ASYNC_RECIPES_URL)
+        client.get(ASYNC_RECIPES_URL)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = client.get(ASYNC_RECIPES_URL)
+
+        assert res.status_code == status.HTTP_200_OK
+        assert not any("authtoken_token" in query["sql"] for query in queries)
+
+    @pytest.mark.parametrize(
+        "params",
+        [
+            "",
+            "?page_size=2",
+            "?tags={tag}",
+            "?search=recipe&page_size=2",
+            "?ordering=-price&price_max=10&page_size=2",
+            "?fields=title,tags&page_size=2",
+            "?omit=ingredients",
+        ],
+    )
+    def test_list_matches_sync_view(self, token_client, params):
+        """Test that the list payload is the one of the DRF view"""
+        user, client = token_client
+        tag = create_sample_tag(user=user, name="Vegan")
+        for i in range(3):
+            recipe = create_sample_recipe(user=user, title=f"Recipe {i}", price=i)
+            recipe.ingredients.add(create_sample_ingredient(user=user, name=f"{i}"))
+        recipe.tags.add(tag)
+        params = params.format(tag=tag.id)
+
+        res = client.get(ASYNC_RECIPES_URL + params)
+        second = client.get(res.json()["next"]) if "page_size" in params else None
+        # Pagination links point to the endpoint that was called
+        expected = client.get(RECIPES_URL + params)
+
+        assert res.status_code == status.HTTP_200_OK
+        assert res.content.decode() == expected.content.decode().replace(
+            RECIPES_URL, ASYNC_RECIPES_URL
+        )
+        if second is not None:
+            expected = client.get(expected.json()["next"])
+            assert second.json()["results"] == expected.json()["results"]
+
+    @pytest.mark.parametrize("params", ["?tags=abc", "?fields=secret", "?cursor=x"])
+    def test_list_invalid_params(self, token_client, params):
+        """Test that invalid parameters are reported as in the DRF view"""
+        user, client = token_client
+
+        res = client.get(ASYNC_RECIPES_URL + params)
+        expected = client.get(RECIPES_URL + params)
+
+        assert res.status_code == expected.status_code
+        assert res.json() == expected.json()
+
+    def test_list_not_modified(self, token_client):
+        """Test that a current ETag gets a 304 until a recipe changes"""
+        user, client = token_client
+        recipe = create_sample_recipe(user=user)
+        res = client.get(ASYNC_RECIPES_URL)
+
+        not_modified = client.get(ASYNC_RECIPES_URL, HTTP_IF_NONE_MATCH=res["ETag"])
+        recipe.title = "Changed"
+        recipe.save()
+        changed = client.get(ASYNC_RECIPES_URL, HTTP_IF_NONE_MATCH=res["ETag"])
+
+        assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
+        assert changed.status_code == status.HTTP_200_OK
+
+    @pytest.mark.parametrize("params", ["", "?fields=tags,id"])
+    def test_detail_matches_sync_view(self, token_client, params):
+        """Test that the detail payload and ETag are the ones of the DRF view"""
+        user, client = token_client
+        recipe = create_sample_recipe(user=user)
+        recipe.tags.add(create_sample_tag(user=user))
+        url = reverse("recipe:recipe-detail", args=[recipe.id]) + params
+
+        res = client.get(async_detail_url(recipe.id) + params)
+        cached = client.get(async_detail_url(recipe.id) + params)
+        expected = client.get(url)
+
+        assert res.status_code == status.HTTP_200_OK
+        assert res.json() == cached.json() == expected.json()
+        assert res["ETag"] == expected["ETag"]
+
+    def test_detail_shares_cache_with_sync_view(self, token_client):
+        """Test that a detail cached by either view is served by the other"""
+        user, client = token_client
+        recipe = create_sample_recipe(user=user)
+        url = reverse("recipe:recipe-detail", args=[recipe.id])
+        client.get(url)
+        client.get(url)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = client.get(async_detail_url(recipe.id))
+
+        assert res.status_code == status.HTTP_200_OK
+        assert not any("core_recipe" in query["sql"] for query in queries)
+
+    def test_detail_of_other_user_not_found(self, token_client):
+        """Test that recipes of other users are not returned"""
+        user, client = token_client
+        other = create_user(email="other@londonappdev.com", password="testpass")
+        recipe = create_sample_recipe(user=other)
+
+        res = client.get(async_detail_url(recipe.id))
+
+        assert res.status_code == status.HTTP_404_NOT_FOUND
+        assert res.json() == {"detail": "Not found."}
+
+    def test_create_recipe(self, token_client):
+        """Test creating a recipe"""
+        user, client = token_client
+        tag = create_sample_tag(user=user)
+        ingredient = create_sample_ingredient(user=user)
+        payload = {
+            "title": "Cake",
+            "minutes_to_cook": 30,
+            "price": "5.00",
+            "tags": [tag.id],
+            "ingredients": [ingredient.id],
+        }
+
+        res = client.post(ASYNC_RECIPES_URL, payload, format="json")
+
+        recipe = Recipe.objects.get(user=user)
+        assert res.status_code == status.HTTP_201_CREATED
+        assert res.json() == client.get(async_detail_url(recipe.id)).json()
+        assert res.json()["tags"] == [{"id": tag.id, "name": tag.name}]
+        assert Recipe.objects.filter(search_vector="cinnamon").exists()
+
+    def test_create_recipe_invalid(self, token_client):
+        """Test that invalid payloads are rejected like by the DRF view"""
+        user, client = token_client
+        payload = {"title": "", "tags": [999]}
+
+        res = client.post(ASYNC_RECIPES_URL, payload, format="json")
+
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
+        assert res.json() == client.post(RECIPES_URL, payload, format="json").json()
+        assert not Recipe.objects.exists()
+
+    def test_method_not_allowed(self, token_client):
+        """Test that unsupported methods are rejected"""
+        user, client = token_client
+
+        res = client.delete(ASYNC_RECIPES_URL)
+
+        assert res.status_code == status.HTTP_405_METHOD_NOT_ALLOWED
+        assert res.json() == {"detail": 'Method "DELETE" not allowed.'}
+
+    def test_asgi_request(self, token_client):
+        """Test a request going through the async handler and middleware"""
+        user, client = token_client
+        recipe = create_sample_recipe(user=user)
+        token = Token.objects.get(user=user)
+
+        async def get():
+            return await AsyncClient().get(
+                ASYNC_RECIPES_URL, authorization=f"Token {token.key}"
+            )
+
+        res = async_to_sync(get)()
+
+        assert res.status_code == status.HTTP_200_OK
+        assert [item["id"] for item in res.json()] == [recipe.id]
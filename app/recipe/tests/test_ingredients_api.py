@@ -12,6 +12,7 @@ from recipe.serializers import IngredientSerializer
 
 
 INGREDIENTS_URL = reverse("recipe:ingredient-list")
+INGREDIENTS_BULK_URL = reverse("recipe:ingredient-bulk-get-or-create")
 
 
 @pytest.mark.django_db(reset_sequences=True)
@@ -196,3 +197,77 @@ class TestsPrivateIngredientsAPI:
 
         assert len(res.data) == 1
         assert IngredientSerializer(ingredient).data in res.data
+
+    def test_create_duplicate_ingredient_rejected(self):
+        """Test that a user cannot create two ingredients with the same name"""
+        user, client = create_and_authenticate_user()
+        Ingredient.objects.create(user=user, name="Salt")
+
+        res = client.post(INGREDIENTS_URL, {"name": "Salt"}, format="json")
+
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
+        assert Ingredient.objects.filter(user=user).count() == 1
+
+    def test_bulk_get_or_create_ingredients(self):
+        """Test that existing ingredients are returned and missing ones created"""
+        user, client = create_and_authenticate_user()
+        salt = Ingredient.objects.create(user=user, name="Salt")
+
+        res = client.post(
+            INGREDIENTS_BULK_URL, {"names": ["Salt", "Pepper"]}, format="json"
+        )
+
+        assert res.status_code == status.HTTP_200_OK
+        assert res.data[0] == IngredientSerializer(salt).data
+        assert (
+            res.data[1]
+            == IngredientSerializer(
+                Ingredient.objects.get(user=user, name="Pepper")
+            ).data
+        )
+
+    def test_sparse_fields(self):
+        """Test that omit= trims the ingredients"""
+        user, client = create_and_authenticate_user()
+        ingredient = Ingredient.objects.create(user=user, name="Kale")
+
+        res = client.get(INGREDIENTS_URL, {"omit": "name"})
+        detail = client.get(
+            reverse("recipe:ingredient-detail", args=[ingredient.id]),
+            {"fields": "name"},
+        )
+
+        assert res.data == [{"id": ingredient.id}]
+        assert detail.data == {"name": "Kale"}
+
+    def test_autocomplete(self):
+        """Test that ingredients of the user are suggested"""
+        user, client = create_and_authenticate_user()
+        olive_oil = Ingredient.objects.create(user=user, name="Olive oil")
+        Ingredient.objects.create(user=user, name="Salt")
+
+        res = client.get(reverse("recipe:ingredient-autocomplete"), {"q": "oil"})
+
+        assert res.status_code == status.HTTP_200_OK
+        assert res.data == [IngredientSerializer(olive_oil).data]
+
+    def test_with_counts(self):
+        """Test that every ingredient comes with the number of recipes using it"""
+        user, client = create_and_authenticate_user()
+        salt = Ingredient.objects.create(user=user, name="Salt")
+        kale = Ingredient.objects.create(user=user, name="Kale")
+        recipe = Recipe.objects.create(
+            title="Kale crisps", minutes_to_cook=15, price=2.00, user=user
+        )
+        recipe.ingredients.add(salt, kale)
+        recipe = Recipe.objects.create(
+            title="Fries", minutes_to_cook=20, price=3.00, user=user
+        )
+        recipe.ingredients.add(salt)
+
+        res = client.get(INGREDIENTS_URL, {"with_counts": 1})
+
+        assert res.data == [
+            {"id": salt.id, "name": "Salt", "recipe_count": 2},
+            {"id": kale.id, "name": "Kale", "recipe_count": 1},
+        ]
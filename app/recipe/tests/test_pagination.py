@@ -0,0 +1,136 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+
+from core.models import Recipe, Tag, Ingredient
+from helpers.test_helpers import (
+    create_and_authenticate_user,
+    create_sample_recipe,
+    create_sample_tag,
+    create_sample_ingredient,
+)
+
+RECIPES_URL = reverse("recipe:recipe-list")
+TAGS_URL = reverse("recipe:tag-list")
+INGREDIENTS_URL = reverse("recipe:ingredient-list")
+
+
+def collect_pages(client, url, params):
+    """Follow the next links and return the ids of every page"""
+    pages = []
+    res = client.get(url, params)
+    while True:
+        assert res.status_code == status.HTTP_200_OK, res.data
+        pages.append([item["id"] for item in res.data["results"]])
+        if not res.data["next"]:
+            return pages
+        res = client.get(res.data["next"])
+
+
+@pytest.mark.django_db(reset_sequences=True)
+class TestsKeysetPagination:
+    """Test cursor pagination of the recipe API list endpoints"""
+
+    def test_list_not_paginated_by_default(self):
+        """Test that lists are returned as plain arrays without page params"""
+        user, client = create_and_authenticate_user()
+        create_sample_recipe(user=user)
+
+        res = client.get(RECIPES_URL)
+
+        assert res.status_code == status.HTTP_200_OK
+        assert isinstance(res.data, list)
+
+    def test_paginate_recipes(self):
+        """Test walking through recipe pages ordered by -id"""
+        user, client = create_and_authenticate_user()
+        for i in range(7):
+            create_sample_recipe(user=user, title=f"Recipe {i}")
+
+        pages = collect_pages(client, RECIPES_URL, {"page_size": 3})
+
+        expected = list(Recipe.objects.order_by("-id").values_list("id", flat=True))
+        assert [len(page) for page in pages] == [3, 3, 1]
+        assert sum(pages, []) == expected
+
+    @pytest.mark.parametrize(
+        "url, model", [(TAGS_URL, Tag), (INGREDIENTS_URL, Ingredient)]
+    )
+    def test_paginate_attributes(self, url, model):
+        """Test walking through tag and ingredient pages ordered by -name"""
+        user, client = create_and_authenticate_user()
+        for name in ["Vegan", "Dessert", "Lunch", "Brunch", "Dinner"]:
+            model.objects.create(user=user, name=name)
+
+        pages = collect_pages(client, url, {"page_size": 2})
+
+        expected = list(
+            model.objects.order_by("-name", "-id").values_list("id", flat=True)
+        )
+        assert sum(pages, []) == expected
+
+    def test_previous_link(self):
+        """Test that the previous link returns the preceding page"""
+        user, client = create_and_authenticate_user()
+        for i in range(5):
+            create_sample_recipe(user=user, title=f"Recipe {i}")
+
+        first = client.get(RECIPES_URL, {"page_size": 2})
+        second = client.get(first.data["next"])
+        previous = client.get(second.data["previous"])
+
+        assert first.data["previous"] is None
+        assert previous.data["results"] == first.data["results"]
+
+    def test_paginate_with_filters(self):
+        """Test that pagination composes with the tag and assigned_only filters"""
+        user, client = create_and_authenticate_user()
+        tag = create_sample_tag(user=user, name="Vegan")
+        create_sample_tag(user=user, name="Unused")
+        ingredient = create_sample_ingredient(user=user, name="Kale")
+        for i in range(5):
+            recipe = create_sample_recipe(user=user, title=f"Recipe {i}")
+            if i % 2 == 0:
+                recipe.tags.add(tag)
+                recipe.ingredients.add(ingredient)
+
+        recipe_pages = collect_pages(
+            client, RECIPES_URL, {"page_size": 2, "tags": f"{tag.id}"}
+        )
+        tag_pages = collect_pages(
+            client, TAGS_URL, {"page_size": 1, "assigned_only": 1}
+        )
+
+        assert sum(recipe_pages, []) == [5, 3, 1]
+        assert tag_pages == [[tag.id]]
+
+    def test_page_query_count_constant(self):
+        """Test that a deep page costs the same number of queries"""
+        user, client = create_and_authenticate_user()
+        for i in range(30):
+            Tag.objects.create(user=user, name=f"Tag {i:02}")
+
+        res = client.get(TAGS_URL, {"page_size": 5})
+        with CaptureQueriesContext(connection) as first_queries:
+            res = client.get(res.data["next"])
+        for _ in range(3):
+            res = client.get(res.data["next"])
+        with CaptureQueriesContext(connection) as deep_queries:
+            res = client.get(res.data["next"])
+
+        assert res.data["next"] is None
+        assert len(first_queries) == len(deep_queries)
+        assert "OFFSET" not in deep_queries[-1]["sql"]
+
+    @pytest.mark.parametrize("cursor", ["invalid", "W10=", "W1sxLDJdLDBd"])
+    def test_invalid_cursor(self, cursor):
+        """Test that a malformed cursor returns 404"""
+        user, client = create_and_authenticate_user()
+        create_sample_recipe(user=user)
+
+        res = client.get(RECIPES_URL, {"cursor": cursor})
+
+        assert res.status_code == status.HTTP_404_NOT_FOUND
@@ -1,11 +1,26 @@
+import hashlib
+import io
+import warnings
 import pytest
 import os
+import threading
+from django.conf import settings
+from django.core.cache import CacheKeyWarning, cache
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
+from rest_framework.test import APIClient
 
-from core.models import Recipe
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+
+from core.models import ImageBlob, Recipe, sharded_path
+from recipe import cache as recipe_cache
+from recipe import images, stats
 
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
 from helpers.test_helpers import (
@@ -376,6 +391,483 @@ class TestsPrivateRecipeApi:
         assert serializer2.data in res.data
         assert serializer3.data not in res.data
 
+    def test_filter_recipes_returns_unique_rows(self):
+        """Test that a recipe matching several filter ids is returned once"""
+        user, client = create_and_authenticate_user()
+        recipe = create_sample_recipe(user=user)
+        tag1 = create_sample_tag(user=user, name="Vegan")
+        tag2 = create_sample_tag(user=user, name="Dessert")
+        ingredient = create_sample_ingredient(user=user)
+        recipe.tags.add(tag1, tag2)
+        recipe.ingredients.add(ingredient)
+
+        res = client.get(
+            RECIPES_URL,
+            {"tags": f"{tag1.id},{tag2.id}", "ingredients": f"{ingredient.id}"},
+        )
+
+        assert res.status_code == status.HTTP_200_OK
+        assert [item["id"] for item in res.data] == [recipe.id]
+
+    @pytest.mark.parametrize("relation", ["tags", "ingredients"])
+    def test_filter_recipes_match_all(self, relation):
+        """Test that match=all returns recipes linked to every given id"""
+        user, client = create_and_authenticate_user()
+        if relation == "tags":
+            first = create_sample_tag(user=user, name="Vegan")
+            second = create_sample_tag(user=user, name="Dessert")
+        else:
+            first = create_sample_ingredient(user=user, name="Kale")
+            second = create_sample_ingredient(user=user, name="Salt")
+        both = create_sample_recipe(user=user, title="Both")
+        getattr(both, relation).add(first, second)
+        one = create_sample_recipe(user=user, title="One")
+        getattr(one, relation).add(first)
+
+        res_all = client.get(
+            RECIPES_URL,
+            {relation: f"{first.id},{second.id}", f"{relation}_match": "all"},
+        )
+        res_any = client.get(RECIPES_URL, {relation: f"{first.id},{second.id}"})
+
+        assert [item["id"] for item in res_all.data] == [both.id]
+        assert [item["id"] for item in res_any.data] == [one.id, both.id]
+
+    def test_filter_recipes_match_modes_are_independent(self):
+        """Test that tags and ingredients use their own match modes"""
+        user, client = create_and_authenticate_user()
+        tag1 = create_sample_tag(user=user, name="Vegan")
+        tag2 = create_sample_tag(user=user, name="Dessert")
+        ingredient1 = create_sample_ingredient(user=user, name="Kale")
+        ingredient2 = create_sample_ingredient(user=user, name="Salt")
+        recipe1 = create_sample_recipe(user=user, title="Only one tag")
+        recipe1.tags.add(tag1)
+        recipe2 = create_sample_recipe(user=user, title="One ingredient")
+        recipe2.ingredients.add(ingredient2)
+
+        res = client.get(
+            RECIPES_URL,
+            {
+                "tags": f"{tag1.id},{tag2.id}",
+                "tags_match": "all",
+                "ingredients": f"{ingredient1.id},{ingredient2.id}",
+                "ingredients_match": "any",
+            },
+        )
+
+        assert [item["id"] for item in res.data] == [recipe2.id]
+
+    @pytest.mark.parametrize(
+        "params",
+        [
+            {"tags": "1,abc"},
+            {"ingredients": "1;2"},
+            {"tags": "-1"},
+            {"tags": ",".join(str(i) for i in range(1, 102))},
+            {"tags": "1", "tags_match": "some"},
+            {"ingredients": "1", "ingredients_match": ""},
+        ],
+    )
+    def test_filter_recipes_invalid_params(self, params):
+        """Test that malformed filter parameters are rejected"""
+        user, client = create_and_authenticate_user()
+        create_sample_recipe(user=user)
+
+        res = client.get(RECIPES_URL, params)
+
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_list_query_count_does_not_grow_with_recipes(self):
+        """Test that related tags and ingredients are prefetched for lists"""
+        user, client = create_and_authenticate_user()
+        tag = create_sample_tag(user=user)
+        ingredient = create_sample_ingredient(user=user)
+
+        def list_queries(recipes_count):
+            for i in range(recipes_count):
+                recipe = create_sample_recipe(user=user, title=f"Recipe {i}")
+                recipe.tags.add(tag)
+                recipe.ingredients.add(ingredient)
+            with CaptureQueriesContext(connection) as queries:
+                res = client.get(RECIPES_URL)
+            assert res.status_code == status.HTTP_200_OK
+            return len(queries)
+
+        assert list_queries(1) == list_queries(10)
+
+    def test_detail_query_count_does_not_grow_with_relations(self):
+        """Test that recipe detail fetches nested relations in fixed queries"""
+        user, client = create_and_authenticate_user()
+        recipe = create_sample_recipe(user=user)
+        url = reverse("recipe:recipe-detail", kwargs={"pk": recipe.id})
+
+        def detail_queries(relations_count):
+            for i in range(relations_count):
+                name = f"{relations_count}-{i}"
+                recipe.tags.add(create_sample_tag(user=user, name=name))
+                recipe.ingredients.add(create_sample_ingredient(user=user, name=name))
+            with CaptureQueriesContext(connection) as queries:
+                res = client.get(url)
+            assert res.status_code == status.HTTP_200_OK
+            return len(queries)
+
+        assert detail_queries(1) == detail_queries(10)
+
+    def test_update_returns_fresh_relations(self):
+        """Test that the update response does not reuse stale prefetched tags"""
+        user, client = create_and_authenticate_user()
+        recipe = create_sample_recipe(user=user)
+        recipe.tags.add(create_sample_tag(user=user, name="Old"))
+        new_tag = create_sample_tag(user=user, name="New")
+        url = reverse("recipe:recipe-detail", kwargs={"pk": recipe.id})
+
+        res = client.patch(url, {"tags": [new_tag.id]}, format="json")
+
+        assert res.status_code == status.HTTP_200_OK
+        assert [tag["id"] for tag in res.data["tags"]] == [new_tag.id]
+
+
+@pytest.mark.django_db(reset_sequences=True)
+class TestsRecipeDetailCache:
+    """Test the cached recipe detail payloads"""
+
+    def test_cached_detail_skips_recipe_queries(self):
+        """Test that a repeated detail read is served from the cache"""
+        user, client = create_and_authenticate_user()
+        recipe = create_sample_recipe(user=user)
+        recipe.tags.add(create_sample_tag(user=user))
+        url = reverse("recipe:recipe-detail", kwargs={"pk": recipe.id})
+
+        # The first read gives the recipe a version, the second caches it
+        first = client.get(url)
+        client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            third = client.get(url)
+
+        assert third.status_code == status.HTTP_200_OK
+        assert third.data == first.data
+        assert len(queries) == 0
+
+    @pytest.mark.parametrize("pk", ["999", "a%20b"])
+    def test_unknown_ids_not_cached(self, pk):
+        """Test that probing ids returns 404 without creating cache keys"""
+        user, client = create_and_authenticate_user()
+
+        # Keys memcached rejects, e.g. with spaces, must not be built either
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", CacheKeyWarning)
+            res = client.get(f"{RECIPES_URL}{pk}/")
+
+        assert res.status_code == status.HTTP_404_NOT_FOUND
+        assert cache.get(recipe_cache.version_key(999)) is None
+
+    def test_process_local_cache_not_used(self, settings):
+        """Test that details are not cached unless the cache is shared"""
+        settings.CACHE_SHARED = False
+        user, client = create_and_authenticate_user()
+        recipe = create_sample_recipe(user=user)
+        url = reverse("recipe:recipe-detail", kwargs={"pk": recipe.id})
+
+        first = client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            second = client.get(url)
+
+        assert second.data == first.data
+        assert len(queries) > 0
+
+    def test_cached_detail_not_served_to_other_users(self):
+        """Test that another user cannot read a cached recipe"""
+        user, client = create_and_authenticate_user()
+        recipe = create_sample_recipe(user=user)
+        url = reverse("recipe:recipe-detail", kwargs={"pk": recipe.id})
+        client.get(url)
+        other_client = APIClient()
+        other_client.force_authenticate(
+            get_user_model().objects.create_user("other@londonappdev.com", "pass")
+        )
+
+        res = other_client.get(url)
+
+        assert res.status_code == status.HTTP_404_NOT_FOUND
+
+    @pytest.mark.parametrize(
+        "change",
+        [
+            "update_recipe",
+            "add_tag",
+            "add_recipe_to_tag",
+            "clear_tag_recipes",
+            "rename_tag",
+            "rename_ingredient",
+            "delete_tag",
+        ],
+    )
+    def test_cached_detail_invalidated(self, change):
+        """Test that writes to a recipe or its relations refresh the payload"""
+        user, client = create_and_authenticate_user()
+        recipe = create_sample_recipe(user=user)
+        tag = create_sample_tag(user=user)
+        ingredient = create_sample_ingredient(user=user)
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient)
+        url = reverse("recipe:recipe-detail", kwargs={"pk": recipe.id})
+        client.get(url)
+
+        if change == "update_recipe":
+            recipe.title = "New title"
+            recipe.save()
+        elif change == "add_tag":
+            recipe.tags.add(create_sample_tag(user=user, name="Extra"))
+        elif change == "add_recipe_to_tag":
+            create_sample_tag(user=user, name="Extra").recipe_set.add(recipe)
+        elif change == "clear_tag_recipes":
+            tag.recipe_set.clear()
+        elif change == "rename_tag":
+            tag.name = "Renamed tag"
+            tag.save()
+        elif change == "rename_ingredient":
+            ingredient.name = "Renamed ingredient"
+            ingredient.save()
+        elif change == "delete_tag":
+            tag.delete()
+        res = client.get(url)
+
+        recipe = Recipe.objects.get(id=recipe.id)
+        assert res.status_code == status.HTTP_200_OK
+        assert res.data == RecipeDetailSerializer(recipe).data
+
+    def test_deleted_recipe_not_served(self):
+        """Test that a deleted recipe is not served from the cache"""
+        user, client = create_and_authenticate_user()
+        recipe = create_sample_recipe(user=user)
+        url = reverse("recipe:recipe-detail", kwargs={"pk": recipe.id})
+        client.get(url)
+
+        client.delete(url)
+
+        assert client.get(url).status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db(reset_sequences=True)
+class TestsRecipeConditionalGet:
+    """Test ETag and Last-Modified handling of the recipe endpoints"""
+
+    @pytest.mark.parametrize("detail", [False, True])
+    def test_matching_etag_returns_not_modified(self, detail):
+        """Test that a current ETag returns 304 without a body"""
+        user, client = create_and_authenticate_user()
+        recipe = create_sample_recipe(user=user)
+        url = (
+            reverse("recipe:recipe-detail", kwargs={"pk": recipe.id})
+            if detail
+            else RECIPES_URL
+        )
+
+        first = client.get(url)
+        second = client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+
+        assert first.status_code == status.HTTP_200_OK
+        assert "Last-Modified" in first
+        assert second.status_code == status.HTTP_304_NOT_MODIFIED
+        assert second["ETag"] == first["ETag"]
+        assert not second.content
+
+    @pytest.mark.parametrize("detail", [False, True])
+    def test_if_modified_since_returns_not_modified(self, detail):
+        """Test that an up to date If-Modified-Since returns 304"""
+        user, client = create_and_authenticate_user()
+        recipe = create_sample_recipe(user=user)
+        url = (
+            reverse("recipe:recipe-detail", kwargs={"pk": recipe.id})
+            if detail
+            else RECIPES_URL
+        )
+
+        first = client.get(url)
+        second = client.get(url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+
+        assert second.status_code == status.HTTP_304_NOT_MODIFIED
+
+    @pytest.mark.parametrize("change", ["update", "add_tag", "rename_tag"])
+    def test_etag_changes_after_write(self, change):
+        """Test that recipe and link changes produce a new ETag"""
+        user, client = create_and_authenticate_user()
+        recipe = create_sample_recipe(user=user)
+        tag = create_sample_tag(user=user)
+        recipe.tags.add(tag)
+        detail_url = reverse("recipe:recipe-detail", kwargs={"pk": recipe.id})
+        list_etag = client.get(RECIPES_URL)["ETag"]
+        detail_etag = client.get(detail_url)["ETag"]
+
+        if change == "update":
+            client.patch(detail_url, {"title": "New title"}, format="json")
+        elif change == "add_tag":
+            recipe.tags.add(create_sample_tag(user=user, name="Extra"))
+        elif change == "rename_tag":
+            tag.name = "Renamed"
+            tag.save()
+        list_res = client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=list_etag)
+        detail_res = client.get(detail_url, HTTP_IF_NONE_MATCH=detail_etag)
+
+        assert list_res.status_code == status.HTTP_200_OK
+        assert detail_res.status_code == status.HTTP_200_OK
+        assert (
+            detail_res.data
+            == RecipeDetailSerializer(Recipe.objects.get(id=recipe.id)).data
+        )
+
+    def test_list_etag_changes_after_delete(self):
+        """Test that deleting a recipe changes the list validators"""
+        user, client = create_and_authenticate_user()
+        create_sample_recipe(user=user)
+        recipe = create_sample_recipe(user=user, title="To delete")
+        first = client.get(RECIPES_URL)
+
+        recipe.delete()
+        res = client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=first["ETag"])
+
+        assert res.status_code == status.HTTP_200_OK
+        assert len(res.data) == 1
+
+    def test_list_not_modified_without_reading_recipes(self, settings):
+        """Test that a list is validated without the shared cache or recipes"""
+        settings.CACHE_SHARED = False
+        user, client = create_and_authenticate_user()
+        create_sample_recipe(user=user)
+        first = client.get(RECIPES_URL)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=first["ETag"])
+
+        assert res.status_code == status.HTTP_304_NOT_MODIFIED
+        assert not any("core_recipe" in query["sql"] for query in queries)
+
+    def test_list_etag_changes_after_bulk_create(self):
+        """Test that recipes created in bulk change the list validators"""
+        user, client = create_and_authenticate_user()
+        first = client.get(RECIPES_URL)
+
+        client.post(BULK_CREATE_URL, bulk_payload(2), format="json")
+        res = client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=first["ETag"])
+
+        assert res.status_code == status.HTTP_200_OK
+        assert len(res.data) == 2
+
+    def test_list_etag_depends_on_query(self):
+        """Test that filtered lists do not share validators"""
+        user, client = create_and_authenticate_user()
+        recipe = create_sample_recipe(user=user)
+        tag = create_sample_tag(user=user)
+        recipe.tags.add(tag)
+
+        first = client.get(RECIPES_URL)
+        filtered = client.get(
+            RECIPES_URL, {"tags": f"{tag.id}"}, HTTP_IF_NONE_MATCH=first["ETag"]
+        )
+
+        assert filtered.status_code == status.HTTP_200_OK
+
+
+BULK_CREATE_URL = reverse("recipe:recipe-bulk-create")
+
+
+def bulk_payload(count, tags=(), ingredients=()):
+    return [
+        {
+            "title": f"Recipe {i}",
+            "minutes_to_cook": 10,
+            "price": "5.00",
+            "tags": list(tags),
+            "ingredients": list(ingredients),
+        }
+        for i in range(count)
+    ]
+
+
+@pytest.mark.django_db(reset_sequences=True)
+class TestsRecipeBulkCreate:
+    """Test creating recipes in bulk"""
+
+    def test_bulk_create_recipes(self):
+        """Test that every valid item is created with its links"""
+        user, client = create_and_authenticate_user()
+        tag = create_sample_tag(user=user)
+        ingredient = create_sample_ingredient(user=user)
+
+        res = client.post(
+            BULK_CREATE_URL,
+            bulk_payload(3, tags=[tag.id], ingredients=[ingredient.id]),
+            format="json",
+        )
+
+        recipes = Recipe.objects.filter(user=user).order_by("id")
+        assert res.status_code == status.HTTP_201_CREATED
+        assert res.data["errors"] == []
+        assert res.data["created"] == RecipeSerializer(recipes, many=True).data
+        assert [list(recipe.tags.all()) for recipe in recipes] == [[tag]] * 3
+
+    def test_bulk_create_query_count_does_not_grow(self):
+        """Test that a batch costs a fixed number of queries"""
+        user, client = create_and_authenticate_user()
+        tags = [create_sample_tag(user=user, name=f"Tag {i}") for i in range(3)]
+        ingredient = create_sample_ingredient(user=user)
+        tag_ids = [tag.id for tag in tags]
+
+        def bulk_queries(count):
+            payload = bulk_payload(count, tags=tag_ids, ingredients=[ingredient.id])
+            with CaptureQueriesContext(connection) as queries:
+                res = client.post(BULK_CREATE_URL, payload, format="json")
+            assert res.status_code == status.HTTP_201_CREATED
+            return len(queries)
+
+        assert bulk_queries(2) == bulk_queries(20)
+
+    def test_bulk_create_reports_item_errors(self):
+        """Test that invalid items are reported without aborting the batch"""
+        user, client = create_and_authenticate_user()
+        other_user = get_user_model().objects.create_user(
+            "other@londonappdev.com", "password123"
+        )
+        other_tag = create_sample_tag(user=other_user)
+        payload = bulk_payload(4)
+        payload[1]["title"] = ""
+        payload[2]["tags"] = [other_tag.id]
+        payload[3]["ingredients"] = ["abc"]
+
+        res = client.post(BULK_CREATE_URL, payload, format="json")
+
+        assert res.status_code == status.HTTP_201_CREATED
+        assert [item["title"] for item in res.data["created"]] == ["Recipe 0"]
+        assert [error["index"] for error in res.data["errors"]] == [1, 2, 3]
+        assert "title" in res.data["errors"][0]["errors"]
+        assert "tags" in res.data["errors"][1]["errors"]
+        assert "ingredients" in res.data["errors"][2]["errors"]
+        assert Recipe.objects.filter(user=user).count() == 1
+
+    def test_bulk_create_all_invalid(self):
+        """Test that a batch without valid items returns 400"""
+        user, client = create_and_authenticate_user()
+        payload = bulk_payload(2)
+        for item in payload:
+            item.pop("price")
+
+        res = client.post(BULK_CREATE_URL, payload, format="json")
+
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
+        assert len(res.data["errors"]) == 2
+        assert not Recipe.objects.exists()
+
+    @pytest.mark.parametrize("payload", [{"title": "Not a list"}, bulk_payload(3)])
+    def test_bulk_create_invalid_batch(self, settings, payload):
+        """Test that non list and oversized batches are rejected"""
+        settings.RECIPE_BULK_CREATE_MAX_ITEMS = 2
+        user, client = create_and_authenticate_user()
+
+        res = client.post(BULK_CREATE_URL, payload, format="json")
+
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
+        assert not Recipe.objects.exists()
+
 
 @pytest.mark.django_db(reset_sequences=True)
 class TestsRecipeImageUpload:
@@ -424,6 +916,30 @@ class TestsRecipeImageUpload:
         assert os.path.exists(recipe.image.path) is True
         assert len(os.listdir(os.path.split(recipe.image.path)[0])) == 1
 
+    @pytest.mark.parametrize("method", ["patch", "put"])
+    def test_update_recipe_ignores_image(self, create_user_and_recipe, method):
+        """Test that the image can only be written by the image actions"""
+        user, client, recipe = create_user_and_recipe
+        url = reverse("recipe:recipe-upload-image", args=[recipe.id])
+        add_image_to_the_recipe(client, url, "JPEG")
+        images.wait_for_pending(timeout=30)
+        recipe.refresh_from_db()
+        payload = {
+            "title": "New title",
+            "minutes_to_cook": 5,
+            "price": "5.00",
+            "image": ContentFile(image_bytes("PNG"), name="new.png"),
+        }
+
+        detail_url = reverse("recipe:recipe-detail", args=[recipe.id])
+        res = getattr(client, method)(detail_url, payload, format="multipart")
+
+        updated = Recipe.objects.get(pk=recipe.pk)
+        assert res.status_code == status.HTTP_200_OK
+        assert updated.title == "New title"
+        assert updated.image.name == recipe.image.name
+        assert updated.image_variants == recipe.image_variants
+
     @pytest.mark.parametrize("value", ["afadfnjk", "", 1, 2.242424, False])
     def test_upload_image_bad_request(self, create_user_and_recipe, value):
         """Test uploading an invalid image"""
@@ -446,3 +962,817 @@ class TestsRecipeImageUpload:
         assert res.status_code == status.HTTP_204_NO_CONTENT
         recipe.refresh_from_db()
         assert len(os.listdir(os.path.split(path)[0])) == 0
+
+    def test_upload_image_queues_variants(self, create_user_and_recipe, monkeypatch):
+        """Test that the upload response does not wait for the variants"""
+        user, client, recipe = create_user_and_recipe
+        queued = []
+        monkeypatch.setattr(images, "queue_variants", lambda *args: queued.append(args))
+        url = reverse("recipe:recipe-upload-image", args=[recipe.id])
+        res = add_image_to_the_recipe(client, url, "JPEG")
+        recipe.refresh_from_db()
+
+        assert res.status_code == status.HTTP_200_OK
+        assert queued == [(recipe.id, recipe.image.name)]
+        assert res.data["image_status"] == Recipe.ImageStatus.PENDING
+        assert res.data["image_variants"] == {}
+
+    def test_generate_variants_of_invalid_image(self, create_user_and_recipe):
+        """Test that an image that cannot be resized is marked failed"""
+        user, client, recipe = create_user_and_recipe
+        recipe.image.save("broken.jpg", ContentFile(b"not an image"))
+
+        images.generate_variants(recipe.id, recipe.image.name, close_connection=False)
+
+        recipe.refresh_from_db()
+        assert recipe.image_status == Recipe.ImageStatus.FAILED
+        assert recipe.image_variants == {}
+
+    def test_failed_job_keeps_shared_variants(
+        self, create_user_and_recipe, monkeypatch
+    ):
+        """Test that a failed job only deletes the variants it wrote"""
+        user, client, recipe = create_user_and_recipe
+        recipe.image.save("image.jpg", ContentFile(image_bytes("JPEG")))
+        shared = images.variant_name(recipe.image.name, "thumbnail")
+        images.write_file(shared, b"variant of another recipe")
+        render_variant = images.render_variant
+
+        def fail_medium(image, size):
+            if size == settings.RECIPE_IMAGE_VARIANTS["medium"]:
+                raise OSError("disk full")
+            return render_variant(image, size)
+
+        monkeypatch.setattr(images, "render_variant", fail_medium)
+
+        images.generate_variants(recipe.id, recipe.image.name, close_connection=False)
+
+        recipe.refresh_from_db()
+        assert recipe.image_status == Recipe.ImageStatus.FAILED
+        assert default_storage.exists(shared)
+        images.delete_variants(recipe.image.name)
+
+    def test_generate_variants_of_replaced_image(
+        self, create_user_and_recipe, monkeypatch
+    ):
+        """Test that a job for a replaced image leaves the recipe alone"""
+        user, client, recipe = create_user_and_recipe
+        url = reverse("recipe:recipe-upload-image", args=[recipe.id])
+        add_image_to_the_recipe(client, url, "JPEG")
+        recipe.refresh_from_db()
+        stale_name = recipe.image.name
+        monkeypatch.setattr(images, "queue_variants", lambda *args: None)
+        add_image_to_the_recipe(client, url, "JPEG")
+        recipe.refresh_from_db()
+        default_storage.save(stale_name, ContentFile(recipe.image.read()))
+
+        images.generate_variants(recipe.id, stale_name, close_connection=False)
+
+        recipe.refresh_from_db()
+        default_storage.delete(stale_name)
+        assert recipe.image_status == Recipe.ImageStatus.PENDING
+        assert not any(
+            default_storage.exists(images.variant_name(stale_name, variant))
+            for variant in settings.RECIPE_IMAGE_VARIANTS
+        )
+
+    def test_recipe_delete_removes_image(self, create_user_and_recipe):
+        """Test that deleting a recipe deletes its own image"""
+        user, client, recipe = create_user_and_recipe
+        url = reverse("recipe:recipe-upload-image", args=[recipe.id])
+        add_image_to_the_recipe(client, url, "JPEG")
+        images.wait_for_pending(timeout=30)
+        recipe.refresh_from_db()
+        files = [recipe.image.name, *recipe.image_variants.values()]
+
+        res = client.delete(reverse("recipe:recipe-detail", args=[recipe.id]))
+
+        assert res.status_code == status.HTTP_204_NO_CONTENT
+        assert not any(default_storage.exists(file) for file in files)
+
+
+def image_bytes(image_format, size=(500, 500)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size).save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def upload_files():
+    upload_dir = default_storage.path(images.UPLOAD_DIR)
+    return [name for _, _, files in os.walk(upload_dir) for name in files]
+
+
+@pytest.mark.django_db(reset_sequences=True)
+class TestsRecipeImageStream:
+    """Test the streaming recipe image upload"""
+
+    def put_image(self, client, recipe, body):
+        url = reverse("recipe:recipe-stream-image", args=[recipe.id])
+        return client.put(url, data=body, content_type="application/octet-stream")
+
+    @pytest.mark.parametrize(
+        "image_format,extension",
+        [("JPEG", "jpg"), ("PNG", "png"), ("GIF", "gif"), ("WEBP", "webp")],
+    )
+    def test_stream_image(self, create_user_and_recipe, image_format, extension):
+        """Test that the request body is stored as the recipe image"""
+        user, client, recipe = create_user_and_recipe
+        body = image_bytes(image_format)
+
+        res = self.put_image(client, recipe, body)
+
+        recipe.refresh_from_db()
+        assert res.status_code == status.HTTP_200_OK, res.data
+        assert res.data["image_status"] == Recipe.ImageStatus.PENDING
+        assert recipe.image.name.endswith(f".{extension}")
+        with open(recipe.image.path, "rb") as image_file:
+            assert image_file.read() == body
+
+    def test_stream_multi_picture_jpeg(self, create_user_and_recipe):
+        """Test that a JPEG with several frames is stored as a JPEG"""
+        user, client, recipe = create_user_and_recipe
+        buffer = io.BytesIO()
+        frames = [Image.new("RGB", (500, 500)) for _ in range(2)]
+        frames[0].save(buffer, format="MPO", save_all=True, append_images=frames[1:])
+
+        res = self.put_image(client, recipe, buffer.getvalue())
+
+        recipe.refresh_from_db()
+        assert res.status_code == status.HTTP_200_OK, res.data
+        assert recipe.image.name.endswith(".jpg")
+
+    def test_stream_image_replaces_previous_image(self, create_user_and_recipe):
+        """Test that the previous image file is removed"""
+        user, client, recipe = create_user_and_recipe
+        self.put_image(client, recipe, image_bytes("PNG"))
+        recipe.refresh_from_db()
+        previous = recipe.image.path
+
+        res = self.put_image(client, recipe, image_bytes("JPEG"))
+
+        recipe.refresh_from_db()
+        assert res.status_code == status.HTTP_200_OK
+        assert not os.path.exists(previous)
+        assert upload_files() == [os.path.basename(recipe.image.path)]
+
+    def test_stream_image_too_many_bytes(self, create_user_and_recipe, settings):
+        """Test that a body over the byte limit is rejected"""
+        user, client, recipe = create_user_and_recipe
+        body = image_bytes("PNG")
+        settings.RECIPE_IMAGE_MAX_BYTES = len(body) - 1
+
+        res = self.put_image(client, recipe, body)
+
+        recipe.refresh_from_db()
+        assert res.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        assert not recipe.image
+        assert upload_files() == []
+
+    def test_stream_image_too_many_bytes_without_length(
+        self, create_user_and_recipe, settings
+    ):
+        """Test that the byte limit is enforced while reading the stream"""
+        user, client, recipe = create_user_and_recipe
+        body = image_bytes("PNG", size=(2000, 2000))
+        settings.RECIPE_IMAGE_MAX_BYTES = len(body) - 1
+
+        with pytest.raises(images.UploadTooLarge):
+            images.store_upload(io.BytesIO(body), recipe)
+
+        assert upload_files() == []
+
+    def test_stream_image_invalid_length(self, create_user_and_recipe):
+        """Test that a non-numeric Content-Length is a bad request"""
+        user, client, recipe = create_user_and_recipe
+
+        url = reverse("recipe:recipe-stream-image", args=[recipe.id])
+        res = client.put(
+            url,
+            data=image_bytes("PNG"),
+            content_type="application/octet-stream",
+            CONTENT_LENGTH="many",
+        )
+
+        recipe.refresh_from_db()
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
+        assert not recipe.image
+        assert upload_files() == []
+
+    def test_stream_image_too_many_pixels(self, create_user_and_recipe, settings):
+        """Test that the pixel limit is checked from the header"""
+        user, client, recipe = create_user_and_recipe
+        settings.RECIPE_IMAGE_MAX_PIXELS = 100 * 100
+
+        res = self.put_image(client, recipe, image_bytes("PNG", size=(101, 100)))
+
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
+        assert "image" in res.data
+        assert upload_files() == []
+
+    @pytest.mark.parametrize(
+        "body", [b"", b"not an image", image_bytes("BMP"), image_bytes("TIFF")]
+    )
+    def test_stream_image_invalid(self, create_user_and_recipe, body):
+        """Test that bodies that are not a supported image are rejected"""
+        user, client, recipe = create_user_and_recipe
+
+        res = self.put_image(client, recipe, body)
+
+        recipe.refresh_from_db()
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
+        assert not recipe.image
+        assert upload_files() == []
+
+
+@pytest.mark.django_db(reset_sequences=True)
+class TestsRecipeImageContentStorage:
+    """Test the deduplicated, reference counted image storage"""
+
+    @pytest.fixture(autouse=True)
+    def content_storage(self, settings):
+        settings.RECIPE_IMAGE_STORAGE = "content"
+
+    def upload(self, client, recipe):
+        url = reverse("recipe:recipe-upload-image", args=[recipe.id])
+        res = add_image_to_the_recipe(client, url, "JPEG")
+        assert res.status_code == status.HTTP_200_OK
+        images.wait_for_pending(timeout=30)
+        recipe.refresh_from_db()
+        return recipe.image.name
+
+    def test_identical_images_stored_once(self, create_user_and_recipe):
+        """Test that the same image uploaded twice is linked, not rewritten"""
+        user, client, recipe = create_user_and_recipe
+        other = create_sample_recipe(user=user)
+
+        name = self.upload(client, recipe)
+        other_name = self.upload(client, other)
+
+        assert name == other_name
+        assert upload_files() == [os.path.basename(name)]
+        assert ImageBlob.objects.get(name=name).refs == 2
+        client.delete(reverse("recipe:recipe-detail", args=[other.id]))
+
+    def test_streamed_image_linked(self, create_user_and_recipe):
+        """Test that the streaming upload links to a stored image"""
+        user, client, recipe = create_user_and_recipe
+        name = self.upload(client, recipe)
+        other = create_sample_recipe(user=user)
+
+        with open(recipe.image.path, "rb") as image_file:
+            url = reverse("recipe:recipe-stream-image", args=[other.id])
+            res = client.put(url, data=image_file.read(), content_type="image/jpeg")
+
+        other.refresh_from_db()
+        assert res.status_code == status.HTTP_200_OK
+        assert other.image.name == name
+        assert ImageBlob.objects.get(name=name).refs == 2
+        client.delete(reverse("recipe:recipe-detail", args=[other.id]))
+
+    def test_new_blob_replaces_leftover_file(self, create_user_and_recipe):
+        """Test that a file left by a released blob is replaced by the upload"""
+        user, client, recipe = create_user_and_recipe
+        body = image_bytes("PNG")
+        digest = hashlib.sha256(body).hexdigest()
+        name = sharded_path(images.UPLOAD_DIR, f"{digest}.png")
+        images.write_file(name, b"about to be deleted")
+
+        url = reverse("recipe:recipe-stream-image", args=[recipe.id])
+        res = client.put(url, data=body, content_type="image/png")
+
+        recipe.refresh_from_db()
+        assert res.status_code == status.HTTP_200_OK
+        assert recipe.image.name == name
+        with default_storage.open(name) as image_file:
+            assert image_file.read() == body
+
+    def test_image_deleted_with_last_reference(self, create_user_and_recipe):
+        """Test that the file and variants go with the last reference"""
+        user, client, recipe = create_user_and_recipe
+        other = create_sample_recipe(user=user)
+        name = self.upload(client, recipe)
+        self.upload(client, other)
+        files = [name, *recipe.image_variants.values()]
+
+        client.delete(reverse("recipe:recipe-delete-image", args=[recipe.id]))
+
+        assert all(default_storage.exists(file) for file in files)
+        assert ImageBlob.objects.get(name=name).refs == 1
+
+        client.delete(reverse("recipe:recipe-detail", args=[other.id]))
+
+        assert not any(default_storage.exists(file) for file in files)
+        assert not ImageBlob.objects.exists()
+
+    def test_reupload_keeps_shared_image(self, create_user_and_recipe):
+        """Test that replacing a shared image keeps it for the other recipe"""
+        user, client, recipe = create_user_and_recipe
+        other = create_sample_recipe(user=user)
+        name = self.upload(client, recipe)
+        self.upload(client, other)
+
+        url = reverse("recipe:recipe-stream-image", args=[recipe.id])
+        res = client.put(url, data=image_bytes("PNG"), content_type="image/png")
+
+        recipe.refresh_from_db()
+        assert res.status_code == status.HTTP_200_OK
+        assert recipe.image.name != name
+        assert default_storage.exists(name)
+        assert ImageBlob.objects.get(name=name).refs == 1
+        client.delete(reverse("recipe:recipe-detail", args=[other.id]))
+        assert not default_storage.exists(name)
+
+
+@pytest.mark.django_db(transaction=True, reset_sequences=True)
+class TestsRecipeImageVariants:
+    """Test the background generation of recipe image variants"""
+
+    def upload_and_wait(self, client, recipe):
+        url = reverse("recipe:recipe-upload-image", args=[recipe.id])
+        res = add_image_to_the_recipe(client, url, "JPEG")
+        images.wait_for_pending(timeout=30)
+        assert res.status_code == status.HTTP_200_OK
+        recipe.refresh_from_db()
+        return recipe
+
+    def test_variants_generated(self, create_user_and_recipe):
+        """Test that the variants are resized and exposed once ready"""
+        user, client, recipe = create_user_and_recipe
+        recipe = self.upload_and_wait(client, recipe)
+
+        res = client.get(reverse("recipe:recipe-detail", args=[recipe.id]))
+
+        assert recipe.image_status == Recipe.ImageStatus.READY
+        assert res.data["image_status"] == Recipe.ImageStatus.READY
+        assert set(res.data["image_variants"]) == set(settings.RECIPE_IMAGE_VARIANTS)
+        for variant, size in settings.RECIPE_IMAGE_VARIANTS.items():
+            name = recipe.image_variants[variant]
+            assert res.data["image_variants"][variant].endswith(name)
+            with default_storage.open(name) as variant_file:
+                with Image.open(variant_file) as image:
+                    assert image.width <= size[0] and image.height <= size[1]
+
+    def test_delete_image_removes_variants(self, create_user_and_recipe):
+        """Test that deleting the image deletes its variants"""
+        user, client, recipe = create_user_and_recipe
+        recipe = self.upload_and_wait(client, recipe)
+        variants = recipe.image_variants
+
+        res = client.delete(reverse("recipe:recipe-delete-image", args=[recipe.id]))
+
+        recipe.refresh_from_db()
+        assert res.status_code == status.HTTP_204_NO_CONTENT
+        assert recipe.image_status == Recipe.ImageStatus.NONE
+        assert recipe.image_variants == {}
+        assert not any(default_storage.exists(name) for name in variants.values())
+
+    def test_full_queue_leaves_recipe_pending(
+        self, create_user_and_recipe, monkeypatch
+    ):
+        """Test that a full queue drops the job instead of resizing inline"""
+        user, client, recipe = create_user_and_recipe
+        monkeypatch.setattr(images, "_slots", threading.BoundedSemaphore(1))
+        images._slots.acquire()
+
+        recipe = self.upload_and_wait(client, recipe)
+
+        assert recipe.image_status == Recipe.ImageStatus.PENDING
+        assert recipe.image_variants == {}
+        assert not any(
+            default_storage.exists(images.variant_name(recipe.image.name, variant))
+            for variant in settings.RECIPE_IMAGE_VARIANTS
+        )
+
+
+@pytest.mark.django_db(reset_sequences=True)
+class TestsRecipeSparseFields:
+    """Test selecting recipe fields with fields= and omit="""
+
+    def test_list_fields(self):
+        """Test that only the requested columns are read and returned"""
+        user, client = create_and_authenticate_user()
+        recipe = create_sample_recipe(user=user, link="https://example.com")
+        recipe.tags.add(create_sample_tag(user=user))
+
+        with CaptureQueriesContext(connection) as queries:
+            res = client.get(RECIPES_URL, {"fields": "title,id"})
+
+        assert res.status_code == status.HTTP_200_OK
+        assert res.json() == [{"id": recipe.id, "title": recipe.title}]
+        sql = queries[-1]["sql"]
+        assert '"core_recipe"."title"' in sql
+        assert '"core_recipe"."link"' not in sql
+        assert "core_recipe_tags" not in sql
+
+    def test_list_omit(self):
+        """Test that omitted fields are left out"""
+        user, client = create_and_authenticate_user()
+        recipe = create_sample_recipe(user=user)
+        tag = create_sample_tag(user=user)
+        recipe.tags.add(tag)
+        omitted = {"image", "image_status", "image_variants", "ingredients"}
+
+        res = client.get(RECIPES_URL, {"omit": ",".join(omitted)})
+
+        expected = RecipeSerializer(recipe).data
+        assert res.json() == [
+            {name: expected[name] for name in expected if name not in omitted}
+        ]
+
+    def test_paginated_list_fields(self):
+        """Test that cursors work without the ordering field in the payload"""
+        user, client = create_and_authenticate_user()
+        recipes = [create_sample_recipe(user=user, title=f"R{i}") for i in range(3)]
+
+        first = client.get(RECIPES_URL, {"fields": "title", "page_size": 2})
+        second = client.get(first.json()["next"])
+
+        assert first.json()["results"] == [{"title": "R2"}, {"title": "R1"}]
+        assert second.json()["results"] == [{"title": recipes[0].title}]
+
+    @pytest.mark.parametrize(
+        "params", [{"fields": "id,secret"}, {"omit": "user"}, {"fields": ","}]
+    )
+    def test_invalid_fields(self, params):
+        """Test that unknown and empty selections are rejected"""
+        user, client = create_and_authenticate_user()
+
+        res = client.get(RECIPES_URL, params)
+
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_detail_fields(self):
+        """Test that a trimmed detail has its own ETag"""
+        user, client = create_and_authenticate_user()
+        recipe = create_sample_recipe(user=user)
+        tag = create_sample_tag(user=user)
+        recipe.tags.add(tag)
+        url = reverse("recipe:recipe-detail", kwargs={"pk": recipe.id})
+
+        full = client.get(url)
+        res = client.get(url, {"fields": "tags,id"}, HTTP_IF_NONE_MATCH=full["ETag"])
+
+        assert res.status_code == status.HTTP_200_OK
+        assert res.json() == {
+            "id": recipe.id,
+            "tags": [{"id": tag.id, "name": tag.name}],
+        }
+        assert res["ETag"] != full["ETag"]
+
+    def test_fields_ignored_on_write(self):
+        """Test that writes return the whole recipe"""
+        user, client = create_and_authenticate_user()
+        payload = {"title": "Cake", "minutes_to_cook": 5, "price": "5.00"}
+
+        res = client.post(f"{RECIPES_URL}?fields=id", payload)
+
+        assert res.status_code == status.HTTP_201_CREATED
+        assert res.json()["title"] == "Cake"
+
+
+@pytest.mark.django_db(reset_sequences=True)
+class TestsRecipeSearch:
+    """Test the full-text recipe search"""
+
+    def test_search_ranks_title_first(self):
+        """Test that title matches come before tag and ingredient matches"""
+        user, client = create_and_authenticate_user()
+        by_ingredient = create_sample_recipe(user=user, title="Stew")
+        by_ingredient.ingredients.add(create_sample_ingredient(user=user, name="Lemon"))
+        by_tag = create_sample_recipe(user=user, title="Cake")
+        by_tag.tags.add(create_sample_tag(user=user, name="Lemons"))
+        by_title = create_sample_recipe(user=user, title="Lemon tart")
+        create_sample_recipe(user=user, title="Soup")
+
+        res = client.get(RECIPES_URL, {"search": "lemon"})
+
+        assert res.status_code == status.HTTP_200_OK
+        assert [recipe["id"] for recipe in res.json()] == [
+            by_title.id,
+            by_tag.id,
+            by_ingredient.id,
+        ]
+
+    def test_search_syntax(self):
+        """Test that phrases and excluded words are supported"""
+        user, client = create_and_authenticate_user()
+        create_sample_recipe(user=user, title="Chocolate cake")
+        cookies = create_sample_recipe(user=user, title="Chocolate cookies")
+
+        res = client.get(RECIPES_URL, {"search": "chocolate -cake"})
+
+        assert [recipe["id"] for recipe in res.json()] == [cookies.id]
+
+    def test_search_follows_changes(self):
+        """Test that renames and new links are searchable"""
+        user, client = create_and_authenticate_user()
+        recipe = create_sample_recipe(user=user, title="Soup")
+        tag = create_sample_tag(user=user, name="Vegan")
+        recipe.tags.add(tag)
+        tag.name = "Spicy"
+        tag.save()
+        recipe.title = "Broth"
+        recipe.save()
+
+        assert client.get(RECIPES_URL, {"search": "vegan"}).json() == []
+        assert len(client.get(RECIPES_URL, {"search": "spicy broth"}).json()) == 1
+
+        recipe.tags.remove(tag)
+
+        assert client.get(RECIPES_URL, {"search": "spicy"}).json() == []
+
+    def test_search_bulk_created(self):
+        """Test that recipes created in bulk are searchable"""
+        user, client = create_and_authenticate_user()
+        ingredient = create_sample_ingredient(user=user, name="Basil")
+        client.post(
+            BULK_CREATE_URL,
+            bulk_payload(2, ingredients=[ingredient.id]),
+            format="json",
+        )
+
+        res = client.get(RECIPES_URL, {"search": "basil"})
+
+        assert len(res.json()) == 2
+
+    def test_search_paginated(self):
+        """Test that cursors keep the rank order across pages"""
+        user, client = create_and_authenticate_user()
+        for i in range(3):
+            create_sample_recipe(user=user, title=f"Pie {i}")
+        create_sample_recipe(user=user, title="Pie pie pie")
+
+        first = client.get(RECIPES_URL, {"search": "pie", "page_size": 2})
+        second = client.get(first.json()["next"])
+
+        titles = [
+            recipe["title"]
+            for page in (first, second)
+            for recipe in page.json()["results"]
+        ]
+        assert titles == ["Pie pie pie", "Pie 2", "Pie 1", "Pie 0"]
+        assert second.json()["next"] is None
+
+    def test_search_combined_with_filters(self):
+        """Test that the search only applies to the filtered recipes"""
+        user, client = create_and_authenticate_user()
+        tag = create_sample_tag(user=user)
+        tagged = create_sample_recipe(user=user, title="Pasta")
+        tagged.tags.add(tag)
+        create_sample_recipe(user=user, title="Pasta bake")
+
+        res = client.get(RECIPES_URL, {"search": "pasta", "tags": tag.id})
+
+        assert [recipe["id"] for recipe in res.json()] == [tagged.id]
+
+
+STATS_URL = reverse("recipe:recipe-stats")
+
+
+@pytest.mark.django_db(reset_sequences=True)
+class TestsRecipeStats:
+    """Test the recipe statistics of a user"""
+
+    def test_stats(self):
+        """Test the totals, percentiles, histogram and top names"""
+        user, client = create_and_authenticate_user()
+        other = get_user_model().objects.create_user("other@londonappdev.com", "pass")
+        create_sample_recipe(user=other, price=100, minutes_to_cook=1)
+        vegan = create_sample_tag(user=user, name="Vegan")
+        quick = create_sample_tag(user=user, name="Quick")
+        salt = create_sample_ingredient(user=user, name="Salt")
+        for price, minutes in [(1, 10), (2, 20), (3, 45), (4, 200)]:
+            recipe = create_sample_recipe(
+                user=user, price=price, minutes_to_cook=minutes
+            )
+            recipe.tags.add(vegan)
+        recipe.tags.add(quick)
+        recipe.ingredients.add(salt)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = client.get(STATS_URL)
+
+        assert res.status_code == status.HTTP_200_OK
+        assert len(queries) == 3
+        assert res.json() == {
+            "count": 4,
+            "price": {
+                "total": "10.00",
+                "average": "2.50",
+                "min": "1.00",
+                "max": "4.00",
+                "percentiles": {"p50": "2.50", "p90": "3.70", "p95": "3.85"},
+            },
+            "minutes_to_cook": {
+                "average": 68.8,
+                "histogram": [
+                    {"from": 0, "to": 15, "count": 1},
+                    {"from": 15, "to": 30, "count": 1},
+                    {"from": 30, "to": 60, "count": 1},
+                    {"from": 60, "to": 120, "count": 0},
+                    {"from": 120, "to": None, "count": 1},
+                ],
+            },
+            "top_tags": [
+                {"id": vegan.id, "name": "Vegan", "recipe_count": 4},
+                {"id": quick.id, "name": "Quick", "recipe_count": 1},
+            ],
+            "top_ingredients": [{"id": salt.id, "name": "Salt", "recipe_count": 1}],
+        }
+
+    def test_stats_without_recipes(self):
+        """Test that a user without recipes gets empty statistics"""
+        user, client = create_and_authenticate_user()
+
+        res = client.get(STATS_URL)
+
+        assert res.json()["count"] == 0
+        assert res.json()["price"] == {
+            "total": "0.00",
+            "average": None,
+            "min": None,
+            "max": None,
+            "percentiles": {"p50": None, "p90": None, "p95": None},
+        }
+        assert res.json()["minutes_to_cook"]["average"] is None
+        assert res.json()["top_tags"] == []
+
+    def test_percentiles_rounded_to_cents(self):
+        """Test that percentiles are rounded from their decimal value"""
+        user, client = create_and_authenticate_user()
+        create_sample_recipe(user=user, price="2.65")
+        create_sample_recipe(user=user, price="2.70")
+
+        res = client.get(STATS_URL)
+
+        assert res.json()["price"]["percentiles"]["p50"] == "2.68"
+
+    def test_stats_cached(self):
+        """Test that repeated reads are served from the cache"""
+        user, client = create_and_authenticate_user()
+        create_sample_recipe(user=user)
+        first = client.get(STATS_URL)
+
+        with CaptureQueriesContext(connection) as queries:
+            second = client.get(STATS_URL)
+
+        assert second.data == first.data
+        assert len(queries) == 0
+
+    def test_stats_not_cached_on_process_local_cache(self, settings):
+        """Test that the stats are computed every time unless the cache is shared"""
+        settings.CACHE_SHARED = False
+        user, client = create_and_authenticate_user()
+        create_sample_recipe(user=user)
+        client.get(STATS_URL)
+
+        with CaptureQueriesContext(connection) as queries:
+            client.get(STATS_URL)
+
+        assert len(queries) == 3
+
+    @pytest.mark.parametrize(
+        "change",
+        [
+            "create_recipe",
+            "bulk_create",
+            "update_price",
+            "delete_recipe",
+            "add_tag",
+            "clear_tag_recipes",
+            "rename_ingredient",
+            "delete_tag",
+        ],
+    )
+    def test_stats_invalidated(self, change):
+        """Test that writes to recipes or their links refresh the stats"""
+        user, client = create_and_authenticate_user()
+        recipe = create_sample_recipe(user=user)
+        tag = create_sample_tag(user=user)
+        ingredient = create_sample_ingredient(user=user)
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient)
+        before = client.get(STATS_URL).json()
+
+        if change == "create_recipe":
+            create_sample_recipe(user=user)
+        elif change == "bulk_create":
+            client.post(BULK_CREATE_URL, bulk_payload(2), format="json")
+        elif change == "update_price":
+            recipe.price = 20
+            recipe.save()
+        elif change == "delete_recipe":
+            recipe.delete()
+        elif change == "add_tag":
+            recipe.tags.add(create_sample_tag(user=user, name="Extra"))
+        elif change == "clear_tag_recipes":
+            tag.recipe_set.clear()
+        elif change == "rename_ingredient":
+            ingredient.name = "Renamed ingredient"
+            ingredient.save()
+        elif change == "delete_tag":
+            tag.delete()
+        res = client.get(STATS_URL)
+
+        assert res.json() != before
+        assert res.data == stats.recipe_stats(user)
+
+
+@pytest.mark.django_db(reset_sequences=True)
+class TestsRecipeRangesAndOrdering:
+    """Test the price and cooking time filters and orderings"""
+
+    def test_range_filters(self):
+        """Test that inclusive bounds select the recipes"""
+        user, client = create_and_authenticate_user()
+        recipes = [
+            create_sample_recipe(user=user, price=price, minutes_to_cook=minutes)
+            for price, minutes in [(1, 10), (5, 20), (10, 30), (20, 40)]
+        ]
+
+        def ids(params):
+            res = client.get(RECIPES_URL, params)
+            assert res.status_code == status.HTTP_200_OK
+            return [recipe["id"] for recipe in res.json()]
+
+        assert ids({"price_min": "5.00", "price_max": 10}) == [
+            recipes[2].id,
+            recipes[1].id,
+        ]
+        assert ids({"minutes_min": 30}) == [recipes[3].id, recipes[2].id]
+        assert ids({"price_max": 10, "minutes_max": 10}) == [recipes[0].id]
+
+    @pytest.mark.parametrize(
+        "ordering,expected",
+        [
+            ("price", [0, 1, 2, 3]),
+            ("-price", [3, 2, 1, 0]),
+            ("minutes_to_cook", [2, 1, 3, 0]),
+            ("-minutes_to_cook", [0, 3, 1, 2]),
+            ("id", [0, 1, 2, 3]),
+        ],
+    )
+    def test_ordering(self, ordering, expected):
+        """Test that ties are ordered by id in the same direction"""
+        user, client = create_and_authenticate_user()
+        recipes = [
+            create_sample_recipe(user=user, price=price, minutes_to_cook=minutes)
+            for price, minutes in [(2, 40), (2, 20), (3, 10), (4, 20)]
+        ]
+
+        res = client.get(RECIPES_URL, {"ordering": ordering})
+
+        assert [recipe["id"] for recipe in res.json()] == [
+            recipes[index].id for index in expected
+        ]
+
+    @pytest.mark.parametrize("ordering", ["price", "-minutes_to_cook"])
+    def test_ordering_paginated(self, ordering):
+        """Test that cursors walk an ordering with ties in both directions"""
+        user, client = create_and_authenticate_user()
+        for i in range(7):
+            create_sample_recipe(user=user, price=i % 3, minutes_to_cook=i % 2)
+        expected = [
+            recipe["id"]
+            for recipe in client.get(RECIPES_URL, {"ordering": ordering}).json()
+        ]
+
+        pages = [client.get(RECIPES_URL, {"ordering": ordering, "page_size": 3})]
+        while pages[-1].json()["next"]:
+            pages.append(client.get(pages[-1].json()["next"]))
+        previous = client.get(pages[-1].json()["previous"])
+
+        ids = [recipe["id"] for page in pages for recipe in page.json()["results"]]
+        assert ids == expected
+        assert previous.json()["results"] == pages[-2].json()["results"]
+
+    def test_ordering_overrides_search_rank(self):
+        """Test that an explicit ordering replaces the best matches first"""
+        user, client = create_and_authenticate_user()
+        cheap = create_sample_recipe(user=user, title="Pie", price=1)
+        dear = create_sample_recipe(user=user, title="Pie pie pie", price=9)
+
+        ranked = client.get(RECIPES_URL, {"search": "pie"})
+        ordered = client.get(RECIPES_URL, {"search": "pie", "ordering": "price"})
+
+        assert [recipe["id"] for recipe in ranked.json()] == [dear.id, cheap.id]
+        assert [recipe["id"] for recipe in ordered.json()] == [cheap.id, dear.id]
+
+    @pytest.mark.parametrize(
+        "params",
+        [
+            {"price_min": "abc"},
+            {"price_max": "-1"},
+            {"minutes_min": "1.5"},
+            {"ordering": "title"},
+            {"ordering": "user"},
+        ],
+    )
+    def test_invalid_parameters(self, params):
+        """Test that invalid bounds and orderings are rejected"""
+        user, client = create_and_authenticate_user()
+
+        res = client.get(RECIPES_URL, params)
+
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
+        assert list(res.json()) == list(params)
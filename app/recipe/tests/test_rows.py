@@ -0,0 +1,115 @@
+import pytest
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from core.models import Recipe
+from recipe import rows, sparse
+from recipe.serializers import RecipeSerializer
+from helpers.test_helpers import (
+    create_user,
+    create_sample_recipe,
+    create_sample_tag,
+    create_sample_ingredient,
+)
+
+
+def serializer_bytes(queryset, request=None):
+    context = {"request": request} if request is not None else {}
+    queryset = queryset.prefetch_related(*rows.RELATIONS_BY_ID)
+    return JSONRenderer().render(
+        RecipeSerializer(queryset, many=True, context=context).data
+    )
+
+
+def rows_bytes(queryset, request=None):
+    return JSONRenderer().render(
+        rows.serialize_rows(rows.recipe_rows(queryset), request)
+    )
+
+
+@pytest.fixture()
+def recipes():
+    user = create_user(email="test@londonappdev.com", password="testpass")
+    tags = [create_sample_tag(user=user, name=f"Tag {i}") for i in range(3)]
+    ingredients = [
+        create_sample_ingredient(user=user, name=f"Ingredient {i}") for i in range(3)
+    ]
+    create_sample_recipe(user=user, title="Plain", price="0.10")
+    linked = create_sample_recipe(
+        user=user,
+        title='Crème brûlée ☃ "quoted" </script>',
+        minutes_to_cook=0,
+        price="99999999.99",
+        link="https://example.com/recipe?a=1&b=2",
+    )
+    linked.tags.add(tags[2], tags[0])
+    linked.ingredients.add(*ingredients)
+    pending = create_sample_recipe(
+        user=user,
+        title="Pending",
+        price=7,
+        image="uploads/recipe/ab/cd/image.jpg",
+        image_status=Recipe.ImageStatus.PENDING,
+        image_variants={"thumbnail": "uploads/recipe-variants/ab/cd/image_t.jpg"},
+    )
+    pending.tags.add(tags[1])
+    create_sample_recipe(
+        user=user,
+        title="Ready",
+        price="1.5",
+        image="uploads/recipe/ef/01/ready image.png",
+        image_status=Recipe.ImageStatus.READY,
+        image_variants={
+            "thumbnail": "uploads/recipe-variants/ef/01/ready image_thumbnail.jpg",
+            "medium": "uploads/recipe-variants/ef/01/ready image_medium.jpg",
+        },
+    )
+    create_sample_recipe(user=user, title="Failed", image_status="failed")
+    return Recipe.objects.filter(user=user).order_by("-id")
+
+
+@pytest.mark.django_db
+class TestRecipeRows:
+    """Test the fast path of recipe lists against RecipeSerializer"""
+
+    def test_same_bytes_without_request(self, recipes):
+        """Test that relative URLs are rendered alike"""
+        assert rows_bytes(recipes) == serializer_bytes(recipes)
+
+    def test_same_bytes_with_request(self, recipes):
+        """Test that absolute URLs are rendered alike"""
+        request = APIRequestFactory().get("/api/recipe/recipes/")
+
+        assert rows_bytes(recipes, request) == serializer_bytes(recipes, request)
+
+    def test_same_bytes_for_empty_list(self, recipes):
+        """Test that an empty list renders alike"""
+        queryset = recipes.none()
+
+        assert rows_bytes(queryset) == serializer_bytes(queryset) == b"[]"
+
+    def test_relations_aggregated_in_one_query(
+        self, recipes, django_assert_num_queries
+    ):
+        """Test that the ids of the relations need no extra queries"""
+        with django_assert_num_queries(1):
+            data = rows.serialize_rows(rows.recipe_rows(recipes))
+
+        assert [len(recipe["tags"]) for recipe in data] == [0, 0, 1, 2, 0]
+        assert data[3]["tags"] == sorted(data[3]["tags"])
+
+    @pytest.mark.parametrize(
+        "fields", [["id"], ["title", "tags", "image_variants"], ["price", "image"]]
+    )
+    def test_same_bytes_for_fields(self, recipes, fields):
+        """Test that trimmed rows render as the trimmed serializer"""
+        serializer = sparse.trim_serializer(
+            RecipeSerializer(
+                recipes.prefetch_related(*rows.RELATIONS_BY_ID), many=True
+            ),
+            fields,
+        )
+
+        data = rows.serialize_rows(rows.recipe_rows(recipes, fields), fields=fields)
+
+        assert JSONRenderer().render(data) == JSONRenderer().render(serializer.data)
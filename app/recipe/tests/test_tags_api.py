@@ -1,5 +1,7 @@
 import pytest
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.test import TestCase
 
@@ -12,6 +14,14 @@ from recipe.serializers import TagSerializer
 
 
 TAGS_URL = reverse("recipe:tag-list")
+TAGS_BULK_URL = reverse("recipe:tag-bulk-get-or-create")
+TAGS_AUTOCOMPLETE_URL = reverse("recipe:tag-autocomplete")
+
+
+def trigram_installed():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
 
 
 @pytest.mark.django_db(reset_sequences=True)
@@ -195,3 +205,248 @@ class TestsPrivateTagsApi:
 
         assert len(res.data) == 1
         assert TagSerializer(tag).data in res.data
+
+    def test_assigned_only_semi_join(self):
+        """Test that assigned tags are found without joining every link"""
+        user, client = create_and_authenticate_user()
+        tag = Tag.objects.create(user=user, name="Breakfast")
+
+        with CaptureQueriesContext(connection) as queries:
+            res = client.get(TAGS_URL, {"assigned_only": 1})
+        sql = queries[-1]["sql"]
+
+        assert res.data == []
+        assert "EXISTS" in sql
+        assert "DISTINCT" not in sql
+
+        recipe = Recipe.objects.create(
+            title="Pancakes", minutes_to_cook=5, price=3.00, user=user
+        )
+        recipe.tags.add(tag)
+
+        res = client.get(TAGS_URL, {"assigned_only": 1})
+
+        assert res.data == [TagSerializer(tag).data]
+
+    def test_with_counts(self):
+        """Test that every tag comes with the number of recipes using it"""
+        user, client = create_and_authenticate_user()
+        vegan = Tag.objects.create(user=user, name="Vegan")
+        lunch = Tag.objects.create(user=user, name="Lunch")
+        dessert = Tag.objects.create(user=user, name="Dessert")
+        for i in range(3):
+            recipe = Recipe.objects.create(
+                title=f"Recipe {i}", minutes_to_cook=5, price=3.00, user=user
+            )
+            recipe.tags.add(vegan)
+        recipe.tags.add(lunch)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = client.get(TAGS_URL, {"with_counts": 1})
+        query_count = len(queries)
+        assigned = client.get(TAGS_URL, {"with_counts": 1, "assigned_only": 1})
+        detail = client.get(
+            reverse("recipe:tag-detail", args=[vegan.id]), {"with_counts": 1}
+        )
+
+        assert res.data == [
+            {"id": vegan.id, "name": "Vegan", "recipe_count": 3},
+            {"id": lunch.id, "name": "Lunch", "recipe_count": 1},
+            {"id": dessert.id, "name": "Dessert", "recipe_count": 0},
+        ]
+        assert query_count == 1
+        assert [tag["name"] for tag in assigned.data] == ["Vegan", "Lunch"]
+        assert detail.data["recipe_count"] == 3
+
+    def test_with_counts_paginated_sparse(self):
+        """Test that counts work with pages and selected fields"""
+        user, client = create_and_authenticate_user()
+        tag = Tag.objects.create(user=user, name="Vegan")
+        Tag.objects.create(user=user, name="Dessert")
+        recipe = Recipe.objects.create(
+            title="Salad", minutes_to_cook=5, price=3.00, user=user
+        )
+        recipe.tags.add(tag)
+
+        first = client.get(
+            TAGS_URL, {"with_counts": 1, "fields": "recipe_count", "page_size": 1}
+        )
+        second = client.get(first.data["next"])
+
+        assert first.data["results"] == [{"recipe_count": 1}]
+        assert second.data["results"] == [{"recipe_count": 0}]
+
+    @pytest.mark.parametrize("params", [{"assigned_only": "yes"}, {"with_counts": ""}])
+    def test_invalid_flags(self, params):
+        """Test that flags other than 0 and 1 are rejected"""
+        user, client = create_and_authenticate_user()
+
+        res = client.get(TAGS_URL, params)
+
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_create_duplicate_tag_rejected(self):
+        """Test that a user cannot create two tags with the same name"""
+        user, client = create_and_authenticate_user()
+        Tag.objects.create(user=user, name="Vegan")
+
+        res = client.post(TAGS_URL, {"name": "Vegan"}, format="json")
+
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
+        assert Tag.objects.filter(user=user).count() == 1
+
+    def test_rename_to_duplicate_tag_rejected(self):
+        """Test that renaming a tag to an existing name is rejected"""
+        user, client = create_and_authenticate_user()
+        Tag.objects.create(user=user, name="Vegan")
+        tag = Tag.objects.create(user=user, name="Dessert")
+        url = reverse("recipe:tag-detail", kwargs={"pk": tag.id})
+
+        res = client.put(url, {"name": "Vegan"})
+
+        tag.refresh_from_db()
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
+        assert tag.name == "Dessert"
+
+    def test_bulk_get_or_create_tags(self):
+        """Test that existing tags are returned and missing ones created"""
+        user, client = create_and_authenticate_user()
+        user2 = get_user_model().objects.create_user(
+            "other@londonappdev.com", "testpass"
+        )
+        Tag.objects.create(user=user2, name="Lunch")
+        vegan = Tag.objects.create(user=user, name="Vegan")
+
+        res = client.post(
+            TAGS_BULK_URL,
+            {"names": ["Lunch", "Vegan", " Lunch ", "Dessert"]},
+            format="json",
+        )
+
+        tags = Tag.objects.filter(user=user)
+        assert res.status_code == status.HTTP_200_OK
+        assert [tag["name"] for tag in res.data] == ["Lunch", "Vegan", "Dessert"]
+        assert res.data[1]["id"] == vegan.id
+        assert sorted(tags.values_list("name", flat=True)) == [
+            "Dessert",
+            "Lunch",
+            "Vegan",
+        ]
+
+    def test_bulk_get_or_create_query_count(self):
+        """Test that the number of queries does not depend on the names"""
+        user, client = create_and_authenticate_user()
+        Tag.objects.create(user=user, name="Existing")
+
+        def bulk_queries(prefix, count):
+            names = ["Existing"] + [f"{prefix} {i}" for i in range(count)]
+            with CaptureQueriesContext(connection) as queries:
+                res = client.post(TAGS_BULK_URL, {"names": names}, format="json")
+            assert res.status_code == status.HTTP_200_OK
+            assert len(res.data) == count + 1
+            return len(queries)
+
+        assert bulk_queries("Small", 2) == bulk_queries("Large", 50)
+
+    @pytest.mark.parametrize(
+        "payload", [{}, {"names": []}, {"names": "Vegan"}, {"names": [""]}]
+    )
+    def test_bulk_get_or_create_invalid(self, payload):
+        """Test that invalid bulk payloads are rejected"""
+        user, client = create_and_authenticate_user()
+
+        res = client.post(TAGS_BULK_URL, payload, format="json")
+
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
+        assert not Tag.objects.exists()
+
+    def test_sparse_fields(self):
+        """Test that fields= trims the tags and the selected columns"""
+        user, client = create_and_authenticate_user()
+        Tag.objects.create(user=user, name="Vegan")
+        Tag.objects.create(user=user, name="Dessert")
+
+        with CaptureQueriesContext(connection) as queries:
+            res = client.get(TAGS_URL, {"fields": "id"})
+        # Read before the next request resets the query log
+        columns = queries[-1]["sql"].split("FROM")[0]
+        paginated = client.get(TAGS_URL, {"omit": "id", "page_size": 1})
+        next_page = client.get(paginated.data["next"])
+
+        tags = Tag.objects.order_by("-name")
+        assert res.data == [{"id": tag.id} for tag in tags]
+        assert '"core_tag"."name"' not in columns
+        assert paginated.data["results"] == [{"name": "Vegan"}]
+        assert next_page.data["results"] == [{"name": "Dessert"}]
+
+    def test_autocomplete(self):
+        """Test that prefix matches come first, shortest first"""
+        user, client = create_and_authenticate_user()
+        other = get_user_model().objects.create_user(
+            "other@londonappdev.com", "testpass"
+        )
+        Tag.objects.create(user=other, name="Vegan")
+        Tag.objects.create(user=user, name="Dessert")
+        for name in ["Vegetarian", "Raw vegan", "Vegan", "Vegan dessert"]:
+            Tag.objects.create(user=user, name=name)
+
+        res = client.get(TAGS_AUTOCOMPLETE_URL, {"q": "veg"})
+
+        assert res.status_code == status.HTTP_200_OK
+        assert [tag["name"] for tag in res.data] == [
+            "Vegan",
+            "Vegetarian",
+            "Vegan dessert",
+            "Raw vegan",
+        ]
+        assert (
+            res.data[0] == TagSerializer(Tag.objects.get(user=user, name="Vegan")).data
+        )
+
+    def test_autocomplete_words(self):
+        """Test that every typed word must start a word of the name"""
+        user, client = create_and_authenticate_user()
+        Tag.objects.create(user=user, name="Quick weeknight dinner")
+        Tag.objects.create(user=user, name="Quick lunch")
+
+        res = client.get(TAGS_AUTOCOMPLETE_URL, {"q": "dinn quick"})
+
+        assert [tag["name"] for tag in res.data] == ["Quick weeknight dinner"]
+
+    def test_autocomplete_limit(self):
+        """Test that only the requested number of matches is returned"""
+        user, client = create_and_authenticate_user()
+        for i in range(5):
+            Tag.objects.create(user=user, name=f"Tag {i}")
+            Tag.objects.create(user=user, name=f"Other tag {i}")
+
+        res = client.get(TAGS_AUTOCOMPLETE_URL, {"q": "tag", "limit": 7})
+
+        assert [tag["name"] for tag in res.data] == [
+            *[f"Tag {i}" for i in range(5)],
+            "Other tag 0",
+            "Other tag 1",
+        ]
+
+    @pytest.mark.parametrize(
+        "params", [{}, {"q": " "}, {"q": "a", "limit": 0}, {"q": "a", "limit": 51}]
+    )
+    def test_autocomplete_invalid(self, params):
+        """Test that a text and a reasonable limit are required"""
+        user, client = create_and_authenticate_user()
+
+        res = client.get(TAGS_AUTOCOMPLETE_URL, params)
+
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_autocomplete_typo(self, settings):
+        """Test that similar names are suggested for typos"""
+        if not trigram_installed():
+            pytest.skip("pg_trgm is not installed")
+        settings.RECIPE_AUTOCOMPLETE_TRIGRAM = True
+        user, client = create_and_authenticate_user()
+        Tag.objects.create(user=user, name="Breakfast")
+
+        res = client.get(TAGS_AUTOCOMPLETE_URL, {"q": "braekfast"})
+
+        assert [tag["name"] for tag in res.data] == ["Breakfast"]
@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from recipe import views
+from recipe import async_views, views
 
 
 router = DefaultRouter()
@@ -11,4 +11,16 @@ router.register("recipes", views.RecipeViewSet)
 
 app_name = "recipe"
 
-urlpatterns = [path("", include(router.urls))]
+urlpatterns = [
+    path(
+        "async/recipes/",
+        async_views.RecipeListView.as_view(),
+        name="recipe-async-list",
+    ),
+    path(
+        "async/recipes/<int:pk>/",
+        async_views.RecipeDetailView.as_view(),
+        name="recipe-async-detail",
+    ),
+    path("", include(router.urls)),
+]
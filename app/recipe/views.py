@@ -1,34 +1,156 @@
-import os
-
-from django.db.models import Q
+from django.conf import settings
+from django.db import IntegrityError, transaction
 from rest_framework import viewsets, status
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 
 from core.models import Tag, Ingredient, Recipe
 
-from recipe import serializers
+from recipe import (
+    autocomplete,
+    cache,
+    conditional,
+    filters,
+    images,
+    rows,
+    search,
+    serializers,
+    sparse,
+    stats,
+)
+from recipe.pagination import KeysetPagination
+from user.authentication import CachedTokenAuthentication
 from rest_framework.response import Response
 
 
-class BaseRecipeAttrViewSet(viewsets.ModelViewSet):
+def recipe_queryset(user, params):
+    """Return the recipes of a user, filtered and ordered by query parameters
+
+    Shared by RecipeViewSet and the async views, so both select alike.
+    """
+    queryset = (
+        Recipe.objects.filter(user=user)
+        .prefetch_related(*rows.RELATIONS_BY_ID)
+        .order_by("-id")
+    )
+    queryset = filters.filter_by_relations(queryset, params)
+    queryset = filters.filter_by_ranges(queryset, params)
+    queryset = search.filter_by_search(queryset, params)
+    return filters.order_recipes(queryset, params)
+
+
+class SparseFieldsMixin:
+    """Let GET requests select fields with ``?fields=`` and ``?omit=``"""
+
+    def get_sparse_fields(self):
+        """Return the requested fields of the serializer, None for all"""
+        if self.request.method not in SAFE_METHODS:
+            return None
+        return sparse.requested_fields(
+            self.request.query_params, self.get_serializer_class().Meta.fields
+        )
+
+
+class BaseRecipeAttrViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     """Base viewset for user owned recipe attributes"""
 
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         """Return objects for the current authenticated user only"""
-        queryset = self.queryset.filter(user=self.request.user).order_by("-name")
-        assigned_only = bool(int(self.request.query_params.get("assigned_only", 0)))
-        if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False).distinct()
+        queryset = self.queryset.filter(user=self.request.user).order_by("-name", "-id")
+        if filters.parse_flag(self.request.query_params, "assigned_only"):
+            queryset = filters.filter_assigned(queryset, self.recipe_relation)
+        if self.with_counts():
+            queryset = filters.annotate_recipe_counts(queryset, self.recipe_relation)
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            # Page cursors are built from the ordering fields
+            if self.paginator.is_requested(self.request):
+                fields = [*fields, "name", "id"]
+            columns = [name for name in fields if name != "recipe_count"]
+            queryset = queryset.only(*dict.fromkeys(columns))
         return queryset
 
+    def with_counts(self):
+        """Return whether reads should include the recipe counts"""
+        return self.request.method in SAFE_METHODS and filters.parse_flag(
+            self.request.query_params, "with_counts"
+        )
+
+    def get_serializer_class(self):
+        if self.action == "bulk_get_or_create":
+            return serializers.AttributeNamesSerializer
+        if self.action in ("list", "retrieve") and self.with_counts():
+            return self.count_serializer_class
+        return self.serializer_class
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fields = self.get_sparse_fields()
+        if fields is None:
+            return serializer
+        return sparse.trim_serializer(serializer, fields)
+
     def perform_create(self, serializer):
         """Create a new object"""
-        serializer.save(user=self.request.user)
+        self.save_unique(serializer, user=self.request.user)
+
+    def perform_update(self, serializer):
+        self.save_unique(serializer)
+
+    def save_unique(self, serializer, **kwargs):
+        """Save the object, reporting a name the user already has as invalid"""
+        try:
+            with transaction.atomic():
+                serializer.save(**kwargs)
+        except IntegrityError:
+            raise ValidationError(
+                {"name": ["You already have an item with this name."]}
+            )
+
+    @action(methods=["GET"], detail=False, url_path="autocomplete")
+    def autocomplete(self, request):
+        """Return the objects whose name best matches the ``q`` parameter"""
+        query_serializer = serializers.AutocompleteSerializer(data=request.query_params)
+        query_serializer.is_valid(raise_exception=True)
+        matches = autocomplete.suggest(
+            self.queryset.filter(user=request.user),
+            query_serializer.validated_data["q"],
+            query_serializer.validated_data["limit"],
+        )
+        response_serializer = self.serializer_class(matches, many=True)
+        return Response(response_serializer.data)
+
+    @action(methods=["POST"], detail=False, url_path="bulk-get-or-create")
+    def bulk_get_or_create(self, request):
+        """Return the objects with the given names, creating missing ones"""
+        request_serializer = self.get_serializer(data=request.data)
+        request_serializer.is_valid(raise_exception=True)
+        names = list(dict.fromkeys(request_serializer.validated_data["names"]))
+        model = self.queryset.model
+        user_objects = model.objects.filter(user=request.user)
+
+        existing = {obj.name: obj for obj in user_objects.filter(name__in=names)}
+        missing = [name for name in names if name not in existing]
+        if missing:
+            # Names inserted by a concurrent request are skipped here and
+            # picked up by the select below.
+            model.objects.bulk_create(
+                [model(user=request.user, name=name) for name in missing],
+                ignore_conflicts=True,
+            )
+            existing.update(
+                (obj.name, obj) for obj in user_objects.filter(name__in=missing)
+            )
+
+        response_serializer = self.serializer_class(
+            [existing[name] for name in names], many=True
+        )
+        return Response(response_serializer.data, status=status.HTTP_200_OK)
 
 
 class TagViewSet(BaseRecipeAttrViewSet):
@@ -36,6 +158,8 @@ class TagViewSet(BaseRecipeAttrViewSet):
 
     queryset = Tag.objects.all()
     serializer_class = serializers.TagSerializer
+    count_serializer_class = serializers.TagCountSerializer
+    recipe_relation = "tags"
 
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
@@ -43,32 +167,22 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
 
     queryset = Ingredient.objects.all()
     serializer_class = serializers.IngredientSerializer
+    count_serializer_class = serializers.IngredientCountSerializer
+    recipe_relation = "ingredients"
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     """Manage recipes in the database"""
 
     queryset = Recipe.objects.all()
     serializer_class = serializers.RecipeSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         """Return objects for the current authenticated user only"""
-        queryset = self.queryset.filter(user=self.request.user).order_by("-id")
-        tags = self.request.query_params.get("tags")
-        ingredients = self.request.query_params.get("ingredients")
-        tags_list = tags.split(",") if tags else []
-        ingredients_list = ingredients.split(",") if ingredients else []
-        final_queryset = (
-            queryset.filter(
-                Q(tags__id__in=tags_list) | Q(ingredients__id__in=ingredients_list)
-            )
-            if (tags or ingredients)
-            else queryset
-        )
-
-        return final_queryset
+        return recipe_queryset(self.request.user, self.request.query_params)
 
     def get_serializer_class(self):
         """Return appropriate serializer class"""
@@ -76,6 +190,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return serializers.RecipeDetailSerializer
         elif self.action == "upload_image":
             return serializers.RecipeImageSerializer
+        elif self.action == "bulk_create":
+            return serializers.RecipeBulkItemSerializer
 
         return self.serializer_class
 
@@ -102,50 +218,229 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
         if request_serializer.is_valid(raise_exception=True):
             self.perform_update(request_serializer)
-            response_serializer = serializers.RecipeDetailSerializer(instance)
 
             if getattr(instance, "_prefetched_objects_cache", None):
                 # If 'prefetch_related' has been applied to a queryset, we need to
                 # forcibly invalidate the prefetch cache on the instance.
                 instance._prefetched_objects_cache = {}
 
+            response_serializer = serializers.RecipeDetailSerializer(instance)
             return Response(response_serializer.data, status=status.HTTP_200_OK)
         else:
             return Response(
                 request_serializer.errors, status=status.HTTP_400_BAD_REQUEST
             )
 
+    def list(self, request, *args, **kwargs):
+        fields = self.get_sparse_fields()
+        queryset = self.filter_queryset(self.get_queryset())
+        etag, last_modified = conditional.list_validators(request)
+        not_modified = conditional.not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        # Same payload as the serializer class, built from rows
+        recipe_rows = rows.recipe_rows(queryset, fields)
+        page = self.paginate_queryset(recipe_rows)
+        if page is not None:
+            data = rows.serialize_rows(page, request, fields)
+            response = self.get_paginated_response(data)
+        else:
+            response = Response(rows.serialize_rows(recipe_rows, request, fields))
+        return conditional.set_validators(response, etag, last_modified)
+
     def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
-        response_serializer = serializers.RecipeDetailSerializer(instance)
-        return Response(response_serializer.data)
+        fields = self.get_sparse_fields()
+        try:
+            recipe_id = int(kwargs["pk"])
+        except ValueError:
+            raise NotFound()
+        # The version is read before the database so a write racing with
+        # this request stores its payload under an already stale version.
+        version = cache.get_version(recipe_id)
+        entry = cache.get_detail(recipe_id, version)
+        if entry is None or entry["user"] != request.user.pk:
+            instance = self.get_object()
+            if version is None:
+                cache.add_version(instance.pk)
+            entry = {"user": instance.user_id, "modified_at": instance.modified_at}
+        else:
+            instance = None
+
+        etag, last_modified = conditional.detail_validators(
+            recipe_id, entry["modified_at"], fields
+        )
+        not_modified = conditional.not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        if instance is not None:
+            response_serializer = serializers.RecipeDetailSerializer(instance)
+            entry["data"] = dict(response_serializer.data)
+            cache.set_detail(instance.pk, version, entry)
+        # The full payload is cached and trimmed per request
+        data = entry["data"]
+        if fields is not None:
+            data = {name: data[name] for name in fields}
+        response = Response(data)
+        return conditional.set_validators(response, etag, last_modified)
+
+    @action(methods=["GET"], detail=False, url_path="stats")
+    def stats(self, request):
+        """Return the statistics of the recipes of the user"""
+        # Same cache protocol as retrieve, versions are bumped by the signals
+        version = cache.get_stats_version(request.user.pk)
+        data = cache.get_stats(request.user.pk, version)
+        if data is None:
+            data = stats.recipe_stats(request.user)
+            cache.set_stats(request.user.pk, version, data)
+        return Response(data)
+
+    @action(methods=["POST"], detail=False, url_path="bulk-create")
+    def bulk_create(self, request):
+        """Create a list of recipes, reporting invalid items separately"""
+        items = request.data
+        if not isinstance(items, list):
+            return Response(
+                {"non_field_errors": ["Expected a list of items."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        max_items = settings.RECIPE_BULK_CREATE_MAX_ITEMS
+        if len(items) > max_items:
+            return Response(
+                {"non_field_errors": [f"Ensure there are at most {max_items} items."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        errors = {}
+        valid = {}
+        for index, item in enumerate(items):
+            item_serializer = self.get_serializer(data=item)
+            if item_serializer.is_valid():
+                valid[index] = item_serializer.validated_data
+            else:
+                errors[index] = item_serializer.errors
+
+        # One lookup per relation for the whole batch
+        for relation, model in (("tags", Tag), ("ingredients", Ingredient)):
+            requested = {pk for data in valid.values() for pk in data[relation]}
+            existing = set(
+                model.objects.filter(user=request.user, id__in=requested).values_list(
+                    "id", flat=True
+                )
+            )
+            for index, data in list(valid.items()):
+                missing = [pk for pk in data[relation] if pk not in existing]
+                if missing:
+                    errors.setdefault(index, {})[relation] = [
+                        f'Invalid pk "{pk}" - object does not exist.' for pk in missing
+                    ]
+                    del valid[index]
+
+        created = []
+        if valid:
+            created = self.perform_bulk_create(list(valid.values()))
+        response_serializer = serializers.RecipeSerializer(created, many=True)
+        return Response(
+            {
+                "created": response_serializer.data,
+                "errors": [
+                    {"index": index, "errors": errors[index]}
+                    for index in sorted(errors)
+                ],
+            },
+            status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST,
+        )
+
+    def perform_bulk_create(self, items):
+        """Insert recipes and their links in batches and return them"""
+        with transaction.atomic():
+            recipes = Recipe.objects.bulk_create(
+                [
+                    Recipe(
+                        user=self.request.user,
+                        **{
+                            field: value
+                            for field, value in data.items()
+                            if field not in ("tags", "ingredients")
+                        },
+                    )
+                    for data in items
+                ],
+                batch_size=500,
+            )
+            for relation in ("tags", "ingredients"):
+                field = Recipe._meta.get_field(relation)
+                through = field.remote_field.through
+                target_column = f"{field.m2m_reverse_field_name()}_id"
+                through.objects.bulk_create(
+                    [
+                        through(recipe_id=recipe.id, **{target_column: pk})
+                        for recipe, data in zip(recipes, items)
+                        for pk in dict.fromkeys(data[relation])
+                    ],
+                    batch_size=1000,
+                )
+            # Bulk inserts send no signals
+            search.update_search_vectors(recipe.id for recipe in recipes)
+        cache.bump_stats_versions([self.request.user.pk])
+        conditional.mark_list_changed([self.request.user.pk])
+
+        return list(
+            Recipe.objects.filter(id__in=[recipe.id for recipe in recipes])
+            .prefetch_related("tags", "ingredients")
+            .order_by("id")
+        )
 
     @action(methods=["POST"], detail=True, url_path="upload-image")
     def upload_image(self, request, pk=None):
         """Upload an image to a recipe"""
         recipe = self.get_object()
-        try:
-            path = recipe.image.path
-        except:
-            path = None
-        if path:
-            os.remove(path)
         serializer = self.get_serializer(recipe, data=request.data)
 
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                name = images.store_file(serializer.validated_data["image"], recipe)
+                self.replace_image(recipe, name)
             response_serializer = serializers.RecipeDetailSerializer(recipe)
             return Response(response_serializer.data, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(methods=["PUT"], detail=True, url_path="image")
+    def stream_image(self, request, pk=None):
+        """Replace the recipe image with the raw request body"""
+        recipe = self.get_object()
+        with transaction.atomic():
+            # Reads the underlying request, request.data would buffer the body
+            name = images.store_upload(
+                request._request, recipe, request.META.get("CONTENT_LENGTH")
+            )
+            self.replace_image(recipe, name)
+
+        response_serializer = serializers.RecipeDetailSerializer(recipe)
+        return Response(response_serializer.data, status=status.HTTP_200_OK)
+
+    def replace_image(self, recipe, name):
+        """Point the recipe to a stored image and queue its variants"""
+        previous = recipe.image.name
+        recipe.image = name
+        recipe.image_status = Recipe.ImageStatus.PENDING
+        recipe.image_variants = {}
+        recipe.save()
+        images.release_image(previous)
+        # Resizing runs on the worker pool once the image row is visible
+        transaction.on_commit(lambda: images.queue_variants(recipe.pk, name))
+
     @action(methods=["DELETE"], detail=True, url_path="delete-image")
     def delete_image(self, request, pk=None):
         """Upload an image to a recipe"""
         recipe = self.get_object()
-        path = recipe.image.path
-        recipe.image = None
-        os.remove(path)
-        recipe.save()
+        with transaction.atomic():
+            images.release_image(recipe.image.name)
+            recipe.image = None
+            recipe.image_status = Recipe.ImageStatus.NONE
+            recipe.image_variants = {}
+            recipe.save()
 
         return Response(status=status.HTTP_204_NO_CONTENT)
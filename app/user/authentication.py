@@ -0,0 +1,183 @@
+import copy
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+
+
+class TokenCache:
+    """Thread safe LRU cache of token key -> (user, token) with a TTL"""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped on every invalidation so a lookup that raced with one does
+        # not store credentials read before the change.
+        self.generation = 0
+
+    def get(self, key, version=None):
+        """Return the cached (user, token) pair or None
+
+        Entries stored under another ``version`` are dropped.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, user, token, entry_version = entry
+            if expires_at <= time.monotonic() or entry_version != version:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user, token
+
+    def set(self, key, user, token, generation, version=None):
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, user, token, version)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate_token(self, key):
+        with self._lock:
+            self.generation += 1
+            self._entries.pop(key, None)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            self.generation += 1
+            stale = [
+                key
+                for key, (_, user, _, _) in self._entries.items()
+                if user.pk == user_id
+            ]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+token_cache = TokenCache(
+    max_size=settings.AUTH_TOKEN_CACHE_SIZE, ttl=settings.AUTH_TOKEN_CACHE_TTL
+)
+
+
+def version_key(token_key):
+    # Hashed so keys are valid for every backend whatever the header holds
+    return "auth:token:%s:version" % hashlib.sha256(token_key.encode()).hexdigest()
+
+
+def bump_token_versions(token_keys):
+    """Invalidate the credentials cached for tokens by every process"""
+    keys = [version_key(token_key) for token_key in token_keys]
+    if keys:
+        cache.delete_many(keys)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that caches the token lookup in process
+
+    Entries are stored with the version of their token in the default
+    cache, read before the lookup. The user app signal handlers delete it
+    when the token is deleted or its user changed, so every process drops
+    that entry on its next request at the cost of one cache get. A token is
+    only given a version once it was found, and its lookup is cached from
+    the next request on. Without CACHE_SHARED the versions would not reach
+    other processes, so tokens are looked up every time.
+
+    aauthenticate does the same from async views, with the async cache and
+    ORM APIs.
+    """
+
+    def authenticate(self, request):
+        key = self.get_key(request)
+        return None if key is None else self.authenticate_credentials(key)
+
+    async def aauthenticate(self, request):
+        key = self.get_key(request)
+        return None if key is None else await self.aauthenticate_credentials(key)
+
+    def get_key(self, request):
+        """Return the token key of the Authorization header, None if absent"""
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) == 1:
+            msg = _("Invalid token header. No credentials provided.")
+            raise exceptions.AuthenticationFailed(msg)
+        elif len(auth) > 2:
+            msg = _("Invalid token header. Token string should not contain spaces.")
+            raise exceptions.AuthenticationFailed(msg)
+        try:
+            return auth[1].decode()
+        except UnicodeError:
+            msg = _(
+                "Invalid token header. "
+                "Token string should not contain invalid characters."
+            )
+            raise exceptions.AuthenticationFailed(msg)
+
+    def authenticate_credentials(self, key):
+        if not settings.CACHE_SHARED:
+            return super().authenticate_credentials(key)
+
+        version = cache.get(version_key(key))
+        cached = None if version is None else token_cache.get(key, version)
+        if cached is None:
+            generation = token_cache.generation
+            user, token = super().authenticate_credentials(key)
+            if version is None:
+                cache.add(version_key(key), uuid.uuid4().hex, timeout=None)
+            else:
+                token_cache.set(key, copy.copy(user), token, generation, version)
+            return user, token
+
+        user, token = cached
+        # Every request gets its own copy, so views changing request.user
+        # never leak half applied updates into the shared entry.
+        return copy.copy(user), token
+
+    async def aauthenticate_credentials(self, key):
+        if not settings.CACHE_SHARED:
+            return await self.alookup(key)
+
+        version = await cache.aget(version_key(key))
+        cached = None if version is None else token_cache.get(key, version)
+        if cached is None:
+            generation = token_cache.generation
+            user, token = await self.alookup(key)
+            if version is None:
+                await cache.aadd(version_key(key), uuid.uuid4().hex, timeout=None)
+            else:
+                token_cache.set(key, copy.copy(user), token, generation, version)
+            return user, token
+
+        user, token = cached
+        return copy.copy(user), token
+
+    async def alookup(self, key):
+        """Look the token up like TokenAuthentication.authenticate_credentials"""
+        model = self.get_model()
+        try:
+            token = await model.objects.select_related("user").aget(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_("Invalid token."))
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+        return token.user, token
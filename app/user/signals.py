@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from user.authentication import bump_token_versions, token_cache
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_tokens(
+    sender, instance, created=False, update_fields=None, **kwargs
+):
+    """Drop cached credentials of a changed or deleted user
+
+    New users have no tokens yet, and logins only save last_login.
+    """
+    if created or (update_fields is not None and set(update_fields) <= {"last_login"}):
+        return
+    token_cache.invalidate_user(instance.pk)
+    # Tokens of a deleted user are dropped by their own post_delete
+    bump_token_versions(
+        Token.objects.filter(user_id=instance.pk).values_list("key", flat=True)
+    )
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    """Drop a deleted token from the credentials cache"""
+    token_cache.invalidate_token(instance.key)
+    bump_token_versions([instance.key])
@@ -0,0 +1,176 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import update_last_login
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from helpers.test_helpers import create_user
+from user.authentication import TokenCache, bump_token_versions, token_cache
+
+ME_URL = reverse("user:me")
+TAGS_URL = reverse("recipe:tag-list")
+
+
+@pytest.fixture()
+def token_client():
+    token_cache.clear()
+    user = create_user(email="test@londonappdev.com", password="testpass", name="name")
+    token = Token.objects.create(user=user)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+    yield user, token, client
+    token_cache.clear()
+
+
+def warm_up(client):
+    """Get the token of a client cached in this process"""
+    # The first request gives the token a version, the second caches it
+    for _ in range(2):
+        assert client.get(TAGS_URL).status_code == status.HTTP_200_OK
+
+
+def token_queries(queries):
+    return [query for query in queries if "authtoken_token" in query["sql"]]
+
+
+@pytest.mark.django_db
+class TestCachedTokenAuthentication:
+    """Test the in-process token authentication cache"""
+
+    def test_repeated_requests_skip_token_lookup(self, token_client):
+        """Test that a cached token does not query the token table again"""
+        user, token, client = token_client
+        with CaptureQueriesContext(connection) as first:
+            warm_up(client)
+        with CaptureQueriesContext(connection) as cached:
+            assert client.get(TAGS_URL).status_code == status.HTTP_200_OK
+
+        assert len(token_queries(first)) == 2
+        assert not token_queries(cached)
+
+    def test_invalid_token_rejected(self, token_client):
+        """Test that unknown tokens are still rejected"""
+        user, token, client = token_client
+        client.credentials(HTTP_AUTHORIZATION="Token invalid")
+
+        assert client.get(ME_URL).status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_deactivated_user_locked_out(self, token_client):
+        """Test that deactivating a user invalidates the cached token"""
+        user, token, client = token_client
+        warm_up(client)
+
+        user.is_active = False
+        user.save()
+
+        assert client.get(ME_URL).status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_deleted_token_rejected(self, token_client):
+        """Test that deleting a token invalidates the cached entry"""
+        user, token, client = token_client
+        warm_up(client)
+
+        token.delete()
+
+        assert client.get(ME_URL).status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_change_from_other_process_locks_out(self, token_client):
+        """Test that a dropped token version invalidates the cached token"""
+        user, token, client = token_client
+        warm_up(client)
+
+        # What another process does: save the user and drop the version
+        get_user_model().objects.filter(pk=user.pk).update(is_active=False)
+        bump_token_versions([token.key])
+
+        assert client.get(ME_URL).status_code == status.HTTP_401_UNAUTHORIZED
+
+    @pytest.mark.parametrize("change", ["create_user", "update_other", "login"])
+    def test_unrelated_changes_keep_cached_token(self, token_client, change):
+        """Test that only changes to the user of a token invalidate it"""
+        user, token, client = token_client
+        other = create_user(email="other@londonappdev.com", password="testpass")
+        Token.objects.create(user=other)
+        warm_up(client)
+
+        if change == "create_user":
+            create_user(email="new@londonappdev.com", password="testpass")
+        elif change == "update_other":
+            other.name = "Other"
+            other.save()
+        elif change == "login":
+            update_last_login(None, user)
+        with CaptureQueriesContext(connection) as queries:
+            client.get(TAGS_URL)
+
+        assert not token_queries(queries)
+
+    def test_process_local_cache_not_used(self, token_client, settings):
+        """Test that tokens are looked up every time unless the cache is shared"""
+        settings.CACHE_SHARED = False
+        user, token, client = token_client
+        warm_up(client)
+
+        with CaptureQueriesContext(connection) as queries:
+            client.get(TAGS_URL)
+
+        assert token_queries(queries)
+
+    def test_profile_update_visible_on_next_request(self, token_client):
+        """Test that updating the profile refreshes the cached user"""
+        user, token, client = token_client
+        warm_up(client)
+
+        res = client.patch(ME_URL, {"name": "new name"})
+        me = client.get(ME_URL)
+
+        assert res.status_code == status.HTTP_200_OK
+        assert me.data["name"] == "new name"
+
+
+class TestTokenCache:
+    """Test the bounded token cache"""
+
+    def test_least_recently_used_entry_evicted(self):
+        """Test that the cache never grows beyond its size"""
+        cache = TokenCache(max_size=2, ttl=60)
+        cache.set("a", "user-a", "token-a", cache.generation)
+        cache.set("b", "user-b", "token-b", cache.generation)
+        cache.get("a")
+        cache.set("c", "user-c", "token-c", cache.generation)
+
+        assert len(cache) == 2
+        assert cache.get("b") is None
+        assert cache.get("a") == ("user-a", "token-a")
+
+    def test_expired_entry_dropped(self, monkeypatch):
+        """Test that entries are dropped after the TTL"""
+        now = [100.0]
+        monkeypatch.setattr("user.authentication.time.monotonic", lambda: now[0])
+        cache = TokenCache(max_size=2, ttl=10)
+        cache.set("a", "user-a", "token-a", cache.generation)
+
+        now[0] += 11
+
+        assert cache.get("a") is None
+
+    def test_entry_of_other_version_dropped(self):
+        """Test that entries only match the version they were stored with"""
+        cache = TokenCache(max_size=2, ttl=60)
+        cache.set("a", "user-a", "token-a", cache.generation, "v1")
+
+        assert cache.get("a", "v2") is None
+        assert cache.get("a", "v1") is None
+
+    def test_set_skipped_after_concurrent_invalidation(self):
+        """Test that a lookup racing an invalidation is not cached"""
+        cache = TokenCache(max_size=2, ttl=60)
+        generation = cache.generation
+        cache.invalidate_token("a")
+        cache.set("a", "user-a", "token-a", generation)
+
+        assert cache.get("a") is None